@@ -0,0 +1,123 @@
+# autopilot.py
+""" 自動駕駛：電腦控制的玩家 (展示模式、main.py --autopilot、simulate.py --policy autopilot)。
+
+每走到新的格子做一次決定：把主遊戲的快照 (Game.snapshot) 載入一場不顯示、不記日誌的影子遊戲，
+對每個能走的方向各模擬 rollouts 次、每次往前 depth 幀，選平均獎勵最高的方向。
+模擬時大多走向最近的豆子 (pellets.PelletIndex.nearest)，偶爾隨機轉彎；
+獎勵是這段時間得到的分數，被抓扣 AUTOPILOT_DEATH_PENALTY，過關加 AUTOPILOT_CLEAR_BONUS，
+最後再依離最近豆子的距離扣一點 (不超過一顆豆子的分數)，附近沒有豆子可吃時也會往豆子的方向走。
+鬼魂的行為都在影子遊戲裡照實模擬，所以不需要另外寫躲避鬼魂的規則。
+
+亂數來自自己的 seed，同樣的遊戲狀態一定做出同樣的決定 (可以錄影、重播)。
+"""
+import random
+import time
+from settings import *
+from game import Game
+from grid import ACTOR_PLAYER, DIR_BITS
+
+
+class Autopilot:
+    """ 玩家機器人，介面同 simulate.RandomWalkPolicy：autopilot(game) 回傳這一幀要按的方向或 None """
+
+    def __init__(self, game, depth=AUTOPILOT_DEPTH, rollouts=AUTOPILOT_ROLLOUTS, seed=None):
+        if game.planner:
+            raise ValueError("the autopilot cannot simulate games using the async planner")
+        self.depth = depth
+        self.rollouts = rollouts
+        self.rng = random.Random(game.seed if seed is None else seed)
+        # 影子遊戲：參數和主遊戲相同 (同樣的關卡物件)，狀態每次決定前從主遊戲的快照載入
+        self.shadow = Game(game.selected_algorithm, frame_ms=game.frame_ms, use_nav_table=game.use_nav_table,
+                           use_nav_graph=game.use_nav_graph, use_plan_cache=game.use_plan_cache, horde=game.horde,
+                           level=game.level, levels=game.levels, seed=game.seed)
+        self.shadow.logger.muted = True
+        self.last_tile = None
+        self.decisions = 0
+        self.decision_time = 0.0  # 累計的 CPU 秒數 (統計用)
+
+    def __call__(self, game):
+        if game.game_state not in (GAME_STATE_START, GAME_STATE_PLAYING):
+            return None
+        player = game.player
+        tile = (player.grid_x, player.grid_y)
+        if game.game_state == GAME_STATE_PLAYING and tile == self.last_tile and player.direction != (0, 0):
+            return None
+        self.last_tile = tile
+
+        options = self.options(game)
+        if not options:
+            return None
+        start = time.perf_counter()
+        choice = self.decide(game, options) if len(options) > 1 else options[0]
+        self.decisions += 1
+        self.decision_time += time.perf_counter() - start
+        if choice == player.direction and player.next_direction == (0, 0):
+            return None  # 繼續往前走，不必按鍵 (錄影檔也比較小)
+        return choice
+
+    def options(self, game):
+        player = game.player
+        exits = game.game_map.exits_at(ACTOR_PLAYER, int(player.grid_x), int(player.grid_y))
+        return [d for d in DIRECTIONS if exits & DIR_BITS[d]]
+
+    def decide(self, game, options):
+        """ 每個方向模擬 rollouts 次，回傳平均獎勵最高的方向 (同分時取較前面的) """
+        shadow = self.shadow
+        shadow.restore(game.snapshot())
+        root = shadow.snapshot()
+        best = None
+        best_value = None
+        for direction in options:
+            total = 0
+            for _ in range(self.rollouts):
+                shadow.restore(root)
+                total += self.rollout(shadow, direction)
+            if best_value is None or total > best_value:
+                best, best_value = direction, total
+        return best
+
+    def rollout(self, shadow, direction):
+        """ 先往 direction 走，之後用模擬策略走完 depth 幀，回傳獎勵 """
+        player = shadow.player
+        score = player.score
+        lives = shadow.player_lives
+        level = shadow.current_level
+        shadow.step(direction)
+        last_tile = (player.grid_x, player.grid_y)
+        for _ in range(self.depth - 1):
+            if shadow.player_lives < lives or shadow.game_state != GAME_STATE_PLAYING:
+                break
+            inputs = None
+            if (shadow.player.grid_x, shadow.player.grid_y) != last_tile:
+                player = shadow.player
+                last_tile = (player.grid_x, player.grid_y)
+                inputs = self.rollout_policy(shadow)
+            shadow.step(inputs)
+
+        player = shadow.player  # 過關或被抓時玩家物件會重建
+        reward = player.score - score
+        if shadow.player_lives < lives or shadow.game_state == GAME_STATE_GAME_OVER:
+            return reward - AUTOPILOT_DEATH_PENALTY
+        if shadow.current_level > level:
+            return reward + AUTOPILOT_CLEAR_BONUS
+        target = shadow.pellets.nearest(player.grid_x, player.grid_y)
+        if target is not None:
+            # 越遠扣越多，但不超過一顆豆子的分數：吃掉最後幾顆豆子之後離下一顆很遠也還是划算
+            distance = abs(target[0] - player.grid_x) + abs(target[1] - player.grid_y)
+            reward -= PELLELETS_POINT * distance / (distance + 1)
+        return reward
+
+    def rollout_policy(self, shadow):
+        """ 模擬時的走法：大多走向最近的豆子 (直線距離)，其餘隨機選一個不回頭的方向 """
+        player = shadow.player
+        options = self.options(shadow)
+        reverse = (-player.direction[0], -player.direction[1])
+        forward = [d for d in options if d != reverse] or options
+        if not forward:
+            return None
+        if self.rng.random() < AUTOPILOT_GREEDY:
+            target = shadow.pellets.nearest(player.grid_x, player.grid_y)
+            if target is not None:
+                x, y = player.grid_x, player.grid_y
+                return min(forward, key=lambda d: abs(target[0] - x - d[0]) + abs(target[1] - y - d[1]))
+        return self.rng.choice(forward)
@@ -0,0 +1,258 @@
+# benchmark.py
+""" 路徑搜尋效能測試：在原始地圖與程序產生的迷宮上比較各種搜尋方式。
+
+每個 (迷宮, 搜尋方式) 會報告：每次查詢的時間、展開的節點數、路徑長度相對最短路徑的比例、
+以及搜尋時的記憶體峰值 (tracemalloc)。結果可以存成基準檔，之後的執行會和基準比較並標出退步。
+
+範例：
+    python code/benchmark.py --save-baseline bench_baseline.json
+    python code/benchmark.py --baseline bench_baseline.json            # 退步時結束碼為 1
+    python code/benchmark.py --sizes 28x36 100x100 --classic-pairs 2000
+"""
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tracemalloc
+from array import array
+from collections import deque
+from settings import *
+from grid import Grid, ACTOR_NAV, DIR_BITS
+from ghost import Ghost
+from navigation import NavTable, JunctionGraph
+from mapgen import generate_maze
+
+DEFAULT_SIZES = ["28x36", "100x100", "300x300", "1000x1000"]
+ALL_SOLVERS = ["tile.A_STAR", "tile.BFS", "tile.DFS", "graph.A_STAR", "graph.BFS", "graph.DFS", "navtable"]
+
+# 產生的迷宮：查詢次數隨地圖變大而減少 (大約固定總工作量)，但至少 MIN_QUERIES 次
+QUERY_BUDGET_CELLS = 20_000_000
+MIN_QUERIES = 10
+GOALS_PER_START = 5
+PEAK_SAMPLE = 20            # 用 tracemalloc 量記憶體峰值的查詢數 (tracemalloc 會拖慢速度，不和計時一起跑)
+
+# 與基準比較時的容許範圍
+NODE_TOLERANCE = 0.05
+RATIO_TOLERANCE = 1e-6
+
+
+def open_tiles(grid):
+    """ 與第一個豆子連通的所有格子 (排除地圖上走不到的區域) """
+    start = grid.initial_tiles.index(ord(TILE_PELLET))
+    dist = bfs_distances(grid, start)
+    return [(i % grid.width, i // grid.width) for i in range(len(dist)) if dist[i] >= 0]
+
+
+def bfs_distances(grid, start_index):
+    """ 從一格出發到所有格子的最短距離 (走不到為 -1)，作為路徑長度的標準答案 """
+    width = grid.width
+    nav = grid.exits[ACTOR_NAV]
+    dist = array("i", [-1]) * (width * grid.height)
+    dist[start_index] = 0
+    queue = deque([start_index])
+    while queue:
+        i = queue.popleft()
+        x, y = i % width, i // width
+        for direction in DIRECTIONS:
+            if nav[i] & DIR_BITS[direction]:
+                nx, ny = grid.neighbor(x, y, direction)
+                j = ny * width + nx
+                if dist[j] < 0:
+                    dist[j] = dist[i] + 1
+                    queue.append(j)
+    return dist
+
+
+def make_queries(tiles, count, rng):
+    """ count 為 None 時回傳所有 (起點, 終點) 組合；否則抽 count/GOALS_PER_START 個起點，每個配 GOALS_PER_START 個終點 """
+    if count is None:
+        return [(start, goal) for start in tiles for goal in tiles]
+    queries = []
+    for _ in range(max(1, count // GOALS_PER_START)):
+        start = rng.choice(tiles)
+        queries += [(start, rng.choice(tiles)) for _ in range(GOALS_PER_START)]
+    return queries
+
+
+def build_solvers(names, map_strings, grid, tile_count, rng):
+    """ 每種搜尋方式包成 (找路函式, 取得展開節點數的函式)；不適用的回傳 None。DFS 的鄰居順序使用 rng """
+    solvers = {}
+    graph = None
+    for name in names:
+        kind, _, algorithm = name.partition(".")
+        if kind == "tile":
+            ghost = Ghost(0, 0, WHITE, ai_mode=None, chosen_algorithm=algorithm, rng=rng)
+            solvers[name] = (lambda s, g, ghost=ghost: ghost.find_path(s, g, grid),
+                             lambda ghost=ghost: ghost.last_expanded)
+        elif kind == "graph":
+            if graph is None:
+                graph = JunctionGraph(grid)
+            solvers[name] = (lambda s, g, algorithm=algorithm: graph.find_path(s, g, algorithm, rng=rng),
+                             lambda: graph.last_expanded)
+        elif kind == "navtable" and tile_count <= NAV_TABLE_MAX_TILES:
+            table = NavTable(map_strings)
+            solvers[name] = (table.path, lambda: 0)
+    return solvers
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def run_solver(find_path, expanded, queries, optimal, rng, seed):
+    rng.seed(seed)
+    times = []
+    nodes = 0
+    ratios = []
+    failures = 0
+    for (start, goal), best in zip(queries, optimal):
+        t0 = time.perf_counter()
+        path = find_path(start, goal)
+        times.append(time.perf_counter() - t0)
+        nodes += expanded()
+        if path is None:
+            failures += 1
+        elif best:
+            ratios.append((len(path) - 1) / best)
+
+    # 記憶體峰值另外量 (tracemalloc 開著會讓計時失真)
+    rng.seed(seed)
+    tracemalloc.start()
+    peak = 0
+    for start, goal in queries[:PEAK_SAMPLE]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        find_path(start, goal)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "queries": len(queries),
+        "us_per_query": sum(times) / len(times) * 1e6,
+        "p50_us": percentile(times, 50) * 1e6,
+        "p95_us": percentile(times, 95) * 1e6,
+        "nodes_per_query": nodes / len(queries),
+        "length_ratio_mean": sum(ratios) / len(ratios) if ratios else 1.0,
+        "length_ratio_max": max(ratios, default=1.0),
+        "failures": failures,
+        "peak_kb": peak / 1024,
+    }
+
+
+def benchmark_maze(name, map_strings, solver_names, query_count, seed, log):
+    grid = Grid(map_strings)
+    tiles = open_tiles(grid)
+    queries = make_queries(tiles, query_count, random.Random(seed))
+
+    # 標準答案：同一個起點只跑一次 BFS
+    optimal = []
+    distances = {}
+    for start, goal in queries:
+        if start not in distances:
+            distances = {start: bfs_distances(grid, grid.index(*start))}
+        optimal.append(distances[start][grid.index(*goal)])
+
+    log(f"{name}: {grid.width}x{grid.height}, {len(tiles)} open tiles, {len(queries)} queries")
+    results = {}
+    rng = random.Random()
+    for solver_name, (find_path, expanded) in build_solvers(solver_names, map_strings, grid, len(tiles), rng).items():
+        results[solver_name] = run_solver(find_path, expanded, queries, optimal, rng, seed)
+        log(f"  {solver_name:<13}{results[solver_name]['us_per_query']:>12.1f} us/query")
+    return results
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def compare(results, baseline, tolerance):
+    """ 與基準比較，回傳退步項目的說明 """
+    regressions = []
+    for maze, solvers in results.items():
+        for solver, row in solvers.items():
+            base = baseline.get(maze, {}).get(solver)
+            if base is None:
+                continue
+            checks = [
+                ("us_per_query", row["us_per_query"] > base["us_per_query"] * (1 + tolerance)),
+                ("nodes_per_query", row["nodes_per_query"] > base["nodes_per_query"] * (1 + NODE_TOLERANCE)),
+                ("length_ratio_mean", row["length_ratio_mean"] > base["length_ratio_mean"] + RATIO_TOLERANCE),
+                ("failures", row["failures"] > base["failures"]),
+                ("peak_kb", row["peak_kb"] > base["peak_kb"] * (1 + tolerance)),
+            ]
+            for metric, worse in checks:
+                if worse:
+                    regressions.append(f"{maze} {solver} {metric}: {base[metric]:.3f} -> {row[metric]:.3f}")
+    return regressions
+
+
+def print_table(results):
+    header = f"{'maze':<14}{'solver':<14}{'us/query':>11}{'p95 us':>11}{'nodes':>10}{'len ratio':>11}{'fail':>6}{'peak KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for maze, solvers in results.items():
+        for solver, r in solvers.items():
+            print(f"{maze:<14}{solver:<14}{r['us_per_query']:>11.1f}{r['p95_us']:>11.1f}{r['nodes_per_query']:>10.1f}"
+                  f"{r['length_ratio_mean']:>11.3f}{r['failures']:>6}{r['peak_kb']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ghost pathfinding on the classic map and generated mazes.")
+    parser.add_argument("--sizes", nargs="*", default=DEFAULT_SIZES, help="generated maze sizes, WIDTHxHEIGHT")
+    parser.add_argument("--no-classic", action="store_true", help="skip the shipped MAP_STRINGS layout")
+    parser.add_argument("--classic-pairs", type=int, default=0,
+                        help="sample this many start/goal pairs on the classic map (0 = every pair)")
+    parser.add_argument("--queries", type=int, default=100, help="queries per generated maze (fewer on very large mazes)")
+    parser.add_argument("--solvers", nargs="+", choices=ALL_SOLVERS, default=ALL_SOLVERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a baseline file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown / memory growth")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    mazes = []
+    if not args.no_classic:
+        mazes.append(("classic", MAP_STRINGS, args.classic_pairs or None))
+    for size in args.sizes:
+        width, height = parse_size(size)
+        count = max(MIN_QUERIES, min(args.queries, QUERY_BUDGET_CELLS // (width * height)))
+        mazes.append((f"gen-{width}x{height}", generate_maze(width, height, seed=args.seed), count))
+
+    results = {}
+    for name, map_strings, count in mazes:
+        results[name] = benchmark_maze(name, map_strings, args.solvers, count, args.seed, log)
+    print_table(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("seed") != args.seed:
+            log(f"warning: baseline was recorded with seed {baseline.get('seed')}")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nno regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+# game.py
+import random
+from settings import *
+from player import Player
+from ghost import Ghost
+from grid import CODE_WALL
+from navigation import load_junction_graph
+from profiler import NULL_PROFILER
+from level import classic_level
+from pellets import PelletIndex
+from logger import Logger
+from spatial import TileIndex, grid_tile, pixel_tile, swept_distance
+
+# Ghost 上累計的 AI 統計欄位
+GHOST_STATS = ["ai_decisions", "ai_time", "full_searches"]
+
+# 四隻鬼的顏色、個性與出門前等待的時間 (毫秒)，順序同 Level.ghost_homes
+GHOST_SPECS = [
+    (RED, AI_CHASE_BLINKY, 0),
+    (PINK, AI_CHASE_PINKY, 3000),
+    (CYAN, AI_CHASE_INKY, 6000),
+    (ORANGE, AI_CHASE_CLYDE, 9000),
+]
+
+# Game.snapshot 保存的純量欄位
+SNAPSHOT_FIELDS = ("frame", "time_ms", "game_state", "player_lives", "current_level", "frightened_mode",
+                   "frightened_start_time", "global_ghost_mode", "last_mode_switch_time", "catches")
+
+
+class GameSnapshot:
+    """ Game.snapshot() 的結果。地圖只記「被吃掉的格子列表與當時的長度」，不複製整張地圖 """
+    __slots__ = ("values", "rng_state", "player", "ghosts", "swarm", "level", "eaten_log", "eaten_count")
+
+    def __init__(self, values, rng_state, player, ghosts, swarm, level, eaten_log, eaten_count):
+        self.values = values
+        self.rng_state = rng_state
+        self.player = player
+        self.ghosts = ghosts
+        self.swarm = swarm
+        self.level = level
+        self.eaten_log = eaten_log
+        self.eaten_count = eaten_count
+
+
+class Game:
+    """ 不依賴視窗的遊戲邏輯。
+
+    每呼叫一次 step() 就推進一個邏輯幀 (frame_ms 毫秒)，
+    所有計時都使用模擬時間，不讀取 pygame.time.get_ticks()，
+    因此可以在沒有顯示器的環境下以遠快於即時的速度模擬。
+    所有亂數都來自以 seed 建立的 self.rng，同樣的 seed 加上同樣的輸入一定會得到同樣的結果。
+    """
+
+    def __init__(self, algorithm=ALGO_ASTAR, on_log=None, frame_ms=FRAME_MS, use_nav_table=True, use_nav_graph=True,
+                 use_plan_cache=True, horde=0, profiler=NULL_PROFILER, level=None, seed=None, levels=None,
+                 planner=None, ai_budget_ms=AI_FRAME_BUDGET_MS, logger=None):
+        self.selected_algorithm = algorithm
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.frame_ms = frame_ms
+        self.use_nav_table = use_nav_table
+        self.use_nav_graph = use_nav_graph
+        self.use_plan_cache = use_plan_cache
+        self.horde = horde  # 額外的向量化鬼魂數量 (0 = 只有經典四隻)
+        self.profiler = profiler  # 各區段耗時 (profiler.FrameProfiler)，預設不量測
+        self.planner_mode = planner  # None = 在遊戲迴圈裡同步搜尋；"thread" / "process" / "budget" 見 planner.py
+        self.ai_budget_ms = ai_budget_ms  # budget 模式每幀給鬼魂搜尋的毫秒數
+        self.planner = None
+
+        # 模擬時鐘
+        self.frame = 0
+        self.time_ms = 0
+
+        # 日誌 (logger.Logger)：最近幾筆給畫面上的面板，過濾與輸出由 logger 的設定決定
+        self.logger = logger if logger is not None else Logger()
+        if on_log:
+            self.logger.sinks.append(lambda record: on_log(record.format()))  # 舊介面：收到格式化好的文字
+        self.eaten_tiles = []  # 本幀被吃掉的豆子座標 (給繪圖層擦除用)
+        # levels 是關卡包 (levelpack.LevelPack 或 Level 列表)：第 n 關使用第 (n-1) % len(levels) 個關卡
+        self.levels = levels
+        self.load_level(levels[0] if levels else level or classic_level())
+
+        self.player_lives = MAX_LIVES
+        self.current_level = 1
+        self.game_state = GAME_STATE_START
+
+        self.player = None
+        self.ghosts = []
+        self.swarm = None
+        self.ghost_tiles = TileIndex()  # 鬼魂最後停留的格子 (互相阻擋用，鬼魂移動時即時更新)
+        self.actor_cells = TileIndex()  # 鬼魂目前像素位置所在的格子 -> 鬼魂編號 (碰撞用，每幀重建)
+        self.frightened_mode = False
+        self.frightened_start_time = 0
+        self.global_ghost_mode = MODE_SCATTER
+        self.last_mode_switch_time = 0
+
+        # 統計資料 (批次模擬用)
+        self.catches = 0
+        self.retired_stats = dict.fromkeys(GHOST_STATS, 0)
+
+        self.init_level(new_level=True)
+
+    @property
+    def total_pellets(self):
+        """ 剩下的一般豆子 (吃光就過關) """
+        return self.pellets.pellets
+
+    def log_message(self, message, category=LOG_CAT_SYSTEM, level=LOG_INFO):
+        self.logger.log(message, category, level, self.time_ms, self.frame)
+
+    def ghost_log(self, message, level=LOG_INFO):
+        """ 鬼魂的 on_log """
+        self.logger.log(message, LOG_CAT_GHOST, level, self.time_ms, self.frame)
+
+    def load_level(self, level):
+        """ 換地圖：建立格子與導航資料 (編譯過的關卡直接使用 mmap 裡的資料) """
+        self.level = level
+        self.game_map = level.make_grid()
+        # 剩餘豆子的索引：玩家吃豆子時 (Grid.eat) 更新，reset 時補回來。編譯過的關卡直接用檔案裡的位元集
+        self.pellets = self.game_map.pellet_index = PelletIndex(self.game_map, pellet_bits=level.pellet_bits,
+                                                                pellet_count=level.pellet_count)
+        # 大型地圖不建全點對表 (大小是格子數的平方)，改成在路口圖上做有展開上限的搜尋
+        small_map = self.game_map.width * self.game_map.height - self.game_map.count(CODE_WALL) <= NAV_TABLE_MAX_TILES
+        self.nav_table = level.load_nav_table() if self.use_nav_table and small_map else None
+        self.nav_graph = load_junction_graph(self.game_map) if self.use_nav_graph else None
+        self.search_budget = None if small_map else SEARCH_NODE_BUDGET
+        if self.planner_mode:
+            from planner import make_planner
+            if self.planner:
+                self.planner.close()
+            self.planner = make_planner(self.game_map, self.nav_graph, self.search_budget, mode=self.planner_mode,
+                                        budget_ms=self.ai_budget_ms)
+
+    def init_level(self, new_level=False):
+        """ 初始化關卡：重置地圖、豆子、玩家和鬼的位置 """
+        if new_level:
+            # 如果是新關卡，重置地圖 (把豆子補回來)；關卡包裡有多個關卡時換到下一張地圖
+            if self.levels:
+                level = self.levels[(self.current_level - 1) % len(self.levels)]
+                if level is not self.level:
+                    self.load_level(level)
+            self.game_map.reset()
+            self.log_message(f"--- Level {self.current_level} Started ---", LOG_CAT_LEVEL)
+        # 如果是死亡重置 (Soft Reset)，地圖不變，只重置實體位置
+
+        # 重置玩家 (分數保留)
+        old_score = 0
+        if self.player: old_score = self.player.score
+        level = self.level
+        self.player = Player(*level.player_spawn)
+        self.player.score = old_score
+
+        # 重置鬼魂 (傳入 selected_algorithm)，先保留舊鬼魂的 AI 統計
+        for ghost in self.ghosts:
+            for name in GHOST_STATS:
+                self.retired_stats[name] += getattr(ghost, name)
+        algo = self.selected_algorithm
+        log = self.ghost_log
+        nav = dict(nav_table=self.nav_table, nav_graph=self.nav_graph, use_plan_cache=self.use_plan_cache,
+                   house_exit_y=level.house_exit_y, search_budget=self.search_budget, rng=self.rng,
+                   planner=self.planner)
+        self.ghosts[:] = [
+            Ghost(home[0], home[1], color, ai_mode=ai_mode, chosen_algorithm=algo, scatter_point=scatter_path,
+                  in_house=True, delay=delay, on_log=log, **nav)
+            for (color, ai_mode, delay), home, scatter_path in zip(GHOST_SPECS, level.ghost_homes, level.scatter_paths)
+        ]
+
+        # 大量鬼魂模式：用陣列一次更新 (需要 NumPy，只有開啟時才載入)
+        if self.horde:
+            from swarm import Swarm
+            import numpy as np
+            scatter_points = [path[0] for path in level.scatter_paths]
+            spawn = (int(level.player_spawn[0]), level.player_spawn[1])
+            self.swarm = Swarm(self.game_map, self.horde, scatter_points, home_tile=level.ghost_homes[0],
+                               exit_y=level.house_exit_y, spawn_away_from=spawn,
+                               rng=np.random.default_rng(self.rng.getrandbits(32)))
+
+        if new_level:
+            self.log_message(f"Total pellets: {self.total_pellets}", LOG_CAT_LEVEL)
+
+    def step(self, inputs=None):
+        """ 推進一幀。inputs 為玩家本幀按下的方向 (dx, dy)，沒有輸入則為 None。回傳目前遊戲狀態 """
+        self.frame += 1
+        self.time_ms += self.frame_ms
+        self.eaten_tiles.clear()
+
+        if self.game_state == GAME_STATE_START:
+            # 準備開始：按下方向鍵才開始
+            if inputs:
+                self.game_state = GAME_STATE_PLAYING
+                self.last_mode_switch_time = self.time_ms
+                self.log_message(f"Level {self.current_level} Start! Algo: {self.selected_algorithm}", LOG_CAT_LEVEL)
+                self.player.next_direction = inputs
+        elif self.game_state == GAME_STATE_PLAYING:
+            if inputs:
+                self.player.next_direction = inputs
+
+        if self.game_state == GAME_STATE_PLAYING:
+            self.update()
+        return self.game_state
+
+    def update(self):
+        """ 遊戲進行中的邏輯：模式計時、鬼魂、玩家、過關與碰撞 """
+        current_time = self.time_ms
+        player = self.player
+        ghosts = self.ghosts
+        profiler = self.profiler
+
+        # Ghost Mode Switch logic
+        if not self.frightened_mode:
+            time_passed = current_time - self.last_mode_switch_time
+            if self.global_ghost_mode == MODE_SCATTER and time_passed > SCATTER_DURATION:
+                self.global_ghost_mode = MODE_CHASE
+                self.last_mode_switch_time = current_time
+                self.log_message(">> Mode Switch: CHASE", LOG_CAT_MODE)
+            elif self.global_ghost_mode == MODE_CHASE and time_passed > CHASE_DURATION:
+                self.global_ghost_mode = MODE_SCATTER
+                self.last_mode_switch_time = current_time
+                self.log_message(">> Mode Switch: SCATTER", LOG_CAT_MODE)
+
+        # 這一幀開始前的位置 (掃掠碰撞用)
+        player_from = (player.pixel_x, player.pixel_y)
+        ghosts_from = [(ghost.pixel_x, ghost.pixel_y) for ghost in ghosts]
+
+        # Ghost Updates
+        blinky_pos_for_inky = (ghosts[0].grid_x, ghosts[0].grid_y) # Assume index 0 is blinky
+        self.ghost_tiles.rebuild(ghosts, grid_tile)
+        for ghost in ghosts:
+            if (not ghost.is_frightened and not ghost.is_eaten and ghost.current_ai_mode not in [MODE_GO_HOME, MODE_EXIT_HOUSE, MODE_WAITING]):
+                if self.global_ghost_mode == MODE_SCATTER: ghost.current_ai_mode = MODE_SCATTER
+                elif self.global_ghost_mode == MODE_CHASE: ghost.current_ai_mode = ghost.ai_mode
+            start = profiler.start()
+            ghost.update(self.game_map, player, ghosts, self.frame_ms, self.global_ghost_mode, blinky_pos_for_inky,
+                         self.ghost_tiles)
+            profiler.stop("ghost." + ghost.chosen_algorithm, start)
+        if self.planner:
+            start = profiler.start()
+            self.planner.run()
+            profiler.stop("planner", start)
+        if self.swarm:
+            start = profiler.start()
+            if not self.frightened_mode:
+                self.swarm.set_global_mode(self.global_ghost_mode)
+            self.swarm.update(player, blinky_pos_for_inky, self.global_ghost_mode)
+            profiler.stop("swarm", start)
+
+        # Frightened Timer
+        if self.frightened_mode:
+            if current_time - self.frightened_start_time > FRIGHTENED_DURATION:
+                self.frightened_mode = False
+                self.log_message("Frightened mode ended.", LOG_CAT_MODE)
+                for ghost in ghosts: ghost.end_frightened()
+                if self.swarm: self.swarm.end_frightened(self.global_ghost_mode)
+                self.last_mode_switch_time = current_time
+
+        # Player Update
+        start = profiler.start()
+        player_status = player.update(self.game_map)
+        profiler.stop("player", start)
+        if player_status in [EVENT_ATE_PELLET, EVENT_ATE_POWER_PELLET]:
+            self.eaten_tiles.append((player.grid_x, player.grid_y))
+        if player_status == EVENT_ATE_PELLET:
+            player.score += PELLELETS_POINT
+        elif player_status == EVENT_ATE_POWER_PELLET:
+            player.score += POWER_PELLET_POINT
+            self.frightened_mode = True
+            self.frightened_start_time = current_time
+            self.log_message("Ghosts Frightened!", LOG_CAT_MODE)
+            for ghost in ghosts: ghost.start_frightened()
+            if self.swarm: self.swarm.start_frightened()
+
+        # --- 進階下一關邏輯 ---
+        if self.total_pellets <= 0:
+            self.log_message("Level Cleared!", LOG_CAT_LEVEL)
+            self.current_level += 1
+            # 加命 (最多3)
+            if self.player_lives < MAX_LIVES:
+                self.player_lives += 1
+                self.log_message("Extra Life Gained!", LOG_CAT_LEVEL)
+
+            # 重新開始下一關 (保留分數，重置地圖)
+            self.reset_round(new_level=True)
+            return
+
+        # 碰撞偵測 (處理扣命)
+        start = profiler.start()
+        caught = False
+        if self.swarm:
+            eaten, caught = self.swarm.collide(player, player_from)
+            player.score += eaten * GHOST_POINT
+        # 只檢查玩家附近 3x3 格內的鬼 (依原本的順序)
+        player_to = (player.pixel_x, player.pixel_y)
+        self.actor_cells.rebuild(range(len(ghosts)), lambda i: pixel_tile(ghosts[i]))
+        for i in sorted(self.actor_cells.around(pixel_tile(player))):
+            if caught: break
+            ghost = ghosts[i]
+            distance = swept_distance(player_from, player_to, ghosts_from[i], (ghost.pixel_x, ghost.pixel_y))
+            collision_distance = player.radius + ghost.radius
+
+            if distance < collision_distance:
+                if ghost.is_frightened:
+                    ghost.eat()
+                    player.score += GHOST_POINT
+                elif not ghost.is_eaten:
+                    caught = True
+        profiler.stop("collision", start)
+        if caught:
+            self.player_caught()
+
+    def player_caught(self):
+        """ 被鬼抓到 -> 扣命 """
+        self.catches += 1
+        self.player_lives -= 1
+        self.log_message(f"Hit! Lives left: {self.player_lives}", LOG_CAT_LEVEL, LOG_WARNING)
+
+        if self.player_lives > 0:
+            # 還有命：軟重置 (保留地圖與豆子)
+            self.reset_round(new_level=False)
+        else:
+            # 沒命了：Game Over
+            self.game_state = GAME_STATE_GAME_OVER
+            self.log_message("No lives left. Game Over.", LOG_CAT_LEVEL, LOG_WARNING)
+
+    def ai_stats(self):
+        """ 回傳鬼魂 AI 統計的總和 (GHOST_STATS 各欄位)，包含已被重置的鬼魂 """
+        return {name: self.retired_stats[name] + sum(getattr(ghost, name) for ghost in self.ghosts)
+                for name in GHOST_STATS}
+
+    def full_searches_per_second(self):
+        """ 每秒 (模擬時間) 完整路徑搜尋的次數 """
+        if self.time_ms <= 0:
+            return 0.0
+        return self.ai_stats()["full_searches"] / (self.time_ms / 1000)
+
+    def close(self):
+        """ 結束背景的路徑規劃 (沒有使用規劃器時什麼都不做) """
+        if self.planner:
+            self.planner.close()
+            self.planner = None
+
+    def snapshot(self):
+        """ 目前狀態的快照 (搜尋、自動駕駛的模擬與倒帶用)。
+
+        不包含日誌與 AI 統計；使用規劃器的遊戲不能快照 (請求在背景執行，結果取決於時間)。
+        """
+        if self.planner:
+            raise ValueError("games using the async planner cannot be snapshotted")
+        log = self.game_map.eaten_log
+        return GameSnapshot(tuple(getattr(self, name) for name in SNAPSHOT_FIELDS), self.rng.getstate(),
+                            self.player.get_state(), [ghost.get_state() for ghost in self.ghosts],
+                            self.swarm.get_state() if self.swarm else None, self.level, log, len(log))
+
+    def restore(self, snap):
+        """ 回到 snapshot() 的狀態。快照也可以來自另一場參數相同的遊戲 (同樣的關卡物件) """
+        if self.planner:
+            raise ValueError("games using the async planner cannot be restored")
+        if snap.level is not self.level:
+            self.load_level(snap.level)
+            self.init_level()  # 角色要用新地圖的導航資料重建
+        grid = self.game_map
+        log, count = snap.eaten_log, snap.eaten_count
+        if grid.eaten_log is log and len(log) >= count:
+            # 同一回合往回倒：只把快照之後吃掉的豆子放回去。換成新的列表，其他較晚的快照拿的舊列表才不會被改掉
+            if len(log) > count:
+                for index in reversed(log[count:]):
+                    grid.uneat(index)
+                grid.eaten_log = log[:count]
+        else:
+            grid.reset()
+            for index in log[:count]:
+                grid.eat(index)
+
+        for name, value in zip(SNAPSHOT_FIELDS, snap.values):
+            setattr(self, name, value)
+        self.rng.setstate(snap.rng_state)
+        self.player.set_state(snap.player)
+        for ghost, state in zip(self.ghosts, snap.ghosts):
+            ghost.set_state(state)
+        if self.swarm:
+            self.swarm.set_state(snap.swarm)
+        self.eaten_tiles.clear()
+
+    def reset_round(self, new_level):
+        """ 回到 Ready 狀態並重置鬼魂模式 """
+        self.game_state = GAME_STATE_START
+        self.frightened_mode = False
+        self.global_ghost_mode = MODE_SCATTER
+        self.init_level(new_level=new_level)
@@ -1,13 +1,19 @@
 # ghost.py
-import pygame
 import random
 import math
+import time
 from settings import *
-from queue import PriorityQueue, Queue # <--- 新增 Queue
+from grid import *
+from heapq import heappush, heappop
+from collections import deque
+from search import run_search
+
+# 搜尋時展開鄰居的順序
+NEIGHBOR_ORDER = [(1, 0), (-1, 0), (0, 1), (0, -1)]
 
 class Ghost:
     # 1. 修改 __init__ 接收 chosen_algorithm
-    def __init__(self, grid_x, grid_y, color, ai_mode, chosen_algorithm, scatter_point=None, in_house=False, delay=0, on_log=None):
+    def __init__(self, grid_x, grid_y, color, ai_mode, chosen_algorithm, scatter_point=None, in_house=False, delay=0, on_log=None, nav_table=None, nav_graph=None, use_plan_cache=True, house_exit_y=11, search_budget=None, rng=random, planner=None):
         self.grid_x = grid_x
         self.grid_y = grid_y
         self.home_pos = (grid_x, grid_y)
@@ -49,18 +55,62 @@ class Ghost:
         self.is_eaten = False
 
         self.on_log = on_log
-
-    def draw(self, surface):
+        self.nav_table = nav_table # 預先算好的最短路徑表 (navigation.NavTable)，None 表示每次都搜尋
+        self.nav_graph = nav_graph # 路口圖 (navigation.JunctionGraph)，None 表示逐格搜尋
+        self.search_budget = search_budget # 路口圖搜尋最多展開幾個節點 (大型地圖用)，None 表示不限
+        self.house_exit_y = house_exit_y # 出門時走到這一列就算出了鬼屋
+        self.rng = rng # DFS 鄰居順序與出門方向用的亂數 (每場遊戲各自一個，才能重播)
+
+        # AI 決策統計 (次數與花費的 CPU 秒數)
+        self.ai_decisions = 0
+        self.ai_time = 0.0
+
+        # 路徑計畫快取 (目前的路徑、走到第幾格、修補次數) 與完整搜尋次數
+        self.use_plan_cache = use_plan_cache
+        self.plan = None
+        self.plan_index = 0
+        self.plan_repairs = 0
+        self.plan_partial = False  # 目前的計畫是否只走到半路 (搜尋預算用完)
+        self.full_searches = 0
+        self.last_expanded = 0  # 上一次逐格搜尋展開的節點數 (效能測試用)
+
+        # 非同步規劃 (planner.Planner)：完整搜尋改成送出請求，走到下一格中心時再取結果
+        self.planner = planner
+        self.plan_request = None  # 還沒取回的請求 (Future)
+        self.plan_wanted = None   # 這一格需要完整搜尋但還沒有結果：決定方向後要送出請求的終點
+
+    def get_state(self):
+        """ 會隨遊戲改變的欄位 (Game.snapshot 用；計畫會被就地修補，所以複製一份) """
+        return (self.grid_x, self.grid_y, self.pixel_x, self.pixel_y, self.speed, self.direction,
+                self.current_ai_mode, self.delay, self.scatter_index, self.target, self.is_frightened,
+                self.is_eaten, self.plan and list(self.plan), self.plan_index, self.plan_repairs, self.plan_partial)
+
+    def set_state(self, state):
+        (self.grid_x, self.grid_y, self.pixel_x, self.pixel_y, self.speed, self.direction, self.current_ai_mode,
+         self.delay, self.scatter_index, self.target, self.is_frightened, self.is_eaten, plan, self.plan_index,
+         self.plan_repairs, self.plan_partial) = state
+        self.plan = plan and list(plan)
+
+    def draw(self, surface, offset=(0, 0)):
+        import pygame
+        x = self.pixel_x - offset[0]
+        y = self.pixel_y - offset[1]
         if self.is_eaten:
             eye_radius = self.radius // 2
             eye_offset = self.radius // 3
-            pygame.draw.circle(surface, WHITE, (self.pixel_x - eye_offset, self.pixel_y), eye_radius)
-            pygame.draw.circle(surface, WHITE, (self.pixel_x + eye_offset, self.pixel_y), eye_radius)
+            pygame.draw.circle(surface, WHITE, (x - eye_offset, y), eye_radius)
+            pygame.draw.circle(surface, WHITE, (x + eye_offset, y), eye_radius)
         else:
             draw_color = self.color
             if self.is_frightened:
                 draw_color = FRIGHTENED_BLUE
-            pygame.draw.circle(surface, draw_color, (self.pixel_x, self.pixel_y), self.radius)
+            pygame.draw.circle(surface, draw_color, (x, y), self.radius)
+
+    def get_rect(self):
+        """ 畫面上佔用的範圍 (局部更新畫面用)，眼睛也在這個範圍內 """
+        import pygame
+        size = self.radius * 2 + 4
+        return pygame.Rect(int(self.pixel_x) - self.radius - 2, int(self.pixel_y) - self.radius - 2, size, size)
 
     def eat(self):
         if self.on_log:
@@ -102,18 +152,30 @@ class Ghost:
 
     # --- 演算法區域 ---
 
-    def heuristic(self, a, b):
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
     # 1. A* (保持不變)
     def A_star(self, start, goal, game_map):
-        open_set = PriorityQueue()
-        open_set.put((0, start))
+        return run_search(self.A_star_steps(start, goal, game_map))
+
+    # 2. BFS (廣度優先 - 新增) 
+    def BFS(self, start, goal, game_map):
+        return run_search(self.BFS_steps(start, goal, game_map))
+
+    # 3. DFS (深度優先 - 新增) 
+    def DFS(self, start, goal, game_map):
+        return run_search(self.DFS_steps(start, goal, game_map))
+
+    # 三種逐格搜尋的可暫停版本 (見 search.py)：每展開一個節點前 yield，送 True 進來就回傳部分路徑
+    def A_star_steps(self, start, goal, game_map):
+        open_set = [(0, start)]
         came_from = {}
         g_score = {start: 0}
+        self.last_expanded = 0
 
-        while not open_set.empty():
-            _, current = open_set.get()
+        while open_set:
+            if (yield):
+                return self.closest_path(came_from, start, goal, game_map)
+            _, current = heappop(open_set)
+            self.last_expanded += 1
             if current == goal:
                 return self.reconstruct_path(came_from, current)
 
@@ -121,22 +183,22 @@ class Ghost:
                 tentative = g_score[current] + 1
                 if (nx, ny) not in g_score or tentative < g_score[(nx, ny)]:
                     g_score[(nx, ny)] = tentative
-                    priority = tentative + self.heuristic((nx, ny), goal)
-                    open_set.put((priority, (nx, ny)))
+                    priority = tentative + game_map.wrap_distance((nx, ny), goal)
+                    heappush(open_set, (priority, (nx, ny)))
                     came_from[(nx, ny)] = current
         return None
 
-    # 2. BFS (廣度優先 - 新增) 
-
-
-    def BFS(self, start, goal, game_map):
-        queue = Queue()
-        queue.put(start)
+    def BFS_steps(self, start, goal, game_map):
+        queue = deque([start])
         came_from = {}
         visited = {start} 
+        self.last_expanded = 0
 
-        while not queue.empty():
-            current = queue.get()
+        while queue:
+            if (yield):
+                return self.closest_path(came_from, start, goal, game_map)
+            current = queue.popleft()
+            self.last_expanded += 1
             if current == goal:
                 return self.reconstruct_path(came_from, current)
             
@@ -144,23 +206,26 @@ class Ghost:
                 if (nx, ny) not in visited:
                     visited.add((nx, ny))
                     came_from[(nx, ny)] = current
-                    queue.put((nx, ny))
+                    queue.append((nx, ny))
         return None
 
-    # 3. DFS (深度優先 - 新增) 
-    def DFS(self, start, goal, game_map):
+    def DFS_steps(self, start, goal, game_map):
         stack = [start]
         came_from = {}
         visited = {start}
+        self.last_expanded = 0
 
         while stack:
+            if (yield):
+                return self.closest_path(came_from, start, goal, game_map)
             current = stack.pop()
+            self.last_expanded += 1
             if current == goal:
                 return self.reconstruct_path(came_from, current)
             
             # 隨機打亂鄰居順序，讓 DFS 比較不僵硬
             neighbors = self.get_neighbors(current, game_map)
-            random.shuffle(neighbors)
+            self.rng.shuffle(neighbors)
             
             for nx, ny in neighbors:
                 if (nx, ny) not in visited:
@@ -169,14 +234,123 @@ class Ghost:
                     stack.append((nx, ny))
         return None
 
+    def closest_path(self, came_from, start, goal, game_map):
+        """ 搜尋被中途停下時的部分路徑：通往已發現格子中離終點最近的那一格 """
+        best = min(came_from, key=lambda tile: game_map.wrap_distance(tile, goal), default=start)
+        if game_map.wrap_distance(start, goal) <= game_map.wrap_distance(best, goal):
+            return [start]
+        return self.reconstruct_path(came_from, best)
+
+    def find_path(self, start, goal, game_map):
+        """ 依 chosen_algorithm 找路；有路口圖時在壓縮過的路口圖上搜尋，否則逐格搜尋 """
+        return run_search(self.search_steps(start, goal, game_map))
+
+    def search_steps(self, start, goal, game_map):
+        """ find_path 的可暫停版本 (generator，見 search.py) """
+        if self.nav_graph:
+            return self.nav_graph.search_steps(start, goal, self.chosen_algorithm, rng=self.rng,
+                                               max_expanded=self.search_budget)
+        if self.chosen_algorithm == ALGO_ASTAR:
+            return self.A_star_steps(start, goal, game_map)
+        elif self.chosen_algorithm == ALGO_BFS:
+            return self.BFS_steps(start, goal, game_map)
+        elif self.chosen_algorithm == ALGO_DFS:
+            return self.DFS_steps(start, goal, game_map)
+        return iter(())
+
+    def next_plan_step(self, start, goal, game_map):
+        """ 沿用目前的路徑計畫，回傳下一格 (沒有路或已到達回傳 None)。
+
+        起點沿著計畫前進、或終點只移動一格時就地修補計畫；
+        計畫失效 (或修補太多次) 才重新完整搜尋一次。
+        """
+        plan = self.plan if self.use_plan_cache else None
+        if plan is not None and plan[self.plan_index] != start:
+            if self.plan_index + 1 < len(plan) and plan[self.plan_index + 1] == start:
+                self.plan_index += 1
+            else:
+                plan = None
+        if plan is not None and plan[-1] != goal:
+            if self.plan_partial and self.plan_index + 1 < len(plan):
+                self.plan_repairs += 1  # 搜尋預算用完的部分路徑：先沿著走，走完 (或走太久) 再重新搜尋
+            else:
+                plan = self.repair_plan(goal, game_map)
+        if plan is None or self.plan_repairs > MAX_PLAN_REPAIRS:
+            if self.planner is not None:
+                plan = self.take_planned(start, goal)
+            else:
+                plan = self.find_path(start, goal, game_map)
+                self.full_searches += 1
+            self.plan_index = 0
+            self.plan_repairs = 0
+            self.plan_partial = plan is not None and plan[-1] != goal
+        self.plan = plan
+
+        if plan and self.plan_index + 1 < len(plan):
+            return plan[self.plan_index + 1]
+        return None
+
+    def take_planned(self, start, goal):
+        """ 取出規劃器算好、從 start 出發的路徑；還沒好 (過了期限) 時，budget 模式取目前最好的部分路徑，
+        其他模式取消請求，回傳 None 讓這一格用貪婪選擇
+        """
+        request = self.plan_request
+        self.plan_request = None
+        if request is not None:
+            if request.done() or self.planner.anytime:
+                plan = request.result()
+                if plan and plan[0] == start:
+                    return plan
+            else:
+                request.cancel()
+        self.plan_wanted = goal
+        return None
+
+    def request_plan(self, game_map):
+        """ 從這一步要走到的下一格送出搜尋請求，結果在那一格的中心取用 """
+        x, y = game_map.neighbor(self.grid_x, self.grid_y, self.direction)
+        self.plan_request = self.planner.submit((x, y), self.plan_wanted, self.chosen_algorithm,
+                                                self.rng.getrandbits(32), owner=self.ai_mode)
+        self.plan_wanted = None
+        self.full_searches += 1
+
+    def repair_plan(self, goal, game_map):
+        """ 終點移動後修補計畫：終點在計畫上就截斷，和計畫上較前面的格子相鄰就接在最早相鄰的那一格後面。
+        只和計畫的終點相鄰 (往外走一格) 時別的路線可能更短：A* / BFS 回傳 None 重新搜尋，
+        DFS 的路徑本來就不是最短，直接接上去
+        """
+        plan = self.plan
+        around = set(self.get_neighbors(goal, game_map))
+        for k in range(self.plan_index, len(plan) - 1):
+            node = plan[k]
+            if node == goal:
+                del plan[k + 1:]
+                self.plan_repairs += 1
+                return plan
+            if node in around and goal in self.get_neighbors(node, game_map):
+                del plan[k + 1:]
+                plan.append(goal)
+                self.plan_repairs += 1
+                return plan
+        if self.chosen_algorithm == ALGO_DFS and goal in around and goal in self.get_neighbors(plan[-1], game_map):
+            plan.append(goal)
+            self.plan_repairs += 1
+            return plan
+        return None
+
     def get_neighbors(self, node, game_map):
         x, y = node
-        directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
         neighbors = []
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            if 0 <= ny < len(game_map) and 0 <= nx < len(game_map[0]):
-                if not is_wall(game_map, nx, ny):
+        if game_map.in_bounds(x, y):
+            exits = game_map.exits[ACTOR_NAV][y * game_map.width + x]
+            for direction in NEIGHBOR_ORDER:
+                if exits & DIR_BITS[direction]:
+                    neighbors.append(game_map.neighbor(x, y, direction))
+        else:
+            # 起點在地圖外 (隧道裡)：只能走回地圖內不是牆的格子
+            for dx, dy in NEIGHBOR_ORDER:
+                nx, ny = x + dx, y + dy
+                if game_map.in_bounds(nx, ny) and game_map.tiles[ny * game_map.width + nx] != CODE_WALL:
                     neighbors.append((nx, ny))
         return neighbors
 
@@ -191,34 +365,34 @@ class Ghost:
     def get_distance(self, pos1, pos2):
         return math.hypot(pos1[0] - pos2[0], pos1[1] - pos2[1])
 
-    def get_valid_directions(self, game_map, others):
+    def get_valid_directions(self, game_map, others, spatial=None):
         valid_moves = []
         reverse_dir = (self.direction[0] * -1, self.direction[1] * -1)
+        # 被吃掉或正在出門的鬼魂可以穿過門
+        actor = ACTOR_GHOST_DOOR if self.current_ai_mode in [MODE_EXIT_HOUSE, MODE_GO_HOME] else ACTOR_GHOST
+        exits = game_map.exits_at(actor, int(self.grid_x), int(self.grid_y))
         for move_dir in self.all_directions:
             no_rev = (self.current_ai_mode != MODE_WAITING)
             if no_rev and move_dir == reverse_dir: continue
+            if not exits & DIR_BITS[move_dir]: continue
             next_g_x = int(self.grid_x + move_dir[0])
             next_g_y = int(self.grid_y + move_dir[1])
-            if 0 <= next_g_y < len(game_map):
-                if is_wall(game_map, next_g_x, next_g_y): continue
-                check_x = next_g_x % len(game_map[0])
-                tile = game_map[next_g_y][check_x]
-                if tile == TILE_DOOR:
-                    if self.current_ai_mode not in [MODE_EXIT_HOUSE, MODE_GO_HOME]: continue
-                is_blocked_by_ghost = False
-                if self.current_ai_mode not in [MODE_EXIT_HOUSE, MODE_GO_HOME, MODE_WAITING]:
-                    for ghost in others:
-                        if ghost is not self and ghost.current_ai_mode not in [MODE_EXIT_HOUSE, MODE_GO_HOME, MODE_WAITING]:
-                            if ghost.grid_x == next_g_x and ghost.grid_y == next_g_y:
-                                is_blocked_by_ghost = True
-                                break
-                if is_blocked_by_ghost: continue
-                valid_moves.append(move_dir)
+            is_blocked_by_ghost = False
+            if self.current_ai_mode not in [MODE_EXIT_HOUSE, MODE_GO_HOME, MODE_WAITING]:
+                # 有空間索引時只看目標格上的鬼，否則掃過全部
+                nearby = spatial.at((next_g_x, next_g_y)) if spatial is not None else others
+                for ghost in nearby:
+                    if ghost is not self and ghost.current_ai_mode not in [MODE_EXIT_HOUSE, MODE_GO_HOME, MODE_WAITING]:
+                        if ghost.grid_x == next_g_x and ghost.grid_y == next_g_y:
+                            is_blocked_by_ghost = True
+                            break
+            if is_blocked_by_ghost: continue
+            valid_moves.append(move_dir)
         if not valid_moves: valid_moves.append(reverse_dir)
         return valid_moves
 
     # --- Update 修改：根據 self.chosen_algorithm 決定跑哪個函式 ---
-    def update(self, game_map, player, all_ghosts, dt, global_ghost_mode, blinky_tile=None):
+    def update(self, game_map, player, all_ghosts, dt, global_ghost_mode, blinky_tile=None, spatial=None):
         valid_to_switch = (self.current_ai_mode not in [MODE_GO_HOME, MODE_EXIT_HOUSE, MODE_WAITING]
                            and not self.is_frightened and not self.is_eaten)
 
@@ -256,22 +430,26 @@ class Ghost:
         is_centered_y = (self.pixel_y - (TILE_SIZE // 2)) % TILE_SIZE == 0
 
         if is_centered_x and is_centered_y:
+            old_tile = (self.grid_x, self.grid_y)
             self.grid_x = int((self.pixel_x - (TILE_SIZE // 2)) // TILE_SIZE)
             self.grid_y = int((self.pixel_y - (TILE_SIZE // 2)) // TILE_SIZE)
+            if spatial is not None:
+                spatial.move(self, old_tile, (self.grid_x, self.grid_y))
 
             if self.current_ai_mode == MODE_GO_HOME and (self.grid_x, self.grid_y) == self.home_pos:
                 self.respawn()
 
             if self.current_ai_mode == MODE_EXIT_HOUSE:
-                if self.grid_y <= 11:
+                if self.grid_y <= self.house_exit_y:
                     self.current_ai_mode = self.ai_mode
-                    self.direction = random.choice([(-1, 0), (1, 0)])
+                    self.direction = self.rng.choice([(-1, 0), (1, 0)])
 
             if not self.is_frightened and self.current_ai_mode not in [MODE_GO_HOME, MODE_EXIT_HOUSE, MODE_WAITING]:
                 self.speed = self.default_speed
 
             # AI Pathfinding Decision
             if self.current_ai_mode not in [MODE_GO_HOME, MODE_EXIT_HOUSE, MODE_WAITING]:
+                decision_start = time.perf_counter()
                 target_pos = None
                 
                 # 計算目標點
@@ -285,7 +463,7 @@ class Ghost:
                             self.scatter_index = 0
                             if global_ghost_mode == MODE_CHASE:
                                 self.current_ai_mode = self.ai_mode
-                                if self.on_log: self.on_log(f"{self.color} 繞行結束，開始追逐！")
+                                if self.on_log: self.on_log(f"{self.color} 繞行結束，開始追逐！", LOG_DEBUG)
                     target_pos = self.scatter_path[self.scatter_index]
                 elif self.current_ai_mode == AI_CHASE_BLINKY:
                     target_pos = (player.grid_x, player.grid_y)
@@ -313,24 +491,27 @@ class Ghost:
                 
                 # ★★★ 這裡修改：根據選的演算法來找路 ★★★
                 if self.current_ai_mode != MODE_FRIGHTENED and target_pos:
-                    path = None
-                    if self.chosen_algorithm == ALGO_ASTAR:
-                        path = self.A_star((self.grid_x, self.grid_y), target_pos, game_map)
-                    elif self.chosen_algorithm == ALGO_BFS:
-                        path = self.BFS((self.grid_x, self.grid_y), target_pos, game_map)
-                    elif self.chosen_algorithm == ALGO_DFS:
-                        path = self.DFS((self.grid_x, self.grid_y), target_pos, game_map)
-                    
-                    if path and len(path) > 1:
-                        next_step = path[1]
+                    next_step = None
+                    # BFS 與 A* 都是找最短路，有導航表時直接查表取得第一步
+                    if self.nav_table and self.chosen_algorithm in [ALGO_ASTAR, ALGO_BFS]:
+                        next_dir = self.nav_table.next_direction((self.grid_x, self.grid_y), target_pos)
+                        if next_dir:
+                            self.direction = next_dir
+                            found_path = True
+                    else:
+                        next_step = self.next_plan_step((self.grid_x, self.grid_y), target_pos, game_map)
+
+                    if next_step:
                         dx = next_step[0] - self.grid_x
                         dy = next_step[1] - self.grid_y
+                        # 穿過隧道時下一步在地圖另一側
+                        if abs(dx) > 1: dx = -1 if dx > 0 else 1
                         self.direction = (dx, dy)
                         found_path = True
                 
                 # Fallback (貪婪/隨機)
                 if not found_path:
-                    valid_directions = self.get_valid_directions(game_map, all_ghosts)
+                    valid_directions = self.get_valid_directions(game_map, all_ghosts, spatial)
                     if valid_directions:
                         best_direction = (0, 0)
                         if self.current_ai_mode == MODE_FRIGHTENED: best_distance = float('-inf')
@@ -350,8 +531,15 @@ class Ghost:
                                     best_direction = direction
                         self.direction = best_direction
 
+                if self.plan_wanted is not None:
+                    self.request_plan(game_map)
+
+                self.ai_decisions += 1
+                self.ai_time += time.perf_counter() - decision_start
+
         self.pixel_x += self.direction[0] * self.speed
         self.pixel_y += self.direction[1] * self.speed
 
-        if self.pixel_x < -TILE_SIZE//2: self.pixel_x = SCREEN_WIDTH + TILE_SIZE//2
-        elif self.pixel_x > SCREEN_WIDTH + TILE_SIZE//2: self.pixel_x = -TILE_SIZE//2
\ No newline at end of file
+        map_width = game_map.width * TILE_SIZE
+        if self.pixel_x < -TILE_SIZE//2: self.pixel_x = map_width + TILE_SIZE//2
+        elif self.pixel_x > map_width + TILE_SIZE//2: self.pixel_x = -TILE_SIZE//2
\ No newline at end of file
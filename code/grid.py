@@ -0,0 +1,121 @@
+# grid.py
+from settings import *
+
+# 地圖格子代碼 (直接用符號的 byte 值)
+CODE_WALL = ord(TILE_WALL)
+CODE_DOOR = ord(TILE_DOOR)
+CODE_PELLET = ord(TILE_PELLET)
+CODE_POWER_PELLET = ord(TILE_POWER_PELLET)
+CODE_EMPTY = ord(TILE_EMPTY)
+
+# 每個方向對應的出口位元
+DIR_BITS = {(0, -1): 1, (0, 1): 2, (-1, 0): 4, (1, 0): 8}
+
+# 出口遮罩的角色種類
+ACTOR_PLAYER = 0      # 玩家：不能穿牆、不能進門
+ACTOR_GHOST = 1       # 一般鬼魂：同玩家
+ACTOR_GHOST_DOOR = 2  # 被吃掉 / 正在出門的鬼魂：可以穿過門
+ACTOR_NAV = 3         # 路徑搜尋用：只排除牆壁 (含隧道)
+
+
+class Grid:
+    """ 以一維 bytearray 儲存的地圖，附帶每一格預先算好的合法出口位元遮罩。
+
+    tiles[y * width + x] 是格子代碼；exits[actor][index] 是該角色在這格能走的方向 (DIR_BITS 的組合)。
+    左右邊界的隧道在所有遮罩中都會繞到另一側。
+    pellet_index 是剩餘豆子的索引 (pellets.PelletIndex，Game 建立)，豆子要用 eat() 吃掉才會同步更新；
+    eaten_log 依序記錄這一回合被吃掉的格子 (Game.restore 倒帶時用)。
+    """
+
+    def __init__(self, map_strings):
+        self.width = max(len(row) for row in map_strings)
+        self.height = len(map_strings)
+        # 長度不足的列補空白
+        self.initial_tiles = bytes(
+            "".join(row.ljust(self.width, TILE_EMPTY) for row in map_strings), "ascii")
+        self.tiles = bytearray(self.initial_tiles)
+        self.exits = [bytearray(self.width * self.height) for _ in range(4)]
+        self.pellet_index = None
+        self.eaten_log = []
+        self._build_exits()
+
+    @classmethod
+    def from_arrays(cls, width, height, tiles, exits):
+        """ 由編譯好的關卡資料建立 (tiles 與 exits 可以是 mmap 的唯讀 memoryview，不重算出口遮罩) """
+        grid = cls.__new__(cls)
+        grid.width = width
+        grid.height = height
+        grid.initial_tiles = tiles
+        grid.tiles = bytearray(tiles)
+        grid.exits = exits
+        grid.pellet_index = None
+        grid.eaten_log = []
+        return grid
+
+    def _build_exits(self):
+        width, height, tiles = self.width, self.height, self.tiles
+        player, ghost, ghost_door, nav = self.exits
+        for y in range(height):
+            for x in range(width):
+                i = y * width + x
+                if tiles[i] == CODE_WALL:
+                    continue
+                for (dx, dy), bit in DIR_BITS.items():
+                    nx, ny = x + dx, y + dy
+                    if not (0 <= ny < height):
+                        continue
+                    tile = tiles[ny * width + (nx % width)]
+                    if tile == CODE_WALL:
+                        continue
+                    nav[i] |= bit
+                    ghost_door[i] |= bit
+                    if tile != CODE_DOOR:
+                        player[i] |= bit
+                        ghost[i] |= bit
+
+    def reset(self):
+        """ 把豆子全部補回來 (牆壁不會變，出口遮罩不用重算) """
+        self.tiles[:] = self.initial_tiles
+        self.eaten_log = []  # 換一個新的列表：舊的快照還拿著舊列表
+        if self.pellet_index is not None:
+            self.pellet_index.reset()
+
+    def eat(self, index):
+        """ 吃掉第 index 格的豆子或大力丸，回傳原本的格子代碼 """
+        code = self.tiles[index]
+        self.tiles[index] = CODE_EMPTY
+        self.eaten_log.append(index)
+        if self.pellet_index is not None:
+            self.pellet_index.remove(index % self.width, index // self.width, code)
+        return code
+
+    def uneat(self, index):
+        """ 把第 index 格被吃掉的豆子放回去 (倒帶用，呼叫端負責修改 eaten_log) """
+        code = self.tiles[index] = self.initial_tiles[index]
+        if self.pellet_index is not None:
+            self.pellet_index.add(index % self.width, index // self.width, code)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def index(self, x, y):
+        """ 格子索引。x 超出左右邊界時繞回另一側 (隧道)，y 超出範圍回傳 None """
+        if not (0 <= y < self.height):
+            return None
+        return int(y) * self.width + int(x) % self.width
+
+    def neighbor(self, x, y, direction):
+        """ 往 direction 走一格後的座標 (左右邊界繞回另一側) """
+        return ((x + direction[0]) % self.width, y + direction[1])
+
+    def wrap_distance(self, a, b):
+        """ 考慮隧道的曼哈頓距離 (A* 的可採納啟發值) """
+        dx = abs(a[0] - b[0])
+        return min(dx, self.width - dx) + abs(a[1] - b[1])
+
+    def exits_at(self, actor, x, y):
+        i = self.index(x, y)
+        return 0 if i is None else self.exits[actor][i]
+
+    def count(self, code):
+        return self.tiles.count(code)
@@ -0,0 +1,105 @@
+# level.py
+""" 關卡資料：地圖字串以及不在地圖裡的位置資訊 (出生點、鬼屋、散開巡邏點)。
+
+classic_level() 是原本的 28x36 地圖；generate_level() 用 mapgen 產生任意大小的迷宮，
+在正中央挖出和原始地圖同樣形狀的鬼屋。
+"""
+from settings import *
+from grid import Grid
+from navigation import load_nav_table
+from mapgen import generate_maze
+
+# 原始地圖的鬼魂散開巡邏點
+path_blinky = [(26, 1)]
+path_pinky = [(1, 1)]
+path_inky = [(26, 29)]
+path_clyde = [(1, 29)]
+
+# 鬼屋模板 (寬 11、高 7)：外圈是走道，門在上方正中央，鬼魂的家在第 3 列
+HOUSE_TEMPLATE = [
+    "           ",
+    " WWWW=WWWW ",
+    " W       W ",
+    " W       W ",
+    " W       W ",
+    " WWWWWWWWW ",
+    "           ",
+]
+HOUSE_DOOR_ROW = 1
+HOUSE_HOME_ROW = 3
+
+
+class Level:
+    """ 一個關卡。
+
+    ghost_homes 依序是 Blinky / Pinky / Inky / Clyde 的家 (鬼屋裡的格子)，
+    鬼魂出門時往上走到 house_exit_y 這一列才開始行動。
+    spec 是重新產生這個關卡所需的參數：原始地圖為 None，產生的迷宮為 (寬, 高, seed)。
+    """
+
+    def __init__(self, name, map_strings, player_spawn, ghost_homes, house_exit_y, scatter_paths, spec=None):
+        self.name = name
+        self.spec = spec
+        self.map_strings = map_strings
+        self.player_spawn = player_spawn
+        self.ghost_homes = ghost_homes
+        self.house_exit_y = house_exit_y
+        self.scatter_paths = scatter_paths
+        self._pellet_count = None
+        self.pellet_bits = None  # 編譯過的關卡才有 (levelpack.CompiledLevel)，文字關卡由 PelletIndex 掃格子
+
+    @property
+    def width(self):
+        return max(len(row) for row in self.map_strings)
+
+    @property
+    def height(self):
+        return len(self.map_strings)
+
+    @property
+    def pellet_count(self):
+        """ 地圖上一般豆子的數量 (過關條件)，只算一次 """
+        if self._pellet_count is None:
+            self._pellet_count = sum(row.count(TILE_PELLET) for row in self.map_strings)
+        return self._pellet_count
+
+    def make_grid(self):
+        return Grid(self.map_strings)
+
+    def load_nav_table(self):
+        """ 全點對導航表 (磁碟快取見 navigation.load_nav_table) """
+        return load_nav_table(self.map_strings)
+
+
+def classic_level():
+    return Level("classic", MAP_STRINGS, (13.5, 23), [(13, 14), (14, 14), (12, 14), (15, 14)], 11,
+                 [path_blinky, path_pinky, path_inky, path_clyde])
+
+
+def generate_level(width, height, seed=None):
+    """ 產生 width x height 的迷宮關卡 (至少 15x13，鬼屋才放得下) """
+    if width < 15 or height < 13:
+        raise ValueError("generated levels must be at least 15x13")
+    rows = [list(row) for row in generate_maze(width, height, seed=seed)]
+
+    # 鬼屋左上角放在奇數座標，外圈走道才會經過迷宮的格子 (和迷宮連通)
+    house_w, house_h = len(HOUSE_TEMPLATE[0]), len(HOUSE_TEMPLATE)
+    x0 = (width - house_w) // 2 | 1
+    y0 = (height - house_h) // 2 | 1
+    for dy, template_row in enumerate(HOUSE_TEMPLATE):
+        rows[y0 + dy][x0:x0 + house_w] = template_row
+
+    # 四個角落 (迷宮最外側的格子) 放大力丸，也當作散開的巡邏點
+    right = width - 2 if width % 2 else width - 3
+    bottom = height - 2 if height % 2 else height - 3
+    corners = [(1, 1), (right, 1), (1, bottom), (right, bottom)]
+    for x, y in corners:
+        rows[y][x] = TILE_POWER_PELLET
+    top_left, top_right, bottom_left, bottom_right = corners
+
+    center_x = x0 + house_w // 2
+    home_y = y0 + HOUSE_HOME_ROW
+    homes = [(center_x, home_y), (center_x + 1, home_y), (center_x - 1, home_y), (center_x + 2, home_y)]
+    return Level(f"generated-{width}x{height}-{seed}", ["".join(row) for row in rows],
+                 (center_x, y0 + house_h - 1), homes, y0,
+                 [[top_right], [top_left], [bottom_right], [bottom_left]], spec=(width, height, seed))
@@ -0,0 +1,331 @@
+# levelpack.py
+""" 關卡包：文字檔寫的一組關卡，編譯成可以直接 mmap 的二進位檔。
+
+文字格式 (levels/*.txt)，每個關卡一段，# 開頭的行是註解：
+
+    level classic
+    spawn 13.5 23
+    homes 13,14 14,14 12,14 15,14
+    exit 11
+    scatter 26,1 / 1,1 / 26,29 / 1,29
+    map
+    WWWW...
+    W...
+    end
+
+homes 與 scatter 依序是 Blinky / Pinky / Inky / Clyde；scatter 每隻鬼可以有多個點 (以空白分隔)。
+map 與 end 之間每一行就是一列 (空行也算一列，不足的寬度補空白)。
+
+編譯後的檔案 (.pmlv) 裡每個關卡存：格子陣列、豆子位元集、四種角色的出口遮罩、
+小地圖的全點對導航表，以及出生點 / 鬼屋 / 巡邏點。載入時用 mmap 直接指向檔案內容，
+不需要解析或重算，換關卡幾乎不花時間，多個工作行程也會共用同一份記憶體分頁。
+文字檔第一次載入時自動編譯並快取在 NAV_CACHE_DIR (內容改變時會重新編譯)。
+
+範例：
+    python code/levelpack.py compile code/levels/mazes.txt -o mazes.pmlv
+    python code/levelpack.py generate 28x36 --count 3 --seed 7 -o my_mazes.txt
+    python code/levelpack.py info code/levels/mazes.txt
+"""
+import os
+import sys
+import mmap
+import json
+import struct
+import hashlib
+import argparse
+from settings import *
+from grid import Grid, CODE_PELLET, CODE_POWER_PELLET, CODE_WALL
+from level import Level, classic_level, generate_level
+from navigation import NavTable, NAV_CACHE_DIR, load_nav_table
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+
+PACK_MAGIC = b"PMLV"
+PACK_VERSION = 1
+# 檔頭：magic, 版本, 關卡數；接著每個關卡一個 u64 位移
+PACK_HEADER = struct.Struct("<4sII")
+OFFSET = struct.Struct("<Q")
+# 關卡記錄：中繼資料 (JSON) 長度, 寬, 高, 一般豆子數, 導航表格子數 (0 = 沒有導航表)
+RECORD = struct.Struct("<IIIII")
+ALIGN = 8
+
+
+# --- 文字格式 ---
+
+def _number(text):
+    return float(text) if "." in text else int(text)
+
+
+def _point(text):
+    x, y = text.split(",")
+    return (_number(x), _number(y))
+
+
+def parse_pack(text, source="<pack>"):
+    """ 解析關卡包文字，回傳 Level 列表 """
+    levels = []
+    fields = None
+    rows = None
+    for line_no, line in enumerate(text.splitlines(), 1):
+        if rows is not None:
+            if line.strip() == "end":
+                levels.append(_make_level(fields, rows, source, line_no))
+                fields = rows = None
+            else:
+                rows.append(line)
+            continue
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        key, _, value = stripped.partition(" ")
+        if key == "level":
+            fields = {"name": value.strip()}
+        elif fields is None:
+            raise ValueError(f"{source}:{line_no}: expected 'level <name>'")
+        elif key == "map":
+            rows = []
+        elif key in ("spawn", "homes", "exit", "scatter"):
+            fields[key] = value.strip()
+        else:
+            raise ValueError(f"{source}:{line_no}: unknown field {key!r}")
+    if rows is not None:
+        raise ValueError(f"{source}: map of level {fields['name']!r} is missing 'end'")
+    if fields is not None:
+        raise ValueError(f"{source}: level {fields['name']!r} has no map")
+    return levels
+
+
+def _make_level(fields, rows, source, line_no):
+    try:
+        spawn = tuple(_number(v) for v in fields["spawn"].split())
+        homes = [_point(v) for v in fields["homes"].split()]
+        scatter = [[_point(v) for v in path.split()] for path in fields["scatter"].split("/")]
+        exit_y = int(fields["exit"])
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"{source}:{line_no}: level {fields['name']!r}: bad or missing field ({e})") from None
+    if len(homes) != 4 or len(scatter) != 4:
+        raise ValueError(f"{source}:{line_no}: level {fields['name']!r} needs 4 homes and 4 scatter paths")
+    return Level(fields["name"], rows, spawn, homes, exit_y, scatter)
+
+
+def format_level(level):
+    """ Level -> 關卡包文字 (一段) """
+    def point(p):
+        return f"{p[0]},{p[1]}"
+    lines = [
+        f"level {level.name}",
+        f"spawn {level.player_spawn[0]} {level.player_spawn[1]}",
+        "homes " + " ".join(point(p) for p in level.ghost_homes),
+        f"exit {level.house_exit_y}",
+        "scatter " + " / ".join(" ".join(point(p) for p in path) for path in level.scatter_paths),
+        "map",
+        *(row.rstrip() for row in level.map_strings),
+        "end",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+# --- 編譯 ---
+
+def _pad(out):
+    out += bytes(-len(out) % ALIGN)
+
+
+def _compile_level(level):
+    grid = Grid(level.map_strings)
+    tiles = grid.initial_tiles
+    pellets = bytearray((len(tiles) + 7) // 8)
+    for i, code in enumerate(tiles):
+        if code == CODE_PELLET or code == CODE_POWER_PELLET:
+            pellets[i >> 3] |= 1 << (i & 7)
+    open_tiles = len(tiles) - tiles.count(CODE_WALL)
+    table = load_nav_table(level.map_strings) if open_tiles <= NAV_TABLE_MAX_TILES else None
+
+    meta = json.dumps({
+        "name": level.name,
+        "spawn": level.player_spawn,
+        "homes": level.ghost_homes,
+        "exit": level.house_exit_y,
+        "scatter": level.scatter_paths,
+    }).encode()
+    out = bytearray(RECORD.pack(len(meta), grid.width, grid.height, tiles.count(CODE_PELLET),
+                                table.size if table else 0))
+    out += meta
+    for section in [tiles, pellets, *grid.exits] + ([table.dist.tobytes(), table.first_step] if table else []):
+        _pad(out)
+        out += section
+    _pad(out)
+    return out
+
+
+def compile_pack(levels, path):
+    """ 把 Level 列表寫成 .pmlv (先寫暫存檔再改名，其他行程不會讀到寫一半的檔案) """
+    out = bytearray(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(levels)))
+    directory = len(out)
+    out += bytes(OFFSET.size * len(levels))
+    _pad(out)
+    for i, level in enumerate(levels):
+        OFFSET.pack_into(out, directory + i * OFFSET.size, len(out))
+        out += _compile_level(level)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(out)
+    os.replace(tmp_path, path)
+
+
+# --- 載入 (mmap) ---
+
+class CompiledLevel(Level):
+    """ 指向 mmap 內容的關卡：格子、出口遮罩與導航表都是唯讀 memoryview，不需要解析 """
+
+    def __init__(self, view, offset):
+        meta_len, width, height, pellet_count, nav_size = RECORD.unpack_from(view, offset)
+        pos = offset + RECORD.size
+        meta = json.loads(bytes(view[pos:pos + meta_len]))
+        pos += meta_len
+        size = width * height
+        sections = []
+        lengths = [size, (size + 7) // 8] + [size] * 4 + ([nav_size * nav_size * 2, nav_size * nav_size] if nav_size else [])
+        for length in lengths:
+            pos += -pos % ALIGN
+            sections.append(view[pos:pos + length])
+            pos += length
+
+        self.name = meta["name"]
+        self.spec = None
+        self.player_spawn = tuple(meta["spawn"])
+        self.ghost_homes = [tuple(p) for p in meta["homes"]]
+        self.house_exit_y = meta["exit"]
+        self.scatter_paths = [[tuple(p) for p in path] for path in meta["scatter"]]
+        self._width = width
+        self._height = height
+        self._pellet_count = pellet_count
+        self.tiles = sections[0]
+        self.pellet_bits = sections[1]  # 第 i 格有豆子 (含大力丸) 時 bit i 為 1
+        self.exits = sections[2:6]
+        self.nav_arrays = (sections[6].cast("H"), sections[7]) if nav_size else None
+        self._nav_table = None
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def map_strings(self):
+        data = bytes(self.tiles).decode("ascii")
+        return [data[y * self._width:(y + 1) * self._width] for y in range(self._height)]
+
+    def make_grid(self):
+        return Grid.from_arrays(self._width, self._height, self.tiles, self.exits)
+
+    def load_nav_table(self):
+        if self.nav_arrays is None:
+            return super().load_nav_table()
+        if self._nav_table is None:
+            dist, first_step = self.nav_arrays
+            self._nav_table = NavTable(None, dist, first_step, grid=self.make_grid())
+        return self._nav_table
+
+
+class LevelPack:
+    """ 一組已編譯的關卡 (可以像列表一樣取用)。path 是原始檔案的路徑，錄影用它重新載入 """
+
+    def __init__(self, path, compiled_path):
+        self.path = path
+        with open(compiled_path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mmap)
+        magic, version, count = PACK_HEADER.unpack_from(view)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"Not a version {PACK_VERSION} level pack: {compiled_path}")
+        self.levels = [CompiledLevel(view, OFFSET.unpack_from(view, PACK_HEADER.size + i * OFFSET.size)[0])
+                       for i in range(count)]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        return self.levels[index]
+
+    def __iter__(self):
+        return iter(self.levels)
+
+
+def resolve_path(path):
+    """ 不存在的名稱到 levels/ 底下找 (例如 "mazes" -> levels/mazes.txt) """
+    if not os.path.exists(path):
+        candidate = os.path.join(LEVELS_DIR, path if path.endswith(".txt") else f"{path}.txt")
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+_loaded_packs = {}
+
+
+def load_pack(path, cache_dir=NAV_CACHE_DIR):
+    """ 載入關卡包：.pmlv 直接 mmap；文字檔先編譯到快取 (同一個行程內共用) """
+    name = path  # 錄影記錄使用者給的名稱 (例如 "mazes")，在別的電腦上也找得到
+    path = resolve_path(path)
+    if path in _loaded_packs:
+        return _loaded_packs[path]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(PACK_MAGIC):
+        compiled_path = path
+    else:
+        key = hashlib.sha1(b"v%d" % PACK_VERSION + data).hexdigest()
+        compiled_path = os.path.join(cache_dir, f"levels_{key}.pmlv")
+        if not os.path.exists(compiled_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            compile_pack(parse_pack(data.decode("utf-8"), path), compiled_path)
+
+    pack = _loaded_packs[path] = LevelPack(name, compiled_path)
+    return pack
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile, generate and inspect level packs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_cmd = commands.add_parser("compile", help="compile a text pack into a memory-mappable .pmlv file")
+    compile_cmd.add_argument("path")
+    compile_cmd.add_argument("-o", "--output", help="default: the input path with a .pmlv extension")
+    generate_cmd = commands.add_parser("generate", help="write a text pack of generated mazes")
+    generate_cmd.add_argument("size", help="WIDTHxHEIGHT")
+    generate_cmd.add_argument("--count", type=int, default=3)
+    generate_cmd.add_argument("--seed", type=int, default=0, help="seed of the first maze (the rest count up)")
+    generate_cmd.add_argument("--with-classic", action="store_true", help="start the pack with the classic map")
+    generate_cmd.add_argument("-o", "--output", required=True)
+    info_cmd = commands.add_parser("info", help="list the levels in a pack")
+    info_cmd.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        path = resolve_path(args.path)
+        with open(path, encoding="utf-8") as f:
+            levels = parse_pack(f.read(), path)
+        output = args.output or os.path.splitext(path)[0] + ".pmlv"
+        compile_pack(levels, output)
+        print(f"{output}: {len(levels)} levels, {os.path.getsize(output)} bytes")
+    elif args.command == "generate":
+        width, _, height = args.size.lower().partition("x")
+        levels = [classic_level()] if args.with_classic else []
+        levels += [generate_level(int(width), int(height), seed=args.seed + i) for i in range(args.count)]
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(format_level(level) for level in levels))
+        print(f"{args.output}: {len(levels)} levels")
+    else:
+        pack = load_pack(args.path)
+        for i, level in enumerate(pack):
+            nav = "nav table" if level.nav_arrays else "no nav table"
+            print(f"{i + 1:>3}  {level.name:<28}{level.width}x{level.height}  {level.pellet_count} pellets, {nav}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# logger.py
+""" 遊戲日誌：固定大小的環形緩衝區 (畫面上的日誌面板)、嚴重程度與類別過濾、背景執行緒寫出。
+
+每場 Game 有自己的 Logger，記錄最近 MAX_LOGS 筆 (deque(maxlen)，加入與丟掉最舊的一筆都是 O(1))。
+輸出 (終端機、JSON Lines 檔) 是 sink：遊戲迴圈只把記錄放進佇列，由背景執行緒每 LOG_FLUSH_MS
+毫秒批次格式化並寫出，遊戲迴圈不會卡在終端機或磁碟 I/O。佇列滿了 (寫出跟不上) 就丟掉新的記錄並計數。
+
+範例：
+    sink = json_lines_sink("game.jsonl")
+    game = Game(logger=Logger(min_level=LOG_DEBUG, categories=[LOG_CAT_GHOST], sinks=[sink]))
+    ...
+    sink.close()
+"""
+import sys
+import json
+import threading
+from collections import deque
+from settings import *
+
+LEVEL_NAMES = {LOG_DEBUG: "DEBUG", LOG_INFO: "INFO", LOG_WARNING: "WARNING", LOG_ERROR: "ERROR"}
+
+
+class LogRecord:
+    """ 一筆日誌：模擬時間 (毫秒)、幀數、嚴重程度、類別與訊息。不屬於某場遊戲的記錄 (選單、錄影) 時間與幀數為 None """
+    __slots__ = ("time_ms", "frame", "level", "category", "message")
+
+    def __init__(self, time_ms, frame, level, category, message):
+        self.time_ms = time_ms
+        self.frame = frame
+        self.level = level
+        self.category = category
+        self.message = message
+
+    def format(self):
+        """ 畫面與終端機用的文字 """
+        if self.time_ms is None:
+            return self.message
+        return f"[{int(self.time_ms // 1000)}s] {self.message}"
+
+    def to_json(self):
+        return json.dumps({"time_ms": self.time_ms, "frame": self.frame,
+                           "level": LEVEL_NAMES.get(self.level, self.level), "category": self.category,
+                           "message": self.message}, ensure_ascii=False)
+
+
+class Logger:
+    """ 過濾後的日誌放進環形緩衝區並交給各個 sink (接受 LogRecord 的函式) """
+
+    def __init__(self, capacity=MAX_LOGS, min_level=LOG_MIN_LEVEL, categories=None, sinks=()):
+        self.records = deque(maxlen=capacity)
+        self.min_level = min_level
+        self.categories = frozenset(categories) if categories is not None else None  # None = 全部類別
+        self.sinks = list(sinks)
+        self.version = 0  # 每新增一筆 +1 (繪圖端用來判斷是否要重畫面板)
+        self.muted = False  # 暫時不記錄 (影子遊戲、倒帶時的重新模擬)
+
+    def enabled(self, category, level=LOG_INFO):
+        """ 這個類別與嚴重程度的日誌會不會被記錄 (訊息組起來很花時間時先檢查) """
+        return (not self.muted and level >= self.min_level
+                and (self.categories is None or category in self.categories))
+
+    def log(self, message, category=LOG_CAT_SYSTEM, level=LOG_INFO, time_ms=None, frame=None):
+        if not self.enabled(category, level):
+            return None
+        record = LogRecord(time_ms, frame, level, category, message)
+        self.records.append(record)
+        self.version += 1
+        for sink in self.sinks:
+            sink(record)
+        return record
+
+    def lines(self):
+        return [record.format() for record in self.records]
+
+
+class BackgroundSink:
+    """ 在背景執行緒把記錄批次寫到 stream。呼叫端只做 deque.append，不會等 I/O """
+
+    def __init__(self, stream, formatter=LogRecord.format, flush_ms=LOG_FLUSH_MS, max_pending=LOG_MAX_PENDING,
+                 owns_stream=False):
+        self.stream = stream
+        self.formatter = formatter
+        self.interval = flush_ms / 1000
+        self.max_pending = max_pending
+        self.owns_stream = owns_stream
+        self.pending = deque()  # append / popleft 是執行緒安全的，不需要鎖
+        self.dropped = 0
+        self.closing = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self.thread.start()
+
+    def __call__(self, record):
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append(record)
+
+    def _run(self):
+        while not self.closing.wait(self.interval):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        pending = self.pending
+        if not pending or self.stream is None:
+            return
+        formatter = self.formatter
+        lines = []
+        while pending:
+            lines.append(formatter(pending.popleft()))
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except (OSError, ValueError):
+            # 終端機關了或磁碟滿了：之後的記錄都丟掉，不影響遊戲
+            self.dropped += len(lines)
+            self.stream = None
+
+    def close(self):
+        """ 寫完佇列裡剩下的記錄後結束執行緒 """
+        if self.closing.is_set():
+            return
+        self.closing.set()
+        self.thread.join()
+        if self.dropped and self.stream is not None:
+            self.pending.append(LogRecord(None, None, LOG_WARNING, LOG_CAT_SYSTEM, f"{self.dropped} log records dropped"))
+            self._drain()
+        if self.owns_stream and self.stream is not None:
+            self.stream.close()
+
+
+def console_sink(stream=None):
+    """ 印到終端機 (預設 stdout) """
+    return BackgroundSink(stream or sys.stdout)
+
+
+def json_lines_sink(path):
+    """ 每筆一行 JSON，附加到 path 後面 """
+    return BackgroundSink(open(path, "a", encoding="utf-8"), LogRecord.to_json, owns_stream=True)
+
+
+def parse_level(name):
+    """ 命令列的嚴重程度名稱 (debug / info / warning / error) """
+    for level, level_name in LEVEL_NAMES.items():
+        if level_name == name.upper():
+            return level
+    raise ValueError(f"unknown log level {name!r}")
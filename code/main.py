@@ -1,300 +1,429 @@
 # main.py
+import os
+import time
+import random
+import argparse
 import pygame
-import math
-from settings import * 
-from player import Player
-from ghost import Ghost
-
-# 遊戲初始化
-pygame.init()
-pygame.font.init()
-
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pygame Pac-Man: Advanced")
-clock = pygame.time.Clock()
-
-game_logs = []
-MAX_LOGS = 7
-
-def log_message(message):
-    ticks = pygame.time.get_ticks() // 1000
-    formatted_msg = f"[{ticks}s] {message}"
-    print(formatted_msg)
-    game_logs.append(formatted_msg)
-    if len(game_logs) > MAX_LOGS:
-        game_logs.pop(0)
-
-def draw_logs(surface):
-    log_area_rect = pygame.Rect(0, MAP_HEIGHT, SCREEN_WIDTH, LOG_HEIGHT)
-    pygame.draw.rect(surface, (20, 20, 20), log_area_rect)
-    pygame.draw.line(surface, WHITE, (0, MAP_HEIGHT), (SCREEN_WIDTH, MAP_HEIGHT), 2)
-    start_y = MAP_HEIGHT + 10
-    
-    # 顯示生命值與關卡
-    info_text = f"LIVES: {player_lives} / {MAX_LIVES}   LEVEL: {current_level}   ALGO: {selected_algorithm}"
-    info_surf = LOG_FONT.render(info_text, True, YELLOW)
-    surface.blit(info_surf, (10, start_y))
-    
-    # 顯示日誌
-    for i, msg in enumerate(game_logs):
-        text_surf = LOG_FONT.render(msg, True, WHITE)
-        surface.blit(text_surf, (10, start_y + 20 + i * 18))
-
-def draw_map():
-    for y, row in enumerate(GAME_MAP):
-        for x, char in enumerate(row):
-            rect_x = x * TILE_SIZE
-            rect_y = y * TILE_SIZE
-            if char == TILE_WALL:
-                pygame.draw.rect(screen, BLUE, (rect_x, rect_y, TILE_SIZE, TILE_SIZE))
-            elif char == TILE_DOOR:
-                pygame.draw.line(screen, GREY, (rect_x, rect_y + TILE_SIZE//2), (rect_x + TILE_SIZE, rect_y + TILE_SIZE//2), 2)
-            elif char == TILE_PELLET:
-                pygame.draw.circle(screen, WHITE, (rect_x + TILE_SIZE // 2, rect_y + TILE_SIZE // 2), 2)
-            elif char == TILE_POWER_PELLET:
-                pygame.draw.circle(screen, WHITE, (rect_x + TILE_SIZE // 2, rect_y + TILE_SIZE // 2), 6)
-
-# --- 全局遊戲狀態變數 ---
-player_lives = MAX_LIVES
-current_level = 1
-selected_algorithm = ALGO_ASTAR # 預設
-
-# 初始化物件變數
-player = None
-ghosts = []
-total_pellets = 0
-running = True
-game_state = GAME_STATE_MENU # ★★★ 初始狀態改為 MENU ★★★
-frightened_mode = False
-frightened_start_time = 0
-global_ghost_mode = MODE_SCATTER
-last_mode_switch_time = 0
-
-path_blinky = [(26, 1)]
-path_pinky = [(1, 1)]
-path_inky = [(26, 29)]
-path_clyde = [(1, 29)]
-
-def init_level(new_level=False):
-    """ 初始化關卡：重置地圖、豆子、玩家和鬼的位置 """
-    global player, ghosts, total_pellets, GAME_MAP
-    
-    if new_level:
-        # 如果是新關卡，重置地圖 (把豆子補回來)
-        GAME_MAP[:] = [list(row) for row in MAP_STRINGS]
-        log_message(f"--- Level {current_level} Started ---")
+from settings import *
+from game import Game
+from render import (Camera, DirtyRectTracker, MotionLerp, make_maze_renderer, draw_logs, draw_score, render_text,
+                    log_panel)
+from level import classic_level, generate_level
+from levelpack import load_pack
+from profiler import FrameProfiler, NULL_PROFILER
+from replay import Recorder
+from autopilot import Autopilot
+from rewind import RewindBuffer
+from logger import Logger, LEVEL_NAMES, console_sink, json_lines_sink, parse_level
+
+KEY_DIRECTIONS = {
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1),
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+}
+
+# 時間倍率：往下 / 往上一檔
+SLOWER_KEYS = (pygame.K_MINUS, pygame.K_KP_MINUS)
+FASTER_KEYS = (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS)
+
+# 倒帶 (除錯用)：退一秒 / 退一幀 / 進一幀 (都會暫停)，暫停或繼續
+REWIND_SECOND_KEY = pygame.K_BACKSPACE
+REWIND_FRAME_KEY = pygame.K_LEFTBRACKET
+FORWARD_FRAME_KEY = pygame.K_RIGHTBRACKET
+PAUSE_KEY = pygame.K_p
+
+MENU_ALGORITHMS = {
+    pygame.K_1: ALGO_BFS,
+    pygame.K_2: ALGO_DFS,
+    pygame.K_3: ALGO_ASTAR,
+}
+
+
+def draw_menu(screen):
+    title = render_text(WIN_FONT, "PAC-MAN AI SELECT", YELLOW)
+    t_rect = title.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//3))
+    screen.blit(title, t_rect)
+
+    opt1 = render_text(SCORE_FONT, "Press 1 for BFS (Wide Search)", WHITE)
+    opt2 = render_text(SCORE_FONT, "Press 2 for DFS (Deep/Random)", WHITE)
+    opt3 = render_text(SCORE_FONT, "Press 3 for A* (Smartest)", WHITE)
+
+    screen.blit(opt1, (50, SCREEN_HEIGHT//2))
+    screen.blit(opt2, (50, SCREEN_HEIGHT//2 + 40))
+    screen.blit(opt3, (50, SCREEN_HEIGHT//2 + 80))
+
+def draw_game(screen, game, maze, camera, profiler=NULL_PROFILER, lerp=None, alpha=1.0):
+    """ lerp (render.MotionLerp) 不是 None 時，角色畫在上一個和目前的邏輯幀之間 (比例 alpha) """
+    start = profiler.start()
+    maze.draw(screen, camera)
+    profiler.stop("draw.maze", start)
+
+    start = profiler.start()
+    offset = camera.offset
+    for index, sprite in enumerate([game.player] + game.ghosts):
+        dx, dy = lerp.shift(game, index, sprite, alpha) if lerp else (0, 0)
+        sprite.draw(screen, (offset[0] - dx, offset[1] - dy))
+    if game.swarm: game.swarm.draw(screen, offset, lerp.swarm_positions(game, alpha) if lerp else None)
+    profiler.stop("draw.sprites", start)
+
+    start = profiler.start()
+    draw_logs(screen, game)
+    profiler.stop("draw.logs", start)
+    draw_score(screen, game)
+
+    center_pos = (SCREEN_WIDTH // 2, MAP_HEIGHT // 2)
+    if game.game_state == GAME_STATE_START:
+        ready_text = render_text(WIN_FONT, f"LEVEL {game.current_level}", YELLOW)
+        hint_text = render_text(SCORE_FONT, "Press ARROWS", WHITE)
+        r1 = ready_text.get_rect(center=center_pos)
+        r2 = hint_text.get_rect(center=(center_pos[0], center_pos[1] + 40))
+        screen.blit(ready_text, r1)
+        screen.blit(hint_text, r2)
+
+    elif game.game_state == GAME_STATE_GAME_OVER:
+        text = render_text(GAME_OVER_FONT, "GAME OVER", RED)
+        rect = text.get_rect(center=center_pos)
+        screen.blit(text, rect)
+        rst = render_text(SCORE_FONT, "Press R to Menu", WHITE)
+        r_rect = rst.get_rect(center=(center_pos[0], center_pos[1] + 50))
+        screen.blit(rst, r_rect)
+
+def draw_demo(screen):
+    """ 展示模式的提示 """
+    text = render_text(WIN_FONT, "DEMO", YELLOW)
+    screen.blit(text, text.get_rect(center=(SCREEN_WIDTH // 2, MAP_HEIGHT // 4)))
+    hint = render_text(SCORE_FONT, "Press any key", WHITE)
+    screen.blit(hint, hint.get_rect(center=(SCREEN_WIDTH // 2, MAP_HEIGHT // 4 + 40)))
+
+class FixedTimestep:
+    """ 固定步長的邏輯更新。
+
+    實際經過的時間乘上時間倍率累積起來，每滿 step_ms 就推進一個邏輯幀，所以遊戲速度不受
+    畫面更新率 (30 / 60 / 144 Hz) 或掉幀影響。剩下不滿一幀的比例 alpha 給畫面內插用。
+    """
+
+    def __init__(self, step_ms=FRAME_MS, time_scale=1, max_steps=MAX_STEPS_PER_FRAME):
+        self.step_ms = step_ms
+        self.time_scale = time_scale
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.last = None
+
+    def reset(self):
+        """ 從現在開始重新計時 (選單、新遊戲)，不補回之前經過的時間 """
+        self.accumulator = 0.0
+        self.last = None
+
+    def advance(self):
+        """ 累積上次呼叫到現在的時間，回傳這一次要推進幾個邏輯幀 """
+        now = time.perf_counter()
+        if self.last is not None:
+            self.accumulator += (now - self.last) * 1000 * self.time_scale
+        self.last = now
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            # 追不上 (電腦太慢或倍率太高)：只推進 max_steps 幀，丟掉落後的時間
+            steps = self.max_steps
+            self.accumulator %= self.step_ms
+        else:
+            self.accumulator -= steps * self.step_ms
+        return steps
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_ms
+
+    def change_scale(self, delta):
+        """ 在 TIME_SCALES 裡往上 (+1) 或往下 (-1) 一檔 """
+        scales = sorted(set(TIME_SCALES) | {self.time_scale})
+        index = min(max(scales.index(self.time_scale) + delta, 0), len(scales) - 1)
+        self.time_scale = scales[index]
+        return self.time_scale
+
+
+def open_window():
+    """ 只初始化顯示 (字型在第一次畫字時才載入，不初始化用不到的音效 mixer) """
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Pygame Pac-Man: Advanced")
+    return screen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pygame Pac-Man")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only push changed screen regions instead of flipping the whole window")
+    parser.add_argument("--horde", type=int, default=0, metavar="N",
+                        help="add N extra ghosts updated as one vectorized swarm (needs NumPy)")
+    parser.add_argument("--profile-out", metavar="PATH",
+                        help="write per-section frame timings (p50/p95/p99) to PATH at exit (.json or .csv)")
+    parser.add_argument("--map", metavar="WxH",
+                        help="play on a generated maze of this size instead of the classic layout (e.g. 200x200)")
+    parser.add_argument("--map-seed", type=int, default=None, help="seed for --map")
+    parser.add_argument("--levels", metavar="PACK",
+                        help="play through a level pack (a .txt or compiled .pmlv file, or a name under code/levels/)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record each game to PATH (later games get -2, -3, ... suffixes); play back with replay.py")
+    parser.add_argument("--planner", choices=["thread", "process", "budget"],
+                        help="run ghost searches off the game loop (thread/process: ghosts steer greedily until a plan "
+                             "is ready; budget: resumable searches get --ai-budget ms per frame)")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="frames drawn per second (0 = uncapped); the game itself always runs at FRAME_MS per tick")
+    parser.add_argument("--time-scale", type=float, default=1, metavar="X",
+                        help="game speed multiplier, e.g. 8 to fast-forward (change in game with - and +)")
+    parser.add_argument("--ai-budget", type=float, default=AI_FRAME_BUDGET_MS, metavar="MS",
+                        help="milliseconds per frame for ghost searches with --planner budget")
+    parser.add_argument("--autopilot", action="store_true",
+                        help="let the computer play (arrow keys still override it)")
+    parser.add_argument("--log-level", choices=[name.lower() for name in LEVEL_NAMES.values()],
+                        default=LEVEL_NAMES[LOG_MIN_LEVEL].lower(), help="lowest severity to log")
+    parser.add_argument("--log-categories", nargs="+", choices=LOG_CATEGORIES, metavar="CATEGORY",
+                        help=f"only log these categories ({', '.join(LOG_CATEGORIES)})")
+    parser.add_argument("--log-file", metavar="PATH",
+                        help="also append log records to PATH as JSON lines (written by a background thread)")
+    args = parser.parse_args(argv)
+    if args.map and args.levels:
+        parser.error("--map and --levels cannot be used together")
+    if args.time_scale <= 0:
+        parser.error("--time-scale must be positive")
+    if args.planner and args.record:
+        parser.error("games using --planner are not deterministic and cannot be recorded")
+    if args.planner and args.autopilot:
+        parser.error("the autopilot cannot simulate games using --planner")
+
+    levels = load_pack(args.levels) if args.levels else None
+    if args.map:
+        width, _, height = args.map.lower().partition("x")
+        # 沒指定時也要選定一個 seed，錄影才能重新產生同一張地圖
+        map_seed = args.map_seed if args.map_seed is not None else random.getrandbits(32)
+        level = generate_level(int(width), int(height), seed=map_seed)
     else:
-        # 如果是死亡重置 (Soft Reset)，地圖不變，只重置實體位置
-        # 但豆子不能重置
-        pass
-
-    # 重置玩家 (分數保留)
-    old_score = 0
-    if player: old_score = player.score
-    player = Player(13.5, 23)
-    player.score = old_score
-
-    # 重置鬼魂 (傳入 selected_algorithm)
-    blinky = Ghost(13, 14, RED, ai_mode=AI_CHASE_BLINKY, chosen_algorithm=selected_algorithm,
-                   scatter_point=path_blinky, in_house=True, delay=0, on_log=log_message)
-    pinky = Ghost(14, 14, PINK, ai_mode=AI_CHASE_PINKY, chosen_algorithm=selected_algorithm,
-                  scatter_point=path_pinky, in_house=True, delay=3000, on_log=log_message)
-    inky = Ghost(12, 14, CYAN, ai_mode=AI_CHASE_INKY, chosen_algorithm=selected_algorithm, scatter_point=path_inky,
-                 in_house=True, delay=6000, on_log=log_message)
-    clyde = Ghost(15, 14, ORANGE, ai_mode=AI_CHASE_CLYDE, chosen_algorithm=selected_algorithm,
-                  scatter_point=path_clyde, in_house=True, delay=9000, on_log=log_message)
-    
-    ghosts[:] = [blinky, pinky, inky, clyde]
-
-    # 只有在新關卡時才重算豆子
-    if new_level:
-        total_pellets = sum(row.count(TILE_PELLET) for row in GAME_MAP)
-        log_message(f"Total pellets: {total_pellets}")
-
-def reset_game_totally():
-    """ 完全重置遊戲 (Game Over 後) """
-    global player_lives, current_level, game_state
-    player_lives = MAX_LIVES
-    current_level = 1
-    game_state = GAME_STATE_MENU # 回到選單
-    log_message("Game Reset to Menu")
-
-# * 主迴圈
-while running:
-    dt = clock.tick(60)
-    
-    # --- 事件處理 ---
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-            
-        # 1. 選單模式：選擇演算法
-        if game_state == GAME_STATE_MENU:
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    selected_algorithm = ALGO_BFS
-                    game_state = GAME_STATE_START
-                    init_level(new_level=True) # 初始化第一關
-                elif event.key == pygame.K_2:
-                    selected_algorithm = ALGO_DFS
-                    game_state = GAME_STATE_START
-                    init_level(new_level=True)
-                elif event.key == pygame.K_3:
-                    selected_algorithm = ALGO_ASTAR
-                    game_state = GAME_STATE_START
-                    init_level(new_level=True)
-                    
-        # 2. 準備開始模式
-        elif game_state == GAME_STATE_START:
-            if event.type == pygame.KEYDOWN:
-                if event.key in [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT]:
-                    game_state = GAME_STATE_PLAYING
-                    last_mode_switch_time = pygame.time.get_ticks()
-                    log_message(f"Level {current_level} Start! Algo: {selected_algorithm}")
-                    player.handle_input(event)
-
-        # 3. 遊戲進行中
-        elif game_state == GAME_STATE_PLAYING:
-            player.handle_input(event)
-
-        # 4. 結束畫面
-        elif game_state in [GAME_STATE_GAME_OVER, GAME_STATE_WIN]:
-            if event.type == pygame.KEYDOWN:
+        level = classic_level()
+
+    # 日誌：終端機與檔案都由背景執行緒寫出，遊戲迴圈不等 I/O
+    sinks = [console_sink()]
+    if args.log_file:
+        sinks.append(json_lines_sink(args.log_file))
+    log_options = dict(min_level=parse_level(args.log_level), categories=args.log_categories)
+    app_log = Logger(sinks=sinks, **log_options)  # 不屬於某場遊戲的訊息 (選單、錄影)
+
+    # 遊戲初始化
+    screen = open_window()
+    clock = pygame.time.Clock()
+
+    game = None  # 選單畫面時沒有進行中的遊戲
+    maze = None
+    camera = None
+    maze_level = None  # 迷宮圖層目前對應的 (遊戲, 關卡, 地圖)
+    dirty_tracker = DirtyRectTracker() if args.dirty_rects else None
+    last_view = None  # 上一幀畫面的 (遊戲, 狀態)，改變時要完整重畫
+    profiler = FrameProfiler()
+    show_profile = False  # F3 切換：日誌面板改顯示各區段耗時
+    frame = 0
+    timestep = FixedTimestep(time_scale=args.time_scale)
+    # 局部更新模式只重畫角色在目前邏輯位置的範圍，所以不內插
+    lerp = None if args.dirty_rects else MotionLerp()
+    pending_input = None  # 這次畫面沒有推進邏輯幀時，按鍵留到下一個邏輯幀
+    running = True
+    recorder = None
+    recorded_games = 0
+    autopilot = None  # 電腦玩家 (--autopilot 或展示模式)
+    demo = False  # 展示模式：選單閒置 ATTRACT_IDLE_MS 後自動開始，按任意鍵回到選單
+    menu_since = time.perf_counter()  # 選單開始閒置的時間
+    player_scale = timestep.time_scale  # 展示模式結束時還原的時間倍率
+    rewind = None  # 最近幾秒的歷史 (錄影、規劃器與展示模式不使用)
+    paused = False
+
+    def save_recording():
+        """ 把目前的錄影存檔 (每場遊戲只存一次) """
+        nonlocal recorder, recorded_games
+        if recorder is None:
+            return
+        recorded_games += 1
+        root, ext = os.path.splitext(args.record)
+        path = args.record if recorded_games == 1 else f"{root}-{recorded_games}{ext}"
+        recorder.finish().save(path)
+        app_log.log(f"Recording saved to {path}")
+        recorder = None
+
+    # * 主迴圈
+    while running:
+        clock.tick(args.fps)
+        frame += 1
+        frame_start = profiler.start()
+
+        # --- 事件處理 ---
+        start = profiler.start()
+        inputs = None
+        history_moved = False  # 這一次畫面倒帶或單步過 (豆子、內插與局部更新要重來)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type != pygame.KEYDOWN:
+                continue
+
+            if demo:
+                game.close()
+                game = autopilot = None
+                demo = False
+                timestep.time_scale = player_scale
+                menu_since = time.perf_counter()
+                continue
+            if event.key == pygame.K_F3:
+                show_profile = not show_profile
+                continue
+            if event.key in SLOWER_KEYS or event.key in FASTER_KEYS:
+                scale = timestep.change_scale(1 if event.key in FASTER_KEYS else -1)
+                if game: game.log_message(f"Time scale: {scale:g}x")
+                else: app_log.log(f"Time scale: {scale:g}x")
+                continue
+
+            # 1. 選單模式：選擇演算法
+            if game is None:
+                menu_since = time.perf_counter()
+                if event.key in MENU_ALGORITHMS:
+                    game = Game(MENU_ALGORITHMS[event.key], logger=Logger(sinks=sinks, **log_options), horde=args.horde,
+                                profiler=profiler, level=level, levels=levels, planner=args.planner,
+                                ai_budget_ms=args.ai_budget)
+                    timestep.reset()
+                    pending_input = None
+                    paused = False
+                    # 錄影假設遊戲只會往前走，使用規劃器的遊戲不能快照，這兩種情況不能倒帶
+                    rewind = None if args.record or args.planner else RewindBuffer(game)
+                    if args.record:
+                        recorder = Recorder(game)
+                    if args.autopilot:
+                        autopilot = Autopilot(game)
+
+            # 倒帶：遊戲結束後也可以退回去看是怎麼被抓的
+            elif rewind and event.key in (REWIND_SECOND_KEY, REWIND_FRAME_KEY, FORWARD_FRAME_KEY):
+                paused = True
+                history_moved = True
+                if event.key == FORWARD_FRAME_KEY:
+                    if game.frame < rewind.newest: rewind.seek(game.frame + 1)
+                    else: rewind.step(None)
+                else:
+                    rewind.back(FPS if event.key == REWIND_SECOND_KEY else 1)
+            elif rewind and event.key == PAUSE_KEY:
+                paused = not paused
+                timestep.reset()
+
+            # 2. 結束畫面：回到選單
+            elif game.game_state in [GAME_STATE_GAME_OVER, GAME_STATE_WIN]:
                 if event.key == pygame.K_r:
-                    reset_game_totally()
-
-    # --- 邏輯更新 ---
-    if game_state == GAME_STATE_PLAYING:
-        current_time = pygame.time.get_ticks()
-
-        # Ghost Mode Switch logic
-        if not frightened_mode:
-            time_passed = current_time - last_mode_switch_time
-            if global_ghost_mode == MODE_SCATTER and time_passed > SCATTER_DURATION:
-                global_ghost_mode = MODE_CHASE
-                last_mode_switch_time = current_time
-                log_message(">> Mode Switch: CHASE")
-            elif global_ghost_mode == MODE_CHASE and time_passed > CHASE_DURATION:
-                global_ghost_mode = MODE_SCATTER
-                last_mode_switch_time = current_time
-                log_message(">> Mode Switch: SCATTER")
-
-        # Ghost Updates
-        blinky_pos_for_inky = (ghosts[0].grid_x, ghosts[0].grid_y) # Assume index 0 is blinky
-        for ghost in ghosts:
-             if (not ghost.is_frightened and not ghost.is_eaten and ghost.current_ai_mode not in [MODE_GO_HOME, MODE_EXIT_HOUSE, MODE_WAITING]):
-                if global_ghost_mode == MODE_SCATTER: ghost.current_ai_mode = MODE_SCATTER
-                elif global_ghost_mode == MODE_CHASE: ghost.current_ai_mode = ghost.ai_mode
-             ghost.update(GAME_MAP, player, ghosts, dt, global_ghost_mode, blinky_pos_for_inky)
-
-        # Frightened Timer
-        if frightened_mode:
-            if current_time - frightened_start_time > FRIGHTENED_DURATION:
-                frightened_mode = False
-                log_message("Frightened mode ended.")
-                for ghost in ghosts: ghost.end_frightened()
-                last_mode_switch_time = current_time
-
-        # Player Update
-        player_status = player.update(GAME_MAP)
-        if player_status == EVENT_ATE_PELLET:
-            total_pellets -= 1
-            player.score += PELLELETS_POINT
-        elif player_status == EVENT_ATE_POWER_PELLET:
-            player.score += POWER_PELLET_POINT
-            frightened_mode = True
-            frightened_start_time = pygame.time.get_ticks()
-            log_message("Ghosts Frightened!")
-            for ghost in ghosts: ghost.start_frightened()
-
-        # --- ★★★ 進階下一關邏輯 ★★★ ---
-        if total_pellets <= 0:
-            log_message("Level Cleared!")
-            current_level += 1
-            # 加命 (最多3)
-            if player_lives < MAX_LIVES:
-                player_lives += 1
-                log_message("Extra Life Gained!")
-            
-            # 重新開始下一關 (保留分數，重置地圖)
-            game_state = GAME_STATE_START
-            frightened_mode = False
-            global_ghost_mode = MODE_SCATTER
-            init_level(new_level=True)
-
-        # 碰撞偵測 (處理扣命)
-        for ghost in ghosts:
-            dx = player.pixel_x - ghost.pixel_x
-            dy = player.pixel_y - ghost.pixel_y
-            distance = math.hypot(dx, dy)
-            collision_distance = player.radius + ghost.radius
-
-            if distance < collision_distance:
-                if ghost.is_frightened:
-                    ghost.eat()
-                    player.score += GHOST_POINT
-                elif not ghost.is_eaten:
-                    # ★★★ 被鬼抓到 -> 扣命 ★★★
-                    player_lives -= 1
-                    log_message(f"Hit! Lives left: {player_lives}")
-                    
-                    if player_lives > 0:
-                        # 還有命：軟重置 (保留地圖與豆子)
-                        game_state = GAME_STATE_START
-                        frightened_mode = False
-                        global_ghost_mode = MODE_SCATTER
-                        init_level(new_level=False) 
-                    else:
-                        # 沒命了：Game Over
-                        game_state = GAME_STATE_GAME_OVER
-                        log_message("No lives left. Game Over.")
-
-    # --- 畫面繪製 ---
-    screen.fill(BLACK)
-    
-    if game_state == GAME_STATE_MENU:
-        # 繪製選單
-        title = WIN_FONT.render("PAC-MAN AI SELECT", True, YELLOW)
-        t_rect = title.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//3))
-        screen.blit(title, t_rect)
-        
-        opt1 = SCORE_FONT.render("Press 1 for BFS (Wide Search)", True, WHITE)
-        opt2 = SCORE_FONT.render("Press 2 for DFS (Deep/Random)", True, WHITE)
-        opt3 = SCORE_FONT.render("Press 3 for A* (Smartest)", True, WHITE)
-        
-        screen.blit(opt1, (50, SCREEN_HEIGHT//2))
-        screen.blit(opt2, (50, SCREEN_HEIGHT//2 + 40))
-        screen.blit(opt3, (50, SCREEN_HEIGHT//2 + 80))
-        
-    else:
-        # 繪製遊戲畫面
-        draw_map()
-        if player: player.draw(screen)
-        for ghost in ghosts: ghost.draw(screen)
-        draw_logs(screen)
-        
-        # UI
-        if player:
-            score_text = SCORE_FONT.render(f"SCORE: {int(player.score)}", True, WHITE)
-            screen.blit(score_text, (10, MAP_HEIGHT - 25))
-
-        center_pos = (SCREEN_WIDTH // 2, MAP_HEIGHT // 2)
-        if game_state == GAME_STATE_START:
-            ready_text = WIN_FONT.render(f"LEVEL {current_level}", True, YELLOW)
-            hint_text = SCORE_FONT.render("Press ARROWS", True, WHITE)
-            r1 = ready_text.get_rect(center=center_pos)
-            r2 = hint_text.get_rect(center=(center_pos[0], center_pos[1] + 40))
-            screen.blit(ready_text, r1)
-            screen.blit(hint_text, r2)
-            
-        elif game_state == GAME_STATE_GAME_OVER:
-            text = GAME_OVER_FONT.render("GAME OVER", True, RED)
-            rect = text.get_rect(center=center_pos)
-            screen.blit(text, rect)
-            rst = SCORE_FONT.render("Press R to Menu", True, WHITE)
-            r_rect = rst.get_rect(center=(center_pos[0], center_pos[1] + 50))
-            screen.blit(rst, r_rect)
-
-    pygame.display.flip()
-
-pygame.quit()
\ No newline at end of file
+                    save_recording()
+                    game.close()
+                    game = autopilot = rewind = None
+                    menu_since = time.perf_counter()
+                    app_log.log("Game Reset to Menu")
+
+            # 3. 準備開始 / 遊戲進行中
+            elif event.key in KEY_DIRECTIONS:
+                inputs = KEY_DIRECTIONS[event.key]
+                if paused:
+                    # 暫停中按方向鍵：從目前這一幀繼續玩
+                    paused = False
+                    timestep.reset()
+        profiler.stop("events", start)
+
+        # 展示模式：選單閒置太久就讓自動駕駛玩一場 (不錄影、不用規劃器)，結束後回到選單
+        if game is None and time.perf_counter() - menu_since >= ATTRACT_IDLE_MS / 1000:
+            # 展示遊戲的日誌只顯示在畫面上，不輸出
+            game = Game(ALGO_ASTAR, horde=args.horde, profiler=profiler, level=level, levels=levels,
+                        logger=Logger(**log_options))
+            autopilot = Autopilot(game)
+            demo = True
+            player_scale = timestep.time_scale
+            timestep.time_scale = ATTRACT_TIME_SCALE
+            timestep.reset()
+            pending_input = None
+        elif demo and game.game_state == GAME_STATE_GAME_OVER:
+            game.close()
+            game = autopilot = None
+            demo = False
+            timestep.time_scale = player_scale
+            menu_since = time.perf_counter()
+
+        # --- 邏輯更新 (固定步長：這次畫面要推進 0 到 MAX_STEPS_PER_FRAME 個邏輯幀) ---
+        steps = 0
+        if game:
+            if inputs:
+                pending_input = inputs
+            steps = 0 if paused else timestep.advance()
+            if history_moved:
+                if lerp: lerp.capture(game)
+                if autopilot: autopilot.last_tile = None
+            for _ in range(steps):
+                if lerp: lerp.capture(game)
+                inputs, pending_input = pending_input, None
+                if autopilot and not inputs:
+                    inputs = autopilot(game)
+                if recorder:
+                    # 遊戲結束的那一幀就存檔，之後停在結束畫面的幀不算進錄影
+                    if recorder.step(inputs) in (GAME_STATE_GAME_OVER, GAME_STATE_WIN):
+                        save_recording()
+                elif rewind:
+                    rewind.step(inputs)
+                else:
+                    game.step(inputs)
+                # 被吃掉的豆子每個邏輯幀都要擦掉 (下一個邏輯幀 eaten_tiles 就清空了)
+                if maze_level and maze_level[0] is game and maze_level[1] == game.current_level \
+                        and maze_level[2] is game.game_map:
+                    for x, y in game.eaten_tiles: maze.erase_pellet(x, y)
+            # 迷宮圖層：新遊戲或換地圖時建立新的圖層與鏡頭，新關卡時重畫豆子
+            if maze is None or maze_level[0] is not game or maze_level[2] is not game.game_map:
+                maze = make_maze_renderer(game.game_map)
+                camera = Camera(game.game_map)
+            elif maze_level[1] != game.current_level or history_moved:
+                maze.reset(game.game_map)
+            maze_level = (game, game.current_level, game.game_map)
+        alpha = timestep.alpha
+        if game and camera:
+            dx, dy = lerp.shift(game, 0, game.player, alpha) if lerp else (0, 0)
+            camera.follow(game.player.pixel_x + dx, game.player.pixel_y + dy)
+
+        # 效能分析面板：每隔幾幀更新一次數字 (面板內容改變才會重畫)
+        if not show_profile:
+            log_panel.overlay = None
+        elif log_panel.overlay is None or frame % PROFILE_REFRESH_FRAMES == 0:
+            log_panel.overlay = tuple(profiler.lines())
+
+        # --- 畫面繪製 ---
+        view = (game, game.game_state) if game else None
+        # 會捲動的地圖每幀整個畫面都在動，不適用局部更新；一次推進好幾個邏輯幀時也整個重畫
+        # (局部更新只擦得掉最後一個邏輯幀吃掉的豆子)
+        if dirty_tracker and view == last_view and steps <= 1 and not history_moved and not (camera and camera.scrolls):
+            # 局部更新模式：遊戲進行中只送出變動區域，其他畫面是靜止的
+            if game and game.game_state == GAME_STATE_PLAYING:
+                start = profiler.start()
+                rects = dirty_tracker.update(screen, game, maze)
+                profiler.stop("draw.dirty", start)
+                start = profiler.start()
+                pygame.display.update(rects)
+                profiler.stop("display", start)
+        else:
+            if game is None:
+                screen.fill(BLACK)
+                draw_menu(screen)
+            else:
+                draw_game(screen, game, maze, camera, profiler, lerp, alpha)
+                if demo: draw_demo(screen)
+                if dirty_tracker: dirty_tracker.sync(game)
+            start = profiler.start()
+            pygame.display.flip()
+            profiler.stop("display", start)
+        last_view = view
+        profiler.stop("frame", frame_start)
+
+    save_recording()
+    if game: game.close()
+    for sink in sinks:
+        sink.close()
+    pygame.quit()
+    if args.profile_out:
+        profiler.export(args.profile_out)
+
+
+if __name__ == "__main__":
+    main()
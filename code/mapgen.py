@@ -0,0 +1,52 @@
+# mapgen.py
+""" 程序產生的迷宮 (效能測試與大型地圖用)。
+
+先用隨機深度優先 (recursive backtracker) 在奇數座標的格子上挖出一個完美迷宮，
+再隨機打掉一部分牆壁製造迴圈 (小精靈的地圖沒有死路很多的樹狀結構)。
+輸出格式與 settings.MAP_STRINGS 相同：每一列一個字串。
+"""
+import random
+from settings import *
+
+
+def generate_maze(width, height, seed=None, loop_ratio=0.15):
+    """ 產生 width x height 的迷宮字串列表。
+
+    外框全是牆；走道上都放豆子。loop_ratio 是額外打掉的牆 (相對於走道格數) 的比例，
+    0 表示完美迷宮 (任意兩點只有一條路)。
+    """
+    if width < 5 or height < 5:
+        raise ValueError("maze must be at least 5x5")
+    rng = random.Random(seed)
+    cells = [[TILE_WALL] * width for _ in range(height)]
+
+    # 房間格子在奇數座標；寬高為偶數時最右 / 最下多留一排牆
+    last_x = width - 2 if width % 2 == 1 else width - 3
+    last_y = height - 2 if height % 2 == 1 else height - 3
+
+    cells[1][1] = TILE_PELLET
+    stack = [(1, 1)]
+    steps = [(2, 0), (-2, 0), (0, 2), (0, -2)]
+    while stack:
+        x, y = stack[-1]
+        options = [(x + dx, y + dy, dx, dy) for dx, dy in steps
+                   if 1 <= x + dx <= last_x and 1 <= y + dy <= last_y
+                   and cells[y + dy][x + dx] == TILE_WALL]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny, dx, dy = rng.choice(options)
+        cells[y + dy // 2][x + dx // 2] = TILE_PELLET
+        cells[ny][nx] = TILE_PELLET
+        stack.append((nx, ny))
+
+    # 打掉夾在兩條走道之間的牆，製造迴圈
+    if loop_ratio > 0:
+        walls = [(x, y) for y in range(1, last_y + 1) for x in range(1, last_x + 1)
+                 if cells[y][x] == TILE_WALL and (x + y) % 2 == 1]
+        open_count = sum(row.count(TILE_PELLET) for row in cells)
+        rng.shuffle(walls)
+        for x, y in walls[:int(open_count * loop_ratio)]:
+            cells[y][x] = TILE_PELLET
+
+    return ["".join(row) for row in cells]
@@ -0,0 +1,488 @@
+# navigation.py
+import os
+import hashlib
+from array import array
+import random
+from heapq import heappush, heappop
+from collections import deque
+from settings import *
+from grid import *
+from search import run_search
+
+# 快取檔格式版本 (通行規則改變時要 +1，舊快取會自動失效)
+NAV_CACHE_VERSION = 2
+NAV_CACHE_MAGIC = b"PMNV"
+NAV_CACHE_DIR = os.environ.get(
+    "PACMAN_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".navcache"))
+
+NO_STEP = 255
+UNREACHABLE = 0xFFFF
+
+
+def layout_hash(map_strings):
+    """ 以地圖字串計算佈局雜湊，作為快取的 key """
+    digest = hashlib.sha1()
+    digest.update(f"v{NAV_CACHE_VERSION}".encode())
+    for row in map_strings:
+        digest.update(row.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class NavTable:
+    """ 全點對最短路徑表：任意兩個可走格子之間的距離與第一步方向 """
+
+    def __init__(self, map_strings, dist=None, first_step=None, grid=None):
+        self.grid = grid or Grid(map_strings)
+        self.width = self.grid.width
+        self.height = self.grid.height
+
+        # 可走格子編號 (與 Ghost.get_neighbors 相同：不是牆，含隧道)
+        self.index = {}
+        self.tiles = []
+        for y in range(self.height):
+            for x in range(self.width):
+                if self.grid.tiles[y * self.width + x] != CODE_WALL:
+                    self.index[(x, y)] = len(self.tiles)
+                    self.tiles.append((x, y))
+        self.size = len(self.tiles)
+
+        if dist is None or first_step is None:
+            dist, first_step = self._build()
+        self.dist = dist
+        self.first_step = first_step
+
+    def _neighbors(self, tile):
+        x, y = tile
+        exits = self.grid.exits[ACTOR_NAV][y * self.width + x]
+        for code, direction in enumerate(DIRECTIONS):
+            if exits & DIR_BITS[direction]:
+                yield code, self.grid.neighbor(x, y, direction)
+
+    def _build(self):
+        """ 從每個格子各跑一次 BFS，記錄距離以及出發時走的第一步 """
+        n = self.size
+        dist = array("H", [UNREACHABLE]) * (n * n)
+        first_step = array("B", [NO_STEP]) * (n * n)
+
+        for src, start in enumerate(self.tiles):
+            base = src * n
+            dist[base + src] = 0
+            queue = deque()
+            for code, neighbor in self._neighbors(start):
+                j = self.index[neighbor]
+                if dist[base + j] == UNREACHABLE:
+                    dist[base + j] = 1
+                    first_step[base + j] = code
+                    queue.append(neighbor)
+            while queue:
+                current = queue.popleft()
+                i = self.index[current]
+                for _, neighbor in self._neighbors(current):
+                    j = self.index[neighbor]
+                    if dist[base + j] == UNREACHABLE:
+                        dist[base + j] = dist[base + i] + 1
+                        first_step[base + j] = first_step[base + i]
+                        queue.append(neighbor)
+        return dist, first_step
+
+    def _offset(self, start, goal):
+        i = self.index.get(start)
+        j = self.index.get(goal)
+        if i is None or j is None:
+            return None
+        return i * self.size + j
+
+    def distance(self, start, goal):
+        """ 回傳最短距離 (格數)，無法到達時回傳 None """
+        offset = self._offset(start, goal)
+        if offset is None or self.dist[offset] == UNREACHABLE:
+            return None
+        return self.dist[offset]
+
+    def next_direction(self, start, goal):
+        """ O(1) 查表：從 start 往 goal 走的第一步方向，沒有路 (或已到達) 回傳 None """
+        offset = self._offset(start, goal)
+        if offset is None:
+            return None
+        code = self.first_step[offset]
+        if code == NO_STEP:
+            return None
+        return DIRECTIONS[code]
+
+    def path(self, start, goal):
+        """ 沿著查表結果展開完整路徑 (包含起點與終點)，格式同 Ghost.reconstruct_path """
+        if self.distance(start, goal) is None:
+            return None
+        path = [start]
+        current = start
+        while current != goal:
+            current = self.grid.neighbor(current[0], current[1], self.next_direction(current, goal))
+            path.append(current)
+        return path
+
+    # --- 磁碟快取 ---
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(NAV_CACHE_MAGIC)
+            array("I", [NAV_CACHE_VERSION, self.size]).tofile(f)
+            self.dist.tofile(f)
+            self.first_step.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, map_strings, path):
+        # 先只建立格子編號，再從檔案讀入表格
+        table = cls(map_strings, dist=array("H"), first_step=array("B"))
+        with open(path, "rb") as f:
+            if f.read(4) != NAV_CACHE_MAGIC:
+                raise ValueError(f"Not a navigation cache: {path}")
+            header = array("I")
+            header.fromfile(f, 2)
+            version, size = header
+            if version != NAV_CACHE_VERSION or size != table.size:
+                raise ValueError(f"Stale navigation cache: {path}")
+            table.dist.fromfile(f, size * size)
+            table.first_step.fromfile(f, size * size)
+        return table
+
+
+class JunctionGraph:
+    """ 把走廊壓縮掉的導航圖：節點只有路口與死路，邊是走廊 (含長度與隧道)。
+
+    大部分可走格子都是只有兩個出口的走廊，搜尋時不需要一格一格展開。
+    find_path() 在這張圖上跑 A* / BFS / DFS，最後再展開成逐格路徑；
+    search_steps() 是同樣的搜尋的可暫停版本 (見 search.py)。
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        size = grid.width * grid.height
+        self.node_of = array("i", [-1]) * size   # 格子 -> 節點編號
+        self.edge_of = array("i", [-1]) * size   # 走廊格子 -> 所在的邊
+        self.pos_of = array("i", [0]) * size     # 走廊格子在邊上的位置
+        self.nodes = []       # 節點的格子索引
+        self.edges = []       # (起點節點, 終點節點, 格子索引列表 [起點, ..., 終點])
+        self.adjacency = []   # 節點 -> [(邊編號, 相鄰節點, 長度, 是否順向)]
+        self.last_expanded = 0
+        self._build()
+
+    def _degree(self, i):
+        return bin(self.grid.exits[ACTOR_NAV][i]).count("1")
+
+    def _add_node(self, i):
+        self.node_of[i] = len(self.nodes)
+        self.nodes.append(i)
+        self.adjacency.append([])
+
+    def _step(self, i, direction):
+        width = self.grid.width
+        x, y = self.grid.neighbor(i % width, i // width, direction)
+        return y * width + x
+
+    def _build(self):
+        grid = self.grid
+        walkable = [i for i, code in enumerate(grid.tiles) if code != CODE_WALL]
+        for i in walkable:
+            if self._degree(i) != 2:
+                self._add_node(i)
+
+        # 從每個節點沿著每個出口走到下一個節點，記錄成一條邊
+        pending = list(range(len(self.nodes)))
+        while True:
+            for node in pending:
+                self._trace_edges(node)
+            # 沒有任何路口的環狀走廊：隨便挑一格當節點
+            loose = [i for i in walkable if self.node_of[i] < 0 and self.edge_of[i] < 0]
+            if not loose:
+                break
+            self._add_node(loose[0])
+            pending = [len(self.nodes) - 1]
+
+    def _trace_edges(self, node):
+        nav = self.grid.exits[ACTOR_NAV]
+        start = self.nodes[node]
+        for direction in DIRECTIONS:
+            if not nav[start] & DIR_BITS[direction]:
+                continue
+            first = self._step(start, direction)
+            # 這個方向的走廊已經從另一端記錄過了
+            if self.node_of[first] < 0 and self.edge_of[first] >= 0:
+                continue
+            if self.node_of[first] >= 0 and self._has_direct_edge(node, first, direction):
+                continue
+
+            tiles = [start, first]
+            current, heading = first, direction
+            while self.node_of[current] < 0:
+                reverse = (-heading[0], -heading[1])
+                heading = next(d for d in DIRECTIONS if nav[current] & DIR_BITS[d] and d != reverse)
+                current = self._step(current, heading)
+                tiles.append(current)
+
+            edge_id = len(self.edges)
+            end = self.node_of[current]
+            self.edges.append((node, end, tiles))
+            for pos in range(1, len(tiles) - 1):
+                self.edge_of[tiles[pos]] = edge_id
+                self.pos_of[tiles[pos]] = pos
+            length = len(tiles) - 1
+            self.adjacency[node].append((edge_id, end, length, True))
+            self.adjacency[end].append((edge_id, node, length, False))
+
+    def _has_direct_edge(self, node, neighbor_tile, direction):
+        """ 兩個相鄰路口之間長度 1 的邊是否已經記錄過 """
+        for edge_id, _, length, forward in self.adjacency[node]:
+            tiles = self.edges[edge_id][2]
+            if length == 1 and (tiles[1] if forward else tiles[0]) == neighbor_tile:
+                return True
+        return False
+
+    # --- 搜尋 ---
+
+    def _anchors(self, i):
+        """ 格子所連接的節點：[(節點, 距離, 邊, 是否沿邊順向)]，節點本身距離為 0 """
+        if self.node_of[i] >= 0:
+            return [(self.node_of[i], 0, -1, True)]
+        edge_id = self.edge_of[i]
+        a, b, tiles = self.edges[edge_id]
+        pos = self.pos_of[i]
+        return [(a, pos, edge_id, False), (b, len(tiles) - 1 - pos, edge_id, True)]
+
+    def _tile(self, i):
+        return (i % self.grid.width, i // self.grid.width)
+
+    def find_path(self, start, goal, algorithm, rng=random, max_expanded=None):
+        """ 回傳從 start 到 goal 的逐格路徑 (含起終點)，找不到回傳 None。
+
+        ALGO_ASTAR：加權 A* (啟發值為考慮隧道的曼哈頓距離)
+        ALGO_BFS：邊有長度，所以是 uniform-cost 的 BFS (Dijkstra)
+        ALGO_DFS：隨機順序的深度優先，路徑不保證最短
+
+        max_expanded 限制展開的節點數 (大型地圖用)：超過時如果還沒找到終點，
+        回傳通往已展開節點中離終點最近 (直線曼哈頓距離) 的那一個的部分路徑。
+        """
+        return run_search(self.search_steps(start, goal, algorithm, rng, max_expanded))
+
+    def search_steps(self, start, goal, algorithm, rng=random, max_expanded=None):
+        """ find_path 的可暫停版本 (generator)：每展開一個節點前 yield，中途停下時回傳部分路徑。
+        展開數記在區域變數裡，好幾個搜尋在同一張圖上交錯執行也不會互相干擾。
+        """
+        grid = self.grid
+        self.last_expanded = 0
+        if not (grid.in_bounds(*start) and grid.in_bounds(*goal)):
+            return None
+        start_i = grid.index(*start)
+        goal_i = grid.index(*goal)
+        if grid.tiles[start_i] == CODE_WALL or grid.tiles[goal_i] == CODE_WALL:
+            return None
+        if start_i == goal_i:
+            return [start]
+
+        start_anchors = self._anchors(start_i)
+        goal_cost = {}
+        for node, cost, edge_id, forward in self._anchors(goal_i):
+            if node not in goal_cost or cost < goal_cost[node][0]:
+                goal_cost[node] = (cost, edge_id, forward)
+
+        # 起點與終點在同一條走廊上：直接走過去也是候選
+        direct = None
+        if self.edge_of[start_i] >= 0 and self.edge_of[start_i] == self.edge_of[goal_i]:
+            direct = abs(self.pos_of[start_i] - self.pos_of[goal_i])
+
+        if algorithm == ALGO_DFS:
+            result = yield from self._dfs(start_anchors, goal_cost, direct, goal, rng, max_expanded)
+        else:
+            result = yield from self._best_first(start_anchors, goal_cost, direct, goal, algorithm == ALGO_ASTAR,
+                                                 max_expanded)
+        if result is None:
+            return None
+        return self._expand(start_i, goal_i, result, goal_cost)
+
+    def _closer(self, node, closest, goal):
+        """ 預算用完時的備案：記錄離終點最近的已展開節點 (節點, 距離) """
+        i = self.nodes[node]
+        distance = self.grid.wrap_distance(self._tile(i), goal)
+        if closest is None or distance < closest[1]:
+            return (node, distance)
+        return closest
+
+    def _closest_chain(self, came_from, closest, goal):
+        """ 搜尋被中途停下：有記錄最近的已展開節點就用它，否則從所有已發現的節點裡找 """
+        if closest is None:
+            for node in came_from:
+                closest = self._closer(node, closest, goal)
+        return self._node_chain(came_from, closest[0])
+
+    def _best_first(self, start_anchors, goal_cost, direct, goal, use_heuristic, max_expanded=None):
+        width = self.grid.width
+        def h(node):
+            if not use_heuristic:
+                return 0
+            i = self.nodes[node]
+            return self.grid.wrap_distance((i % width, i // width), goal)
+
+        best_goal = direct if direct is not None else float("inf")
+        goal_via = None  # None 表示直接走
+        g_score = {}
+        came_from = {}
+        open_set = []
+        for node, cost, edge_id, forward in start_anchors:
+            if cost < g_score.get(node, float("inf")):
+                g_score[node] = cost
+                came_from[node] = (None, edge_id, forward)
+                heappush(open_set, (cost + h(node), cost, node))
+
+        closest = None
+        expanded = self.last_expanded = 0
+        while open_set:
+            f, g, node = heappop(open_set)
+            if f >= best_goal:
+                break
+            if g > g_score[node]:
+                continue
+            if (yield):
+                if best_goal == float("inf"):
+                    return self._closest_chain(came_from, closest, goal)
+                break
+            if max_expanded is not None:
+                if closest is not None and expanded >= max_expanded:
+                    if best_goal == float("inf"):
+                        return self._node_chain(came_from, closest[0])
+                    break
+                closest = self._closer(node, closest, goal)
+            expanded = self.last_expanded = expanded + 1
+            if node in goal_cost and g + goal_cost[node][0] < best_goal:
+                best_goal = g + goal_cost[node][0]
+                goal_via = node
+            for edge_id, other, length, forward in self.adjacency[node]:
+                tentative = g + length
+                if tentative < g_score.get(other, float("inf")):
+                    g_score[other] = tentative
+                    came_from[other] = (node, edge_id, forward)
+                    heappush(open_set, (tentative + h(other), tentative, other))
+
+        if best_goal == float("inf"):
+            return None
+        return self._node_chain(came_from, goal_via)
+
+    def _dfs(self, start_anchors, goal_cost, direct, goal, rng, max_expanded=None):
+        if direct is not None:
+            return []
+        anchors = list(start_anchors)
+        rng.shuffle(anchors)
+        came_from = {}
+        stack = []
+        for node, _, edge_id, forward in anchors:
+            if node not in came_from:
+                came_from[node] = (None, edge_id, forward)
+                stack.append(node)
+        visited = set()
+        closest = None
+        expanded = self.last_expanded = 0
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            if (yield):
+                return self._closest_chain(came_from, closest, goal)
+            if max_expanded is not None:
+                if closest is not None and expanded >= max_expanded:
+                    return self._node_chain(came_from, closest[0])
+                closest = self._closer(node, closest, goal)
+            visited.add(node)
+            expanded = self.last_expanded = expanded + 1
+            if node in goal_cost:
+                return self._node_chain(came_from, node)
+            neighbors = list(self.adjacency[node])
+            rng.shuffle(neighbors)
+            for edge_id, other, _, forward in neighbors:
+                if other not in visited:
+                    came_from[other] = (node, edge_id, forward)
+                    stack.append(other)
+        return None
+
+    def _node_chain(self, came_from, last):
+        """ [(節點, 抵達它的邊, 是否順向)]，第一個元素是起點出發的那一段 """
+        chain = []
+        node = last
+        while node is not None:
+            prev, edge_id, forward = came_from[node]
+            chain.append((node, edge_id, forward))
+            node = prev
+        chain.reverse()
+        return chain
+
+    def _expand(self, start_i, goal_i, chain, goal_cost):
+        """ 把節點路徑展開成逐格路徑 """
+        path = [start_i]
+        if not chain:
+            # 同一條走廊上直接走
+            tiles = self.edges[self.edge_of[start_i]][2]
+            a, b = self.pos_of[start_i], self.pos_of[goal_i]
+            path.extend(tiles[a + 1:b + 1] if a < b else tiles[b:a][::-1])
+            return [self._tile(i) for i in path]
+
+        for index, (node, edge_id, forward) in enumerate(chain):
+            if edge_id < 0:
+                continue  # 起點本身就是節點
+            tiles = self.edges[edge_id][2]
+            if index == 0:
+                # 起點位於走廊中間，走到第一個節點
+                pos = self.pos_of[start_i]
+                path.extend(tiles[pos + 1:] if forward else tiles[:pos][::-1])
+            else:
+                path.extend(tiles[1:] if forward else tiles[:-1][::-1])
+
+        last = chain[-1][0]
+        if last not in goal_cost:
+            return [self._tile(i) for i in path]  # 預算用完的部分路徑：停在最後一個節點
+        cost, edge_id, forward = goal_cost[last]
+        if edge_id >= 0:
+            # 終點位於走廊中間，從最後一個節點走進去
+            tiles = self.edges[edge_id][2]
+            pos = self.pos_of[goal_i]
+            path.extend(tiles[pos:-1][::-1] if forward else tiles[1:pos + 1])
+        return [self._tile(i) for i in path]
+
+
+
+_loaded_tables = {}
+_loaded_graphs = {}
+
+
+def load_nav_table(map_strings=MAP_STRINGS, cache_dir=NAV_CACHE_DIR):
+    """ 取得地圖的導航表：同一個行程內共用，磁碟上有快取就直接讀，否則建表後寫入快取 """
+    key = layout_hash(map_strings)
+    if key in _loaded_tables:
+        return _loaded_tables[key]
+
+    cache_path = os.path.join(cache_dir, f"nav_{key}.bin") if cache_dir else None
+    table = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            table = NavTable.load(map_strings, cache_path)
+        except (OSError, ValueError, EOFError):
+            table = None
+
+    if table is None:
+        table = NavTable(map_strings)
+        if cache_path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                table.save(cache_path)
+            except OSError:
+                pass  # 快取寫不進去 (例如唯讀目錄) 不影響遊戲
+
+    _loaded_tables[key] = table
+    return table
+
+
+def load_junction_graph(grid):
+    """ 取得地圖的路口圖 (同一佈局在行程內共用；牆壁不會變，所以共用是安全的) """
+    key = (grid.width, hashlib.sha1(grid.initial_tiles).hexdigest())
+    if key not in _loaded_graphs:
+        _loaded_graphs[key] = JunctionGraph(grid)
+    return _loaded_graphs[key]
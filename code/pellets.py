@@ -0,0 +1,215 @@
+# pellets.py
+""" 剩下的豆子的索引，不必掃過整張地圖就能知道豆子在哪裡。
+
+位元集是每一列一個整數 (第 x 個 bit = 這一列第 x 格有豆子或大力丸)，另外把地圖切成
+PELLET_REGION_TILES x PELLET_REGION_TILES 的區域記錄每一區剩幾顆。玩家吃掉豆子時由
+Grid.eat() 更新，數量都是 O(1)；最近的豆子由近到遠一圈一圈檢查區域，跳過空的區域，
+剩下的區域不多時 (關卡尾聲找最後幾顆豆子) 改成直接比較每個非空區域。範圍查詢只看半徑內的列。
+距離一律是直線曼哈頓距離 (不考慮牆壁與隧道)。
+"""
+from settings import *
+from grid import CODE_PELLET, CODE_POWER_PELLET
+
+# 把地圖的一列轉成 "0" / "1" 字串 (有豆子或大力丸為 "1")，再用 int(..., 2) 變成位元集
+_EDIBLE = bytes(ord("1") if code in (CODE_PELLET, CODE_POWER_PELLET) else ord("0") for code in range(256))
+
+
+class PelletIndex:
+    """ 一張地圖 (grid.Grid) 上剩下的豆子。
+
+    pellets 是一般豆子的數量 (過關條件)，power 是大力丸的數量；
+    region_counts[ry * regions_x + rx] 是第 (rx, ry) 個區域剩下的豆子 + 大力丸 (熱度圖可以直接用)。
+    """
+
+    def __init__(self, grid, region_size=PELLET_REGION_TILES, pellet_bits=None, pellet_count=None):
+        self.grid = grid
+        self.width = grid.width
+        self.height = grid.height
+        self.region_size = region_size
+        self.regions_x = -(-self.width // region_size)
+        self.regions_y = -(-self.height // region_size)
+        if pellet_bits is not None:
+            self._build_from_bits(pellet_bits, pellet_count)
+        else:
+            self._build(grid.initial_tiles)
+        self.reset()
+
+    def _build(self, tiles):
+        """ 從關卡一開始的格子建立初始狀態 (reset 時直接複製) """
+        width = self.width
+        rows = []
+        for y in range(self.height):
+            row = bytes(tiles[y * width:(y + 1) * width]).translate(_EDIBLE)
+            rows.append(int(row[::-1], 2))
+        pellets = bytes(tiles).count(CODE_PELLET)
+        self._build_counts(rows, pellets, sum(bin(bits).count("1") for bits in rows) - pellets)
+
+    def _build_from_bits(self, pellet_bits, pellet_count):
+        """ 編譯過的關卡 (levelpack.CompiledLevel)：直接切開位元集 (第 i 格是 bit i)，不必掃過格子 """
+        width = self.width
+        bits = int.from_bytes(pellet_bits, "little")
+        mask = (1 << width) - 1
+        rows = [(bits >> (y * width)) & mask for y in range(self.height)]
+        self._build_counts(rows, pellet_count, bin(bits).count("1") - pellet_count)
+
+    def _build_counts(self, rows, pellets, power):
+        size = self.region_size
+        counts = [0] * (self.regions_x * self.regions_y)
+        mask = (1 << size) - 1
+        for y, bits in enumerate(rows):
+            base = (y // size) * self.regions_x
+            rx = 0
+            while bits:
+                counts[base + rx] += bin(bits & mask).count("1")
+                bits >>= size
+                rx += 1
+        self._initial_rows = rows
+        self._initial_counts = counts
+        self._initial_nonempty = {i for i, count in enumerate(counts) if count}
+        self._initial_pellets = pellets
+        self._initial_power = power
+
+    def reset(self):
+        """ 新關卡：豆子全部補回來 """
+        self.rows = list(self._initial_rows)
+        self.region_counts = list(self._initial_counts)
+        self.nonempty = set(self._initial_nonempty)  # 還有豆子的區域編號
+        self.pellets = self._initial_pellets
+        self.power = self._initial_power
+
+    @property
+    def count(self):
+        """ 剩下的豆子 + 大力丸 """
+        return self.pellets + self.power
+
+    def remove(self, x, y, code):
+        """ 第 (x, y) 格的豆子被吃掉 (code 是原本的格子代碼) """
+        self.rows[y] &= ~(1 << x)
+        size = self.region_size
+        region = (y // size) * self.regions_x + x // size
+        self.region_counts[region] -= 1
+        if not self.region_counts[region]:
+            self.nonempty.discard(region)
+        if code == CODE_PELLET:
+            self.pellets -= 1
+        else:
+            self.power -= 1
+
+    def add(self, x, y, code):
+        """ remove() 的反向操作 (倒帶時把豆子放回去) """
+        self.rows[y] |= 1 << x
+        size = self.region_size
+        region = (y // size) * self.regions_x + x // size
+        self.region_counts[region] += 1
+        self.nonempty.add(region)
+        if code == CODE_PELLET:
+            self.pellets += 1
+        else:
+            self.power += 1
+
+    def has(self, x, y):
+        return 0 <= y < self.height and 0 <= x < self.width and bool(self.rows[y] >> x & 1)
+
+    def region_count(self, x, y):
+        """ (x, y) 這一格所在的區域剩下幾顆 """
+        size = self.region_size
+        return self.region_counts[(y // size) * self.regions_x + x // size]
+
+    def nearest(self, x, y, max_distance=None):
+        """ 離 (x, y) 最近的剩餘豆子 (含大力丸) 的座標，沒有 (或都超過 max_distance) 時回傳 None """
+        if not self.count:
+            return None
+        x = min(max(int(x), 0), self.width - 1)  # 隧道裡的座標當作在地圖邊緣
+        y = min(max(int(y), 0), self.height - 1)
+        size = self.region_size
+        best = None
+        best_distance = max_distance + 1 if max_distance is not None else self.width + self.height
+        rx, ry = x // size, y // size
+        if len(self.nonempty) <= NEAREST_SCAN_REGIONS:
+            return self._nearest_listed(x, y, best_distance)
+        for ring in range(max(self.regions_x, self.regions_y)):
+            # 第 ring 圈的區域至少隔了 (ring - 1) 個完整的區域
+            if ring and (ring - 1) * size + 1 >= best_distance:
+                break
+            for cx, cy in self._ring(rx, ry, ring):
+                if self.region_counts[cy * self.regions_x + cx]:
+                    best, best_distance = self._scan_region(cx, cy, x, y, best, best_distance)
+        return best
+
+    def _nearest_listed(self, x, y, best_distance):
+        """ 非空區域不多時：依區域到 (x, y) 的最短距離由近到遠檢查，下界不小於目前最佳距離就停 """
+        size = self.region_size
+        candidates = []
+        for region in self.nonempty:
+            cy, cx = divmod(region, self.regions_x)
+            x0, y0 = cx * size, cy * size
+            bound = max(x0 - x, 0, x - (x0 + size - 1)) + max(y0 - y, 0, y - (y0 + size - 1))
+            candidates.append((bound, region))
+        candidates.sort()
+        best = None
+        for bound, region in candidates:
+            if bound >= best_distance:
+                break
+            cy, cx = divmod(region, self.regions_x)
+            best, best_distance = self._scan_region(cx, cy, x, y, best, best_distance)
+        return best
+
+    def _ring(self, rx, ry, ring):
+        """ 和區域 (rx, ry) 相隔 ring 圈 (切比雪夫距離) 且在地圖內的區域 """
+        if ring == 0:
+            yield (rx, ry)
+            return
+        for cy in range(max(ry - ring, 0), min(ry + ring, self.regions_y - 1) + 1):
+            if abs(cy - ry) == ring:
+                for cx in range(max(rx - ring, 0), min(rx + ring, self.regions_x - 1) + 1):
+                    yield (cx, cy)
+            else:
+                if rx - ring >= 0:
+                    yield (rx - ring, cy)
+                if rx + ring < self.regions_x:
+                    yield (rx + ring, cy)
+
+    def _scan_region(self, cx, cy, x, y, best, best_distance):
+        size = self.region_size
+        x0 = cx * size
+        mask = (1 << size) - 1
+        for ty in range(cy * size, min((cy + 1) * size, self.height)):
+            bits = self.rows[ty] >> x0 & mask
+            dy = abs(ty - y)
+            while bits:
+                low = bits & -bits
+                tx = x0 + low.bit_length() - 1
+                distance = abs(tx - x) + dy
+                if distance < best_distance:
+                    best, best_distance = (tx, ty), distance
+                bits ^= low
+        return best, best_distance
+
+    def within(self, x, y, radius):
+        """ 和 (x, y) 的曼哈頓距離不超過 radius 的所有剩餘豆子座標 (由上而下、由左而右) """
+        x, y = int(x), int(y)
+        found = []
+        for ty in range(max(y - radius, 0), min(y + radius, self.height - 1) + 1):
+            reach = radius - abs(ty - y)
+            x0 = max(x - reach, 0)
+            x1 = min(x + reach, self.width - 1)
+            if x1 < x0:
+                continue
+            bits = self.rows[ty] >> x0 & ((1 << (x1 - x0 + 1)) - 1)
+            while bits:
+                low = bits & -bits
+                found.append((x0 + low.bit_length() - 1, ty))
+                bits ^= low
+        return found
+
+    def count_within(self, x, y, radius):
+        """ 半徑內剩幾顆 (不建立座標列表) """
+        x, y = int(x), int(y)
+        total = 0
+        for ty in range(max(y - radius, 0), min(y + radius, self.height - 1) + 1):
+            reach = radius - abs(ty - y)
+            x0 = max(x - reach, 0)
+            x1 = min(x + reach, self.width - 1)
+            if x1 >= x0:
+                total += bin(self.rows[ty] >> x0 & ((1 << (x1 - x0 + 1)) - 1)).count("1")
+        return total
@@ -0,0 +1,318 @@
+# planner.py
+""" 非同步路徑規劃：鬼魂的完整搜尋交給背景執行緒或行程池，不在遊戲迴圈裡跑。
+
+鬼魂在格子中心需要新路徑時送出 (起點, 終點, 演算法) 請求，起點是牠這一步要走到的下一格；
+走到下一格的中心時 (期限) 如果結果好了就照著走，還沒好就取消請求、這一格用
+get_valid_directions 的貪婪選擇，再從新的下一格送出請求。所以不管搜尋多慢，
+遊戲迴圈每一幀的耗時都不會被拖長。
+
+三種模式：
+    thread   一條背景執行緒，有自己的地圖、路口圖與解題器 (統計計數不和遊戲迴圈搶著寫)。
+             受 GIL 限制，搜尋與遊戲迴圈輪流執行，但單次慢搜尋不會卡住一整幀；
+             排隊中的舊請求會被同一隻鬼的新請求取代，已經開始的搜尋取消後也會在幾十個節點內停下來。
+    process  幾個工作行程 (PLANNER_WORKERS)，各自建立地圖與路口圖，搜尋真正平行執行；
+             每隻鬼固定送到同一個工作行程，排隊中的舊請求會被同一隻鬼的新請求取代。
+             工作行程由 forkserver (沒有的平台用 spawn) 建立，不會從已經有執行緒的遊戲行程 fork。
+    budget   不開執行緒：Game 每幀呼叫 run()，在 AI_FRAME_BUDGET_MS 內輪流推進各隻鬼的
+             可暫停搜尋 (search.py)。期限到了還沒搜完的鬼拿目前最好的部分路徑，而不是貪婪選擇。
+
+結果取決於搜尋完成的時間，使用規劃器的遊戲不是確定性的 (不能錄影重播)。
+"""
+import os
+import random
+import signal
+import threading
+import time
+import multiprocessing
+from collections import deque
+from settings import *
+from grid import Grid
+from ghost import Ghost
+from navigation import JunctionGraph
+from search import SearchTask
+
+PLANNER_MODES = ["thread", "process", "budget"]
+
+# 遊戲行程裡可能已經有別的執行緒 (SDL、日誌)，fork 出來的子行程可能卡在繼承來的鎖上。
+# forkserver 從一個乾淨的單執行緒行程 fork，預先載入這個模組，開工作行程不必每次重新 import
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _mp = multiprocessing.get_context("forkserver")
+    _mp.set_forkserver_preload([__name__])
+else:
+    _mp = multiprocessing.get_context("spawn")
+
+
+class Searcher:
+    """ 在一份地圖上執行搜尋；每種演算法一個不動的 Ghost 當解題器 (同 benchmark.py) """
+
+    def __init__(self, grid, nav_graph=None, search_budget=None):
+        self.grid = grid
+        self.nav_graph = nav_graph
+        self.search_budget = search_budget
+        self.solvers = {}
+
+    def plan(self, start, goal, algorithm, seed, cancelled=None):
+        """ 搜尋並回傳路徑。有 cancelled (無參數函式) 時每展開 AI_SLICE_NODES 個節點檢查一次，
+        回傳 True 就停止搜尋並回傳 None
+        """
+        solver = self.solvers.get(algorithm)
+        if solver is None:
+            solver = self.solvers[algorithm] = self.make_solver(algorithm, random.Random())
+        solver.rng.seed(seed)
+        if cancelled is None:
+            return solver.find_path(start, goal, self.grid)
+        task = SearchTask(solver.search_steps(start, goal, self.grid))
+        while not task.advance(AI_SLICE_NODES):
+            if cancelled():
+                task.cancel()
+                return None
+        return task.path
+
+    def plan_steps(self, start, goal, algorithm, seed):
+        """ 可暫停的搜尋 (generator)；每個搜尋有自己的解題器與亂數，可以交錯執行 """
+        solver = self.make_solver(algorithm, random.Random(seed))
+        return solver.search_steps(start, goal, self.grid)
+
+    def make_solver(self, algorithm, rng):
+        return Ghost(0, 0, WHITE, ai_mode=None, chosen_algorithm=algorithm, nav_graph=self.nav_graph,
+                     search_budget=self.search_budget, rng=rng)
+
+
+def _make_searcher(tiles, width, use_nav_graph, search_budget):
+    """ 從關卡一開始的格子建立私有的地圖、路口圖與 Searcher (不和遊戲共用任何會寫入的物件) """
+    text = bytes(tiles).decode("ascii")
+    grid = Grid([text[y:y + width] for y in range(0, len(text), width)])
+    return Searcher(grid, JunctionGraph(grid) if use_nav_graph else None, search_budget)
+
+
+def _worker_loop(conn, tiles, width, use_nav_graph, search_budget):
+    """ 工作行程：收請求、搜尋、送回 (請求編號, 路徑)。同一隻鬼排隊中的請求只做最新的那一個 """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # 保險起見：terminate() 一定能結束這個行程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C 交給主行程處理，由 close() 收尾
+    if hasattr(os, "nice"):
+        os.nice(PLANNER_NICE)  # 降低優先權：CPU 不夠時讓遊戲迴圈先跑
+    searcher = _make_searcher(tiles, width, use_nav_graph, search_budget)
+    while True:
+        try:
+            pending = {}
+            message = conn.recv()
+            while True:
+                if message is None:  # close() 送來的結束訊號
+                    return
+                request_id, owner, args = message
+                pending.pop(owner, None)
+                pending[owner] = (request_id, args)
+                if not conn.poll():
+                    break
+                message = conn.recv()
+            for request_id, args in pending.values():
+                conn.send((request_id, searcher.plan(*args)))
+        except (EOFError, OSError):
+            return
+
+
+class ThreadRequest:
+    """ 送到規劃執行緒的請求，介面同 Future (done / result / cancel)。
+    取消已經開始的請求時，搜尋會在下一次檢查時停下來，不會讓後面的請求一直等
+    """
+    __slots__ = ("args", "cancelled", "finished", "path")
+
+    def __init__(self, args):
+        self.args = args
+        self.cancelled = False
+        self.finished = False
+        self.path = None
+
+    def done(self):
+        return self.finished
+
+    def result(self):
+        return self.path
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+
+class WorkerRequest:
+    """ 送到工作行程的請求，介面同 Future (done / result / cancel)，查詢時不會阻塞 """
+    __slots__ = ("planner", "request_id")
+
+    def __init__(self, planner, request_id):
+        self.planner = planner
+        self.request_id = request_id
+
+    def done(self):
+        return self.planner.poll(self.request_id)
+
+    def result(self):
+        self.planner.outstanding.discard(self.request_id)
+        return self.planner.results.pop(self.request_id, None)
+
+    def cancel(self):
+        self.planner.outstanding.discard(self.request_id)
+        self.planner.results.pop(self.request_id, None)
+        return True
+
+
+def make_planner(grid, nav_graph=None, search_budget=None, mode="thread", budget_ms=AI_FRAME_BUDGET_MS):
+    if mode == "budget":
+        return FrameScheduler(grid, nav_graph, search_budget, budget_ms)
+    return Planner(grid, nav_graph, search_budget, mode)
+
+
+class FrameScheduler:
+    """ budget 模式：搜尋在遊戲迴圈裡執行，但每幀只花 budget_ms 毫秒，分散到各隻鬼與好幾幀 """
+    anytime = True  # 沒搜完的請求也可以 result()，拿到部分路徑
+
+    def __init__(self, grid, nav_graph=None, search_budget=None, budget_ms=AI_FRAME_BUDGET_MS,
+                 slice_nodes=AI_SLICE_NODES):
+        self.searcher = Searcher(grid, nav_graph, search_budget)
+        self.budget = budget_ms / 1000
+        self.slice_nodes = slice_nodes
+        self.tasks = {}         # owner -> 還沒搜完的請求 (每隻鬼最多一個)
+        self.queue = deque()    # 輪流推進的順序
+        self.busy_frames = 0    # 用完整個預算的幀數 (統計用)
+
+    def submit(self, start, goal, algorithm, seed, owner=0):
+        old = self.tasks.get(owner)
+        if old is not None:
+            old.cancel()
+            self.queue.remove(owner)
+        task = self.tasks[owner] = SearchTask(self.searcher.plan_steps(start, goal, algorithm, seed))
+        self.queue.append(owner)
+        return task
+
+    def run(self):
+        """ 每幀呼叫一次：輪流讓每個請求展開 slice_nodes 個節點，直到搜完或用完這一幀的預算 """
+        tasks = self.tasks
+        queue = self.queue
+        deadline = time.perf_counter() + self.budget
+        while queue:
+            owner = queue[0]
+            task = tasks[owner]
+            if task.finished or task.advance(self.slice_nodes):
+                # 搜完、被取消或已經被取用 (部分路徑)
+                del tasks[owner]
+                queue.popleft()
+            else:
+                queue.rotate(-1)
+            if time.perf_counter() >= deadline:
+                if queue:
+                    self.busy_frames += 1
+                return
+
+    def close(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+        self.queue.clear()
+
+
+class Planner:
+    """ 送出搜尋請求，回傳有 done() / result() / cancel() 的請求物件 """
+    anytime = False  # 請求沒完成前不能取結果 (取消後這一格用貪婪選擇)
+
+    def __init__(self, grid, nav_graph=None, search_budget=None, mode="thread", workers=PLANNER_WORKERS):
+        if mode not in PLANNER_MODES:
+            raise ValueError(f"unknown planner mode {mode!r}")
+        self.mode = mode
+        self.thread = None
+        self.connections = []
+        if mode == "thread":
+            # 不用 ThreadPoolExecutor：已經開始的工作取消不了。這裡自己排隊，每隻鬼只留最新的請求
+            self.searcher = _make_searcher(grid.initial_tiles, grid.width, nav_graph is not None, search_budget)
+            self.pending = {}       # owner -> 還沒開始的請求 (依送出順序處理)
+            self.running = None     # 正在搜尋的請求
+            self.closing = False
+            self.wakeup = threading.Condition()
+            self.thread = threading.Thread(target=self._thread_loop, name="planner", daemon=True)
+            self.thread.start()
+        else:
+            # 不用 ProcessPoolExecutor：它的輔助執行緒會和遊戲迴圈搶 GIL。這裡只在鬼魂查詢時非阻塞地讀管線
+            self.workers = []
+            # 工作行程會重新 import 主程式 (main.py 會 import pygame)，不要每個都再印一次 pygame 的歡迎訊息
+            os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+            for _ in range(workers):
+                conn, child = _mp.Pipe()
+                worker = _mp.Process(target=_worker_loop, daemon=True,
+                                     args=(child, bytes(grid.initial_tiles), grid.width, nav_graph is not None,
+                                           search_budget))
+                worker.start()
+                child.close()
+                self.connections.append(conn)
+                self.workers.append(worker)
+            self.next_id = 0
+            self.outstanding = set()  # 還在等結果的請求編號 (取消的請求送回來時直接丟掉)
+            self.results = {}
+
+    def submit(self, start, goal, algorithm, seed, owner=0):
+        """ owner 相同的請求送到同一個工作行程 (排隊中的舊請求會被新請求取代) """
+        if self.thread is not None:
+            request = ThreadRequest((start, goal, algorithm, seed))
+            with self.wakeup:
+                old = self.pending.pop(owner, None)
+                if old is not None:
+                    old.cancel()
+                self.pending[owner] = request
+                self.wakeup.notify()
+            return request
+        request_id = self.next_id
+        self.next_id += 1
+        self.outstanding.add(request_id)
+        conn = self.connections[hash(owner) % len(self.connections)]
+        conn.send((request_id, owner, (start, goal, algorithm, seed)))
+        return WorkerRequest(self, request_id)
+
+    def run(self):
+        """ 搜尋在背景執行，每幀不需要做事 """
+
+    def _thread_loop(self):
+        """ 規劃執行緒：依序處理每隻鬼最新的請求，跳過已經取消的 """
+        while True:
+            with self.wakeup:
+                while not self.pending and not self.closing:
+                    self.wakeup.wait()
+                if self.closing:
+                    return
+                request = self.pending.pop(next(iter(self.pending)))
+                if request.cancelled:
+                    continue
+                self.running = request
+            request.path = self.searcher.plan(*request.args, cancelled=lambda: request.cancelled)
+            request.finished = True
+            self.running = None
+
+    def poll(self, request_id):
+        """ 收下所有已經送回來的結果，回傳 request_id 是否已完成 """
+        for conn in self.connections:
+            while conn.poll():
+                done_id, path = conn.recv()
+                if done_id in self.outstanding:
+                    self.results[done_id] = path
+        return request_id in self.results
+
+    def close(self):
+        if self.thread is not None:
+            with self.wakeup:
+                self.closing = True
+                for request in self.pending.values():
+                    request.cancel()
+                self.pending.clear()
+                if self.running is not None:
+                    self.running.cancel()
+                self.wakeup.notify()
+            self.thread.join()
+            return
+        # 明確送出結束訊號，不必等工作行程發現管線關了
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        for worker in self.workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
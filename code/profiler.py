@@ -0,0 +1,98 @@
+# profiler.py
+""" 每幀各區段的耗時統計。
+
+用法：
+    start = profiler.start()
+    ...要量測的程式...
+    profiler.stop("player", start)
+
+每個區段保留最近 PROFILE_WINDOW 筆耗時 (毫秒)，可隨時算出 p50 / p95 / p99。
+不需要量測時使用 NULL_PROFILER，start/stop 幾乎沒有成本。
+"""
+import csv
+import json
+import time
+from collections import deque
+from settings import *
+
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, window=PROFILE_WINDOW):
+        self.window = window
+        self.samples = {}  # 區段名稱 -> 最近的耗時 (毫秒)
+        self.counts = {}   # 區段名稱 -> 總共量測次數
+        self.totals = {}   # 區段名稱 -> 總耗時 (毫秒)
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, name, start):
+        self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+            self.counts[name] = 0
+            self.totals[name] = 0.0
+        samples.append(ms)
+        self.counts[name] += 1
+        self.totals[name] += ms
+
+    def percentiles(self, name):
+        """ 最近 window 筆的 (p50, p95, p99) """
+        ordered = sorted(self.samples[name])
+        last = len(ordered) - 1
+        return tuple(ordered[min(last, int(p / 100 * len(ordered)))] for p in PERCENTILES)
+
+    def summary(self):
+        result = {}
+        for name in sorted(self.samples):
+            p50, p95, p99 = self.percentiles(name)
+            result[name] = {
+                "count": self.counts[name],
+                "mean_ms": self.totals[name] / self.counts[name],
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+            }
+        return result
+
+    def lines(self):
+        """ 給日誌面板顯示的文字 (每個區段一行) """
+        return [f"{name:<14}{s['p50_ms']:6.2f}{s['p95_ms']:6.2f}{s['p99_ms']:6.2f}"
+                for name, s in self.summary().items()]
+
+    def export(self, path):
+        """ 依副檔名輸出 JSON 或 CSV """
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["section", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+                for name, s in summary.items():
+                    writer.writerow([name, s["count"], s["mean_ms"], s["p50_ms"], s["p95_ms"], s["p99_ms"]])
+        else:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+
+
+class NullProfiler:
+    """ 不量測：預設使用，讓熱路徑上的 start/stop 幾乎免費 """
+    enabled = False
+
+    def start(self):
+        return 0
+
+    def stop(self, name, start):
+        pass
+
+    def add(self, name, ms):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,367 @@
+# render.py
+import pygame
+from collections import OrderedDict
+from settings import *
+from grid import *
+
+
+def _to_display_format(surface):
+    """ 有視窗時轉成螢幕的像素格式，blit 會快很多 """
+    if pygame.display.get_surface() is not None:
+        return surface.convert()
+    return surface
+
+
+_fonts = {}
+
+def get_font(size):
+    """ 第一次用到某個字級時才初始化 pygame.font 並載入字型 """
+    font = _fonts.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+
+class TextCache:
+    """ 有上限的 LRU 快取：以 (字級, 文字, 顏色) 為 key 保存已經 render 好的文字 Surface """
+
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        """ font 是 settings 裡的字級 (例如 SCORE_FONT) """
+        key = (font, text, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            return surf
+        surf = get_font(font).render(text, True, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surf
+
+
+text_cache = TextCache()
+
+def render_text(font, text, color):
+    return text_cache.render(font, text, color)
+
+
+def log_panel_key(game):
+    """ 面板內容有變動時這個 key 才會改變 """
+    return (game.logger.version, game.player_lives, game.current_level, game.selected_algorithm, log_panel.overlay)
+
+
+class LogPanel:
+    """ 日誌面板先組合在自己的 Surface 上，只有日誌或生命/關卡改變時才重畫。
+
+    overlay 不是 None 時 (效能分析開啟)，日誌的位置改成顯示 overlay 的每一行 (分兩欄)。
+    """
+
+    def __init__(self):
+        self.surface = None
+        self.key = None
+        self.overlay = None
+
+    def rebuild(self, game):
+        if self.surface is None:
+            self.surface = _to_display_format(pygame.Surface((SCREEN_WIDTH, LOG_HEIGHT)))
+        self.surface.fill((20, 20, 20))
+        pygame.draw.line(self.surface, WHITE, (0, 0), (SCREEN_WIDTH, 0), 2)
+        start_y = 10
+
+        # 顯示生命值與關卡
+        info_text = f"LIVES: {game.player_lives} / {MAX_LIVES}   LEVEL: {game.current_level}   ALGO: {game.selected_algorithm}"
+        self.surface.blit(render_text(LOG_FONT, info_text, YELLOW), (10, start_y))
+
+        if self.overlay is not None:
+            # 顯示效能分析 (毫秒)，一欄放不下就換到右邊那一欄
+            header = f"{'section':<14}{'p50':>6}{'p95':>6}{'p99':>6}"
+            rows = MAX_LOGS - 1
+            for column in range(2):
+                x = 10 + column * SCREEN_WIDTH // 2
+                self.surface.blit(render_text(LOG_FONT, header, CYAN), (x, start_y + 20))
+                for i, line in enumerate(self.overlay[column * rows:(column + 1) * rows]):
+                    self.surface.blit(render_text(LOG_FONT, line, WHITE), (x, start_y + 38 + i * 18))
+        else:
+            # 顯示日誌
+            for i, record in enumerate(game.logger.records):
+                color = ORANGE if record.level >= LOG_WARNING else WHITE
+                self.surface.blit(render_text(LOG_FONT, record.format(), color), (10, start_y + 20 + i * 18))
+        self.key = log_panel_key(game)
+
+    def draw(self, surface, game):
+        if self.surface is None or self.key != log_panel_key(game):
+            self.rebuild(game)
+        return surface.blit(self.surface, (0, MAP_HEIGHT))
+
+
+log_panel = LogPanel()
+
+def draw_logs(surface, game):
+    """ 畫底部的日誌面板，回傳面板範圍 """
+    return log_panel.draw(surface, game)
+
+
+SCORE_POS = (10, MAP_HEIGHT - 25)
+
+def score_text(game):
+    return f"SCORE: {int(game.player.score)}"
+
+def draw_score(surface, game):
+    """ 畫分數，回傳文字範圍 """
+    score_surf = render_text(SCORE_FONT, score_text(game), WHITE)
+    return surface.blit(score_surf, SCORE_POS)
+
+
+class MazeRenderer:
+    """ 預先畫好的迷宮圖層。
+
+    牆壁與門只在建立時畫一次到背景 Surface；豆子畫在另一個持續存在的圖層上，
+    只有玩家吃掉豆子時才把那一格擦掉。每一幀只需要 blit 一次。
+    """
+
+    def __init__(self, game_map):
+        width = game_map.width * TILE_SIZE
+        height = game_map.height * TILE_SIZE
+        self.background = _to_display_format(pygame.Surface((width, height)))
+        self.background.fill(BLACK)
+        for y in range(game_map.height):
+            for x in range(game_map.width):
+                code = game_map.tiles[y * game_map.width + x]
+                rect_x = x * TILE_SIZE
+                rect_y = y * TILE_SIZE
+                if code == CODE_WALL:
+                    pygame.draw.rect(self.background, BLUE, (rect_x, rect_y, TILE_SIZE, TILE_SIZE))
+                elif code == CODE_DOOR:
+                    pygame.draw.line(self.background, GREY, (rect_x, rect_y + TILE_SIZE//2), (rect_x + TILE_SIZE, rect_y + TILE_SIZE//2), 2)
+
+        self.layer = None
+        self.reset(game_map)
+
+    def reset(self, game_map):
+        """ 新關卡：從背景重新複製一份，把所有豆子畫回去 """
+        self.layer = self.background.copy()
+        for y in range(game_map.height):
+            for x in range(game_map.width):
+                code = game_map.tiles[y * game_map.width + x]
+                center = (x * TILE_SIZE + TILE_SIZE // 2, y * TILE_SIZE + TILE_SIZE // 2)
+                if code == CODE_PELLET:
+                    pygame.draw.circle(self.layer, WHITE, center, 2)
+                elif code == CODE_POWER_PELLET:
+                    pygame.draw.circle(self.layer, WHITE, center, 6)
+
+    def erase_pellet(self, x, y):
+        """ 豆子被吃掉：用背景蓋回那一格 """
+        rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+        self.layer.blit(self.background, rect, rect)
+
+    def draw(self, surface, camera=None):
+        offset = camera.offset if camera else (0, 0)
+        surface.blit(self.layer, (-offset[0], -offset[1]))
+
+
+class Camera:
+    """ 跟著玩家捲動的視窗範圍 (像素)。地圖比視窗小時固定在左上角，offset 永遠是 (0, 0) """
+
+    def __init__(self, game_map, view_width=SCREEN_WIDTH, view_height=MAP_HEIGHT):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.map_width = game_map.width * TILE_SIZE
+        self.map_height = game_map.height * TILE_SIZE
+        self.scrolls = self.map_width > view_width or self.map_height > view_height
+        self.offset = (0, 0)
+
+    def follow(self, pixel_x, pixel_y):
+        """ 讓 (pixel_x, pixel_y) 盡量在畫面中央，但不超出地圖邊界 """
+        x = min(max(0, int(pixel_x) - self.view_width // 2), max(0, self.map_width - self.view_width))
+        y = min(max(0, int(pixel_y) - self.view_height // 2), max(0, self.map_height - self.view_height))
+        self.offset = (x, y)
+
+    def visible_tiles(self):
+        """ 畫面上看得到的格子範圍 (x0, y0, x1, y1)，x1 / y1 不包含 """
+        x, y = self.offset
+        return (x // TILE_SIZE, y // TILE_SIZE,
+                -(-(x + self.view_width) // TILE_SIZE), -(-(y + self.view_height) // TILE_SIZE))
+
+
+class MotionLerp:
+    """ 畫面內插：畫面更新率和邏輯幀脫鉤後，角色畫在上一個邏輯幀和目前邏輯幀之間 (alpha = 0..1)。
+
+    每推進一個邏輯幀之前呼叫 capture() 記下當時的位置。一幀內移動超過一格
+    (穿過隧道、重生、換關卡) 時不內插，直接畫在目前的位置。
+    """
+
+    def __init__(self):
+        self.game = None
+        self.previous = []
+        self.swarm_previous = None
+
+    def capture(self, game):
+        self.game = game
+        self.previous = [(sprite.pixel_x, sprite.pixel_y) for sprite in [game.player] + game.ghosts]
+        swarm = game.swarm
+        self.swarm_previous = (swarm.pixel_x.copy(), swarm.pixel_y.copy()) if swarm else None
+
+    def shift(self, game, index, sprite, alpha):
+        """ 第 index 個角色 (0 = 玩家，之後是鬼) 內插後的位置減去目前位置 """
+        if game is not self.game or index >= len(self.previous):
+            return (0, 0)
+        old_x, old_y = self.previous[index]
+        dx = old_x - sprite.pixel_x
+        dy = old_y - sprite.pixel_y
+        if abs(dx) > TILE_SIZE or abs(dy) > TILE_SIZE:
+            return (0, 0)
+        return (dx * (1 - alpha), dy * (1 - alpha))
+
+    def swarm_positions(self, game, alpha):
+        swarm = game.swarm
+        if game is not self.game or self.swarm_previous is None or len(self.swarm_previous[0]) != len(swarm.pixel_x):
+            return None
+        positions = []
+        for old, new in zip(self.swarm_previous, (swarm.pixel_x, swarm.pixel_y)):
+            delta = old - new
+            delta[abs(delta) > TILE_SIZE] = 0
+            positions.append(new + delta * (1 - alpha))
+        return positions
+
+
+class ChunkedMazeRenderer:
+    """ 大型地圖的迷宮圖層：地圖切成 CHUNK_TILES x CHUNK_TILES 的區塊，
+    只畫鏡頭看得到的區塊，畫好的區塊 Surface 以 LRU 快取 (最多 CHUNK_CACHE_SIZE 個)。
+    介面與 MazeRenderer 相同 (reset / erase_pellet / draw)。
+    """
+
+    def __init__(self, game_map, chunk_tiles=CHUNK_TILES, max_chunks=CHUNK_CACHE_SIZE):
+        self.game_map = game_map
+        self.chunk_tiles = chunk_tiles
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+
+    def reset(self, game_map):
+        """ 新關卡：豆子全部補回來，快取的區塊都失效 """
+        self.game_map = game_map
+        self.chunks.clear()
+
+    def _render_chunk(self, chunk_x, chunk_y):
+        game_map = self.game_map
+        size = self.chunk_tiles * TILE_SIZE
+        surface = _to_display_format(pygame.Surface((size, size)))
+        surface.fill(BLACK)
+        x0, y0 = chunk_x * self.chunk_tiles, chunk_y * self.chunk_tiles
+        for y in range(y0, min(y0 + self.chunk_tiles, game_map.height)):
+            row = y * game_map.width
+            for x in range(x0, min(x0 + self.chunk_tiles, game_map.width)):
+                code = game_map.tiles[row + x]
+                rect_x = (x - x0) * TILE_SIZE
+                rect_y = (y - y0) * TILE_SIZE
+                center = (rect_x + TILE_SIZE // 2, rect_y + TILE_SIZE // 2)
+                if code == CODE_WALL:
+                    pygame.draw.rect(surface, BLUE, (rect_x, rect_y, TILE_SIZE, TILE_SIZE))
+                elif code == CODE_DOOR:
+                    pygame.draw.line(surface, GREY, (rect_x, rect_y + TILE_SIZE//2), (rect_x + TILE_SIZE, rect_y + TILE_SIZE//2), 2)
+                elif code == CODE_PELLET:
+                    pygame.draw.circle(surface, WHITE, center, 2)
+                elif code == CODE_POWER_PELLET:
+                    pygame.draw.circle(surface, WHITE, center, 6)
+        return surface
+
+    def _chunk(self, key):
+        surface = self.chunks.get(key)
+        if surface is not None:
+            self.chunks.move_to_end(key)
+            return surface
+        surface = self.chunks[key] = self._render_chunk(*key)
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return surface
+
+    def erase_pellet(self, x, y):
+        """ 豆子被吃掉：區塊在快取裡就把那一格塗黑，不在的話下次畫的時候本來就沒有豆子 """
+        surface = self.chunks.get((x // self.chunk_tiles, y // self.chunk_tiles))
+        if surface is not None:
+            rect = ((x % self.chunk_tiles) * TILE_SIZE, (y % self.chunk_tiles) * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+            surface.fill(BLACK, rect)
+
+    def draw(self, surface, camera):
+        x0, y0, x1, y1 = camera.visible_tiles()
+        ox, oy = camera.offset
+        size = self.chunk_tiles * TILE_SIZE
+        for chunk_y in range(y0 // self.chunk_tiles, (y1 - 1) // self.chunk_tiles + 1):
+            for chunk_x in range(x0 // self.chunk_tiles, (x1 - 1) // self.chunk_tiles + 1):
+                surface.blit(self._chunk((chunk_x, chunk_y)), (chunk_x * size - ox, chunk_y * size - oy))
+
+
+def make_maze_renderer(game_map):
+    """ 地圖放得進視窗就整張預先畫好，否則分區塊畫 """
+    if game_map.width * TILE_SIZE <= SCREEN_WIDTH and game_map.height * TILE_SIZE <= MAP_HEIGHT:
+        return MazeRenderer(game_map)
+    return ChunkedMazeRenderer(game_map)
+
+
+class DirtyRectTracker:
+    """ 局部更新畫面：只重畫並送出有變動的區域，不必每幀 flip 整個視窗。
+
+    記錄玩家、每隻鬼、分數與日誌面板上一幀的範圍；每一幀先用迷宮圖層蓋掉舊範圍，
+    再畫出新位置，把新舊範圍一起交給 pygame.display.update(rects)。
+    """
+
+    def __init__(self):
+        self.sprite_rects = []
+        self.score_rect = None
+        self.score_key = None
+        self.panel_key = None
+
+    def sync(self, game):
+        """ 整個畫面剛完整重畫過：記下目前的狀態當作下一幀的基準 """
+        sprites = [game.player] + game.ghosts
+        self.sprite_rects = [sprite.get_rect() for sprite in sprites]
+        if game.swarm: self.sprite_rects += game.swarm.get_rects()
+        self.score_key = int(game.player.score)
+        self.score_rect = pygame.Rect(SCORE_POS, get_font(SCORE_FONT).size(score_text(game)))
+        self.panel_key = log_panel_key(game)
+
+    def update(self, surface, game, maze):
+        """ 畫出這一幀的變動，回傳需要更新的矩形列表 """
+        screen_rect = surface.get_rect()
+        dirty = []
+
+        # 被吃掉的豆子 (已從迷宮圖層擦除) 與角色的舊位置：先用迷宮圖層蓋掉，再畫新位置
+        eaten_rects = [pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE) for x, y in game.eaten_tiles]
+        for rect in eaten_rects + self.sprite_rects:
+            surface.blit(maze.layer, rect, rect)
+            dirty.append(rect)
+
+        sprites = [game.player] + game.ghosts
+        self.sprite_rects = []
+        for sprite in sprites:
+            sprite.draw(surface)
+            rect = sprite.get_rect().clip(screen_rect)
+            self.sprite_rects.append(rect)
+            dirty.append(rect)
+        if game.swarm:
+            game.swarm.draw(surface)
+            rects = [rect.clip(screen_rect) for rect in game.swarm.get_rects()]
+            self.sprite_rects += rects
+            dirty += rects
+
+        # 分數改變才重畫
+        score = int(game.player.score)
+        if score != self.score_key:
+            surface.blit(maze.layer, self.score_rect, self.score_rect)
+            new_rect = draw_score(surface, game)
+            dirty.append(self.score_rect.union(new_rect))
+            self.score_rect = new_rect
+            self.score_key = score
+
+        # 日誌或生命/關卡改變才重畫面板
+        panel_key = log_panel_key(game)
+        if panel_key != self.panel_key:
+            dirty.append(draw_logs(surface, game))
+            self.panel_key = panel_key
+
+        return [rect for rect in dirty if rect.width and rect.height]
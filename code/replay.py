@@ -0,0 +1,277 @@
+# replay.py
+""" 錄影與重播：同樣的 seed 加上同樣的輸入，Game 一定會得到同樣的結果。
+
+錄影檔只存建立遊戲的參數 (演算法、seed、關卡或關卡包路徑、選項) 與「第幾幀按了哪個方向」，
+另外每 REPLAY_CHECKPOINT_FRAMES 幀存一個狀態雜湊，最後存總幀數、分數與最終雜湊。
+重播時不開視窗、不限速，逐幀重新模擬並比對雜湊，可以用在回報錯誤
+(附上錄影檔就能重現) 以及在完全相同的工作量上做效能回歸測試。
+
+範例：
+    python code/main.py --record run.pmr
+    python code/replay.py run.pmr
+    python code/replay.py run.pmr --repeat 5      # 量測重播速度
+"""
+import sys
+import time
+import struct
+import hashlib
+import argparse
+from settings import *
+from game import Game
+from level import classic_level, generate_level
+from levelpack import load_pack
+
+MAGIC = b"PMRP"
+VERSION = 2  # 版本 2 在標頭後面加上關卡包路徑
+
+# 標頭：magic, 版本, 演算法, 選項位元, horde, seed, 地圖寬, 地圖高, 地圖 seed (-1 = 原始地圖), frame_ms, 雜湊間隔
+# 之後是關卡包路徑 (varint 長度 + UTF-8，空字串 = 不使用關卡包)
+HEADER = struct.Struct("<4sBBBIQIIqdI")
+# 結尾：總幀數, 分數, 遊戲狀態, 最終雜湊
+FOOTER = struct.Struct("<QqB8s")
+HASH_SIZE = 8
+
+ALGORITHM_CODES = [ALGO_BFS, ALGO_DFS, ALGO_ASTAR]
+STATE_CODES = [GAME_STATE_MENU, GAME_STATE_START, GAME_STATE_PLAYING, GAME_STATE_GAME_OVER, GAME_STATE_WIN]
+
+FLAG_NAV_TABLE = 1
+FLAG_NAV_GRAPH = 2
+FLAG_PLAN_CACHE = 4
+
+
+def state_hash(game):
+    """ 遊戲狀態的 8 位元組雜湊：幀數、分數、生命、關卡、地圖上的豆子、所有角色的位置 / 方向 / 模式 """
+    h = hashlib.blake2b(digest_size=HASH_SIZE)
+    player = game.player
+    h.update(repr((game.frame, player.score, game.player_lives, game.current_level, game.game_state)).encode())
+    h.update(game.game_map.tiles)
+    h.update(repr((player.pixel_x, player.pixel_y, player.direction)).encode())
+    for ghost in game.ghosts:
+        h.update(repr((ghost.pixel_x, ghost.pixel_y, ghost.direction, ghost.current_ai_mode)).encode())
+    swarm = game.swarm
+    if swarm:
+        for values in (swarm.pixel_x, swarm.pixel_y, swarm.direction, swarm.mode):
+            h.update(values.tobytes())
+    return h.digest()
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Recording:
+    """ 一場遊戲的錄影。events 是 (幀數, 方向) 列表，checkpoints 是每 checkpoint_every 幀的狀態雜湊 """
+
+    def __init__(self, algorithm, seed, level_spec=None, frame_ms=FRAME_MS, use_nav_table=True, use_nav_graph=True,
+                 use_plan_cache=True, horde=0, checkpoint_every=REPLAY_CHECKPOINT_FRAMES, pack=None):
+        self.algorithm = algorithm
+        self.seed = seed
+        self.level_spec = level_spec  # None = 原始地圖，否則為 (寬, 高, seed)
+        self.pack = pack  # 關卡包路徑 (有的話取代 level_spec)
+        self.frame_ms = frame_ms
+        self.use_nav_table = use_nav_table
+        self.use_nav_graph = use_nav_graph
+        self.use_plan_cache = use_plan_cache
+        self.horde = horde
+        self.checkpoint_every = checkpoint_every
+        self.events = []
+        self.checkpoints = []
+        self.frames = 0
+        self.score = 0
+        self.state = GAME_STATE_START
+        self.final_hash = bytes(HASH_SIZE)
+
+    @classmethod
+    def for_game(cls, game, checkpoint_every=REPLAY_CHECKPOINT_FRAMES):
+        """ 依照一場剛建立的遊戲的參數建立空白錄影 """
+        if game.planner:
+            raise ValueError("games using the async planner are not deterministic and cannot be recorded")
+        pack = None
+        spec = game.level.spec
+        if game.levels:
+            pack = getattr(game.levels, "path", None)
+            if pack is None:
+                raise ValueError("only level packs loaded from a file can be recorded")
+            spec = None
+        elif spec is not None and spec[2] is None:
+            raise ValueError("generated levels need a map seed to be recorded")
+        return cls(game.selected_algorithm, game.seed, spec, game.frame_ms, game.use_nav_table, game.use_nav_graph,
+                   game.use_plan_cache, game.horde, checkpoint_every, pack)
+
+    def make_level(self):
+        if self.level_spec is None:
+            return classic_level()
+        width, height, seed = self.level_spec
+        return generate_level(width, height, seed=seed)
+
+    def make_game(self, **kwargs):
+        """ 建立和錄影時一模一樣的遊戲 (kwargs 給 on_log、profiler 等不影響結果的參數) """
+        if self.pack:
+            kwargs["levels"] = load_pack(self.pack)
+        else:
+            kwargs["level"] = self.make_level()
+        return Game(self.algorithm, frame_ms=self.frame_ms, use_nav_table=self.use_nav_table,
+                    use_nav_graph=self.use_nav_graph, use_plan_cache=self.use_plan_cache, horde=self.horde,
+                    seed=self.seed, **kwargs)
+
+    def to_bytes(self):
+        flags = ((FLAG_NAV_TABLE if self.use_nav_table else 0) | (FLAG_NAV_GRAPH if self.use_nav_graph else 0)
+                 | (FLAG_PLAN_CACHE if self.use_plan_cache else 0))
+        width, height, map_seed = self.level_spec or (0, 0, -1)
+        out = bytearray(HEADER.pack(MAGIC, VERSION, ALGORITHM_CODES.index(self.algorithm), flags, self.horde,
+                                    self.seed, width, height, map_seed, self.frame_ms, self.checkpoint_every))
+        pack = (self.pack or "").encode("utf-8")
+        write_varint(out, len(pack))
+        out += pack
+        # 輸入：與上一筆的幀數差 (varint) + 方向編號
+        write_varint(out, len(self.events))
+        last = 0
+        for frame, direction in self.events:
+            write_varint(out, frame - last)
+            out.append(DIRECTIONS.index(direction))
+            last = frame
+        write_varint(out, len(self.checkpoints))
+        for digest in self.checkpoints:
+            out += digest
+        out += FOOTER.pack(self.frames, self.score, STATE_CODES.index(self.state), self.final_hash)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, algorithm, flags, horde, seed, width, height, map_seed, frame_ms, checkpoint_every = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version not in (1, VERSION):
+            raise ValueError(f"unsupported replay version {version}")
+        pos = HEADER.size
+        pack = None
+        if version >= 2:
+            length, pos = read_varint(data, pos)
+            pack = bytes(data[pos:pos + length]).decode("utf-8") or None
+            pos += length
+        recording = cls(ALGORITHM_CODES[algorithm], seed, None if map_seed < 0 else (width, height, map_seed),
+                        frame_ms, bool(flags & FLAG_NAV_TABLE), bool(flags & FLAG_NAV_GRAPH),
+                        bool(flags & FLAG_PLAN_CACHE), horde, checkpoint_every, pack)
+        count, pos = read_varint(data, pos)
+        frame = 0
+        for _ in range(count):
+            delta, pos = read_varint(data, pos)
+            frame += delta
+            recording.events.append((frame, DIRECTIONS[data[pos]]))
+            pos += 1
+        count, pos = read_varint(data, pos)
+        for _ in range(count):
+            recording.checkpoints.append(bytes(data[pos:pos + HASH_SIZE]))
+            pos += HASH_SIZE
+        recording.frames, recording.score, state, recording.final_hash = FOOTER.unpack_from(data, pos)
+        recording.state = STATE_CODES[state]
+        return recording
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return Recording.from_bytes(f.read())
+
+
+class Recorder:
+    """ 包住一場新遊戲：用 recorder.step(inputs) 取代 game.step(inputs)，結束時 finish() 取得錄影 """
+
+    def __init__(self, game, checkpoint_every=REPLAY_CHECKPOINT_FRAMES):
+        if game.frame != 0:
+            raise ValueError("recording must start from a new game")
+        self.game = game
+        self.recording = Recording.for_game(game, checkpoint_every)
+
+    def step(self, inputs=None):
+        game = self.game
+        recording = self.recording
+        if inputs:
+            recording.events.append((game.frame + 1, inputs))
+        state = game.step(inputs)
+        if game.frame % recording.checkpoint_every == 0:
+            recording.checkpoints.append(state_hash(game))
+        return state
+
+    def finish(self):
+        """ 填入總幀數、分數與最終雜湊，回傳錄影 """
+        game = self.game
+        recording = self.recording
+        recording.frames = game.frame
+        recording.score = game.player.score
+        recording.state = game.game_state
+        recording.final_hash = state_hash(game)
+        return recording
+
+
+def replay(recording, **game_kwargs):
+    """ 不限速重新模擬整段錄影。回傳 (第一個不一致的幀數或 None, 遊戲) """
+    game = recording.make_game(**game_kwargs)
+    events = iter(recording.events)
+    next_event = next(events, None)
+    checkpoints = iter(recording.checkpoints)
+    for frame in range(1, recording.frames + 1):
+        inputs = None
+        if next_event and next_event[0] == frame:
+            inputs = next_event[1]
+            next_event = next(events, None)
+        game.step(inputs)
+        if frame % recording.checkpoint_every == 0 and state_hash(game) != next(checkpoints, None):
+            return frame, game
+    if state_hash(game) != recording.final_hash:
+        return recording.frames, game
+    return None, game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate a recorded game headless and verify it matches.")
+    parser.add_argument("path", help="replay file written by main.py --record")
+    parser.add_argument("--repeat", type=int, default=1, help="replay this many times and report the best speed")
+    args = parser.parse_args(argv)
+
+    recording = load(args.path)
+    if recording.pack:
+        level = f"pack {recording.pack}"
+    elif recording.level_spec:
+        level = "{}x{} seed {}".format(*recording.level_spec)
+    else:
+        level = "classic"
+    print(f"{args.path}: {recording.algorithm}, seed {recording.seed}, map {level}, horde {recording.horde}, "
+          f"{recording.frames} frames, {len(recording.events)} inputs")
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        mismatch, game = replay(recording)
+        elapsed = time.perf_counter() - start
+        if mismatch is not None:
+            print(f"MISMATCH: state differs from the recording at frame {mismatch} "
+                  f"(score {game.player.score}, recorded final score {recording.score})")
+            return 1
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"OK: score {game.player.score}, state {game.game_state}, "
+          f"{recording.frames / best:,.0f} frames/s ({best:.3f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
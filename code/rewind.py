@@ -0,0 +1,144 @@
+# rewind.py
+""" 倒帶：保留最近 REWIND_SECONDS 秒的遊戲歷史，可以一幀一幀往回看 (除錯鬼魂 AI 用)。
+
+每 REWIND_KEYFRAME_FRAMES 幀存一個關鍵幀 (Game.snapshot，含亂數狀態與鬼魂的路徑計畫)，
+中間每幀只存一小段位元組：這一幀的輸入、被吃掉的豆子座標、玩家與四隻鬼的位置和模式。
+倒帶到第 f 幀時載入 f 之前最近的關鍵幀，再用記下的輸入重新模擬到第 f 幀 (遊戲是確定性的)，
+每一幀都和記下的位置比對，所以倒帶後的狀態和當時完全相同，可以從那裡繼續玩或單步執行 Ghost.update。
+倒帶後繼續推進時，後面的歷史會被丟掉。
+
+範例：
+    history = RewindBuffer(game)
+    history.step(inputs)          # 取代 game.step(inputs)
+    history.seek(game.frame - 1)  # 退回上一幀
+"""
+import struct
+from collections import deque
+from settings import *
+from profiler import NULL_PROFILER
+
+# 每幀的差異：輸入 (0 = 沒有，其餘為 DIRECTIONS 的索引 + 1)、被吃掉的豆子數，接著是豆子座標與角色
+DELTA_HEADER = struct.Struct("<BH")
+EATEN_TILE = struct.Struct("<HH")
+ACTOR = struct.Struct("<ffB")  # 像素座標與模式代碼 (玩家固定為 0)
+
+
+class RewindBuffer:
+    """ 一場遊戲最近幾秒的歷史。用 step() 取代 game.step()，seek() 回到歷史裡的任一幀 """
+
+    def __init__(self, game, seconds=REWIND_SECONDS, keyframe_every=REWIND_KEYFRAME_FRAMES):
+        self.game = game
+        self.capacity = max(1, int(seconds * 1000 / game.frame_ms))  # 至少能倒回幾幀
+        self.keyframe_every = keyframe_every
+        self.keyframes = deque()  # (幀數, 快照)，第一個關鍵幀就是最早能倒回的幀
+        self.deltas = deque()     # deltas[i] 是第 keyframes[0] 幀之後第 i + 1 幀的差異
+        self.mode_codes = {}      # 鬼魂模式 -> 代碼 (第一次出現時編號)
+        self.modes = []
+        self.keyframes.append((game.frame, game.snapshot()))
+
+    @property
+    def oldest(self):
+        return self.keyframes[0][0]
+
+    @property
+    def newest(self):
+        return self.oldest + len(self.deltas)
+
+    def __len__(self):
+        return len(self.deltas) + 1
+
+    def step(self, inputs=None):
+        """ 推進一幀並記錄，回傳遊戲狀態 """
+        game = self.game
+        if game.frame != self.newest:
+            self.truncate(game.frame)
+        state = game.step(inputs)
+        self.deltas.append(self.encode(inputs))
+        if game.frame - self.keyframes[-1][0] >= self.keyframe_every:
+            self.keyframes.append((game.frame, game.snapshot()))
+            # 丟掉太舊的歷史：第二個關鍵幀以後的部分已經夠倒回 capacity 幀時，第一段就不需要了
+            keyframes = self.keyframes
+            while len(keyframes) > 1 and self.newest - keyframes[1][0] >= self.capacity:
+                old = keyframes.popleft()[0]
+                for _ in range(keyframes[0][0] - old):
+                    self.deltas.popleft()
+        return state
+
+    def truncate(self, frame):
+        """ 丟掉第 frame 幀之後的歷史 (倒帶後從 frame 繼續玩) """
+        if not self.oldest <= frame <= self.newest:
+            # 不在歷史裡 (例如在外面直接呼叫了 game.step)：從目前的狀態重新開始記錄
+            self.keyframes.clear()
+            self.deltas.clear()
+            self.keyframes.append((frame, self.game.snapshot()))
+            return
+        while self.keyframes[-1][0] > frame:
+            self.keyframes.pop()
+        for _ in range(self.newest - frame):
+            self.deltas.pop()
+
+    def encode(self, inputs):
+        game = self.game
+        out = bytearray(DELTA_HEADER.pack(DIRECTIONS.index(inputs) + 1 if inputs else 0, len(game.eaten_tiles)))
+        for x, y in game.eaten_tiles:
+            out += EATEN_TILE.pack(x, y)
+        out += self.encode_actors()
+        return bytes(out)
+
+    def encode_actors(self):
+        game = self.game
+        player = game.player
+        out = bytearray(ACTOR.pack(player.pixel_x, player.pixel_y, 0))
+        for ghost in game.ghosts:
+            code = self.mode_codes.get(ghost.current_ai_mode)
+            if code is None:
+                code = self.mode_codes[ghost.current_ai_mode] = len(self.modes)
+                self.modes.append(ghost.current_ai_mode)
+            out += ACTOR.pack(ghost.pixel_x, ghost.pixel_y, code)
+        return bytes(out)
+
+    def frame_state(self, frame):
+        """ 不用倒帶就能查的某一幀資料：(輸入, 被吃掉的豆子座標, [(x, y, 模式), ...])，玩家在最前面 (模式為 None) """
+        if not self.oldest < frame <= self.newest:
+            raise ValueError(f"frame {frame} is not in the rewind history ({self.oldest + 1}..{self.newest})")
+        delta = self.deltas[frame - self.oldest - 1]
+        direction, eaten = DELTA_HEADER.unpack_from(delta)
+        pos = DELTA_HEADER.size
+        tiles = [EATEN_TILE.unpack_from(delta, pos + i * EATEN_TILE.size) for i in range(eaten)]
+        pos += eaten * EATEN_TILE.size
+        actors = [(x, y, self.modes[code] if i else None)
+                  for i, (x, y, code) in enumerate(ACTOR.iter_unpack(delta[pos:]))]
+        return (DIRECTIONS[direction - 1] if direction else None), tiles, actors
+
+    def seek(self, frame):
+        """ 回到第 frame 幀 (oldest..newest)。之後的歷史先保留，直到從這裡繼續 step() 為止 """
+        if not self.oldest <= frame <= self.newest:
+            raise ValueError(f"frame {frame} is not in the rewind history ({self.oldest}..{self.newest})")
+        game = self.game
+        for key_frame, snap in reversed(self.keyframes):
+            if key_frame <= frame:
+                break
+        game.restore(snap)
+        if frame == key_frame:
+            return
+
+        # 重新模擬時不輸出日誌、不計入效能分析 (畫面上的日誌保持倒帶前的樣子)
+        muted, profiler = game.logger.muted, game.profiler
+        game.logger.muted, game.profiler = True, NULL_PROFILER
+        try:
+            deltas = self.deltas
+            base = self.oldest + 1
+            for f in range(key_frame + 1, frame + 1):
+                delta = deltas[f - base]
+                direction = delta[0]
+                game.step(DIRECTIONS[direction - 1] if direction else None)
+                if not delta.endswith(self.encode_actors()):
+                    raise RuntimeError(f"rewind went out of sync at frame {f}")
+        finally:
+            game.logger.muted, game.profiler = muted, profiler
+
+    def back(self, frames=1):
+        """ 往回 frames 幀 (最多到歷史的開頭)，回傳實際到達的幀數 """
+        frame = max(self.game.frame - frames, self.oldest)
+        self.seek(frame)
+        return frame
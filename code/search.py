@@ -0,0 +1,67 @@
+# search.py
+""" 可分段執行的搜尋。
+
+搜尋寫成 generator：每展開一個節點之前 yield 一次。呼叫端用 next() 繼續，
+或送 True 進去 (send) 要求停下來，generator 就 return 目前最好的部分路徑
+(通往已發現節點中離終點最近的那一個)；搜完則 return 完整路徑 (找不到為 None)。
+
+同步搜尋用 run_search() 一次跑完；每幀時間預算的排程器 (planner.FrameScheduler)
+用 SearchTask 把同一個搜尋分散到好幾幀，時間到了就取部分路徑。
+"""
+
+
+def run_search(steps):
+    """ 把搜尋一次跑完，回傳結果 """
+    try:
+        while True:
+            next(steps)
+    except StopIteration as stop:
+        return stop.value
+
+
+class SearchTask:
+    """ 分段執行的搜尋請求，介面同 Future (done / result / cancel)，但 result() 不會等：
+    還沒搜完時停止搜尋並回傳部分路徑。
+    """
+    __slots__ = ("steps", "started", "finished", "path")
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.started = False
+        self.finished = False
+        self.path = None
+
+    def advance(self, nodes):
+        """ 最多再展開 nodes 個節點，回傳是否已經搜完 """
+        if self.finished:
+            return True
+        steps = self.steps
+        self.started = True
+        try:
+            for _ in range(nodes):
+                next(steps)
+        except StopIteration as stop:
+            self.finished = True
+            self.path = stop.value
+        return self.finished
+
+    def done(self):
+        return self.finished
+
+    def result(self):
+        if not self.finished:
+            self.finished = True
+            if self.started:
+                try:
+                    self.steps.send(True)
+                except StopIteration as stop:
+                    self.path = stop.value
+            self.steps.close()
+        return self.path
+
+    def cancel(self):
+        if not self.finished:
+            self.finished = True
+            self.steps.close()
+        self.path = None
+        return True
@@ -1,5 +1,5 @@
 # settings.py
-import pygame
+# 這裡只放常數與地圖資料，不匯入 pygame：無視窗的工具 (模擬、重播、效能測試) 匯入它幾乎不花時間
 
 # * 遊戲架構有關常數
 # 遊戲視窗
@@ -21,21 +21,90 @@ ORANGE = (255, 184, 82)
 GREY = (150, 150, 150)
 FRIGHTENED_BLUE = (0, 0, 139)
 
-# 字型設定
-pygame.font.init()
-SCORE_FONT = pygame.font.Font(None, 24)
-GAME_OVER_FONT = pygame.font.Font(None, 64)
-WIN_FONT = pygame.font.Font(None, 64)
-LOG_FONT = pygame.font.Font(None, 20)
+# 字型設定 (字級；字型物件在第一次畫字時才由 render.get_font 載入)
+SCORE_FONT = 24
+GAME_OVER_FONT = 64
+WIN_FONT = 64
+LOG_FONT = 20
+TEXT_CACHE_SIZE = 128  # 已 render 文字 Surface 的快取上限
 
 # * 運作常數
 
 # 時間與速度常數
+FPS = 60
+FRAME_MS = 1000 / FPS  # 每個邏輯幀的模擬時間 (毫秒)
+# 固定步長：畫面更新率 (main.py --fps) 和遊戲速度無關，時間倍率可以快轉 / 慢動作
+TIME_SCALES = [0.25, 0.5, 1, 2, 4, 8]
+MAX_STEPS_PER_FRAME = 24  # 畫一次畫面最多追幾個邏輯幀，卡太久時丟掉落後的時間 (避免越追越慢)
 SPEED = 2
 FRIGHTENED_DURATION = 7000
 SCATTER_DURATION = 7000
 CHASE_DURATION = 20000
 
+# 鬼魂路徑計畫快取：連續修補幾次後強制重新搜尋
+MAX_PLAN_REPAIRS = 8
+
+# 大型地圖：全點對導航表只在可走格子不多的地圖上建；太大的地圖每次搜尋最多展開幾個路口
+NAV_TABLE_MAX_TILES = 2000
+SEARCH_NODE_BUDGET = 1500
+
+# 大型地圖的繪圖：迷宮切成 CHUNK_TILES x CHUNK_TILES 的區塊，最多快取幾個區塊的 Surface
+CHUNK_TILES = 16
+CHUNK_CACHE_SIZE = 64
+
+# 日誌面板顯示行數
+MAX_LOGS = 7
+# 日誌 (logger.py)：嚴重程度、類別與預設記錄的最低嚴重程度
+LOG_DEBUG = 10
+LOG_INFO = 20
+LOG_WARNING = 30
+LOG_ERROR = 40
+LOG_CAT_MODE = "mode"      # 散開 / 追逐 / 驚嚇模式切換
+LOG_CAT_GHOST = "ghost"    # 鬼魂被吃、重生、繞行結束
+LOG_CAT_LEVEL = "level"    # 關卡開始、過關、扣命、遊戲結束
+LOG_CAT_SYSTEM = "system"  # 錄影、時間倍率、選單
+LOG_CATEGORIES = [LOG_CAT_MODE, LOG_CAT_GHOST, LOG_CAT_LEVEL, LOG_CAT_SYSTEM]
+LOG_MIN_LEVEL = LOG_INFO
+# 背景寫出：每隔幾毫秒批次寫一次，佇列最多累積幾筆 (寫出跟不上時丟掉新的記錄)
+LOG_FLUSH_MS = 200
+LOG_MAX_PENDING = 100000
+
+# 效能分析：每個區段保留最近幾幀的耗時、面板上的數字每隔幾幀更新一次
+PROFILE_WINDOW = 300
+PROFILE_REFRESH_FRAMES = 30
+
+# 剩餘豆子索引 (pellets.py)：每個區域的大小 (格)，非空區域少於多少個時找最近的豆子改成逐一比較
+PELLET_REGION_TILES = 8
+NEAREST_SCAN_REGIONS = 256
+
+# 非同步路徑規劃 (planner.py) 的 process 模式：工作行程數與降低的排程優先權
+PLANNER_WORKERS = 2
+PLANNER_NICE = 10
+# budget 模式：每幀最多花幾毫秒推進鬼魂的搜尋，每次輪到一隻鬼時展開幾個節點再檢查時間
+AI_FRAME_BUDGET_MS = 2.0
+AI_SLICE_NODES = 32
+
+# 錄影：每隔幾幀存一次狀態雜湊 (重播時用來找出第一個不一致的幀)
+REPLAY_CHECKPOINT_FRAMES = 600
+
+# 自動駕駛 (autopilot.py)：每個方向模擬幾次、每次往前模擬幾幀、模擬時走向最近豆子 (否則隨機) 的機率，
+# 被抓與過關的獎懲 (分數)
+AUTOPILOT_ROLLOUTS = 3
+AUTOPILOT_DEPTH = 80
+AUTOPILOT_GREEDY = 0.75
+AUTOPILOT_DEATH_PENALTY = 1000
+AUTOPILOT_CLEAR_BONUS = 1000
+# 展示模式：選單閒置多久 (毫秒) 後由自動駕駛開始一場展示遊戲，展示時的時間倍率
+ATTRACT_IDLE_MS = 15000
+ATTRACT_TIME_SCALE = 1
+
+# 倒帶 (rewind.py)：保留最近幾秒的歷史、每隔幾幀存一個完整的關鍵幀 (其餘幀只存差異)
+REWIND_SECONDS = 30
+REWIND_KEYFRAME_FRAMES = 60
+
+# 啟動時間預算 (毫秒，不含 Python 直譯器本身)：只匯入常數、無視窗建立遊戲並跑一幀、開視窗畫出選單
+STARTUP_BUDGET_MS = {"constants": 20, "headless": 150, "windowed": 1000}
+
 # --- 新增：生命值常數 ---
 MAX_LIVES = 3
 
@@ -76,6 +145,9 @@ TILE_PELLET = "."
 TILE_POWER_PELLET = "O"
 TILE_EMPTY = " "
 
+# 移動方向 (上、下、左、右)，導航表以索引 0~3 記錄方向
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
 EVENT_ATE_PELLET = "ATE_PELLET"
 EVENT_ATE_POWER_PELLET = "ATE_POWER_PELLET"
 
@@ -114,10 +186,3 @@ MAP_STRINGS = [
     "WWWWWWWWWWWWWWWWWWWWWWWWWWWW",
     " ", " ", " ", " ", " "
 ]
-
-GAME_MAP = [list(row) for row in MAP_STRINGS]
-
-def is_wall(game_map, x, y):
-    if 0 <= y < len(game_map) and 0 <= x < len(game_map[0]):
-        return game_map[y][x] == TILE_WALL
-    return False
\ No newline at end of file
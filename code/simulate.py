@@ -0,0 +1,189 @@
+# simulate.py
+""" 批次模擬：用多個行程同時跑大量無視窗的遊戲，比較各種鬼魂演算法。
+
+範例：
+    python code/simulate.py --games 200 --workers 8
+    python code/simulate.py --algorithms BFS A_STAR --max-seconds 120 --json results.json
+    python code/simulate.py --policy autopilot --games 20      # 玩家改用自動駕駛 (長時間的穩定性測試)
+    python code/simulate.py --games 20 --log-dir logs --log-level debug  # 每場的日誌寫成 logs/<演算法>-<seed>.jsonl
+"""
+import os
+import json
+import time
+import random
+import argparse
+import statistics
+from multiprocessing import Pool
+from settings import *
+from game import Game
+from levelpack import load_pack
+from grid import ACTOR_PLAYER, DIR_BITS
+from autopilot import Autopilot
+from logger import Logger, LEVEL_NAMES, json_lines_sink, parse_level
+
+ALL_ALGORITHMS = [ALGO_BFS, ALGO_DFS, ALGO_ASTAR]
+POLICIES = ["random", "autopilot"]
+
+
+class RandomWalkPolicy:
+    """ 簡單的玩家機器人：每走到新的格子就隨機選一個能走的方向 (盡量不回頭) """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.last_tile = None
+
+    def __call__(self, game):
+        player = game.player
+        tile = (player.grid_x, player.grid_y)
+        if tile == self.last_tile and player.direction != (0, 0):
+            return None
+        self.last_tile = tile
+
+        exits = game.game_map.exits_at(ACTOR_PLAYER, int(player.grid_x), int(player.grid_y))
+        options = [d for d in DIRECTIONS if exits & DIR_BITS[d]]
+        if not options:
+            return None
+
+        reverse = (-player.direction[0], -player.direction[1])
+        forward = [d for d in options if d != reverse]
+        return self.rng.choice(forward or options)
+
+
+def run_game(job):
+    """ 在工作行程裡跑完一場遊戲，回傳單場統計 """
+    (algorithm, seed, max_seconds, use_nav_table, use_nav_graph, use_plan_cache, horde, levels, policy_name,
+     log_dir, log_level) = job
+    # 日誌檔由背景執行緒寫出，模擬不會等磁碟
+    sink = json_lines_sink(os.path.join(log_dir, f"{algorithm}-{seed}.jsonl")) if log_dir else None
+    logger = Logger(min_level=log_level, sinks=[sink] if sink else ())
+    # 關卡包在每個工作行程裡只載入一次 (mmap，各行程共用同一份分頁)
+    game = Game(algorithm, use_nav_table=use_nav_table, use_nav_graph=use_nav_graph, use_plan_cache=use_plan_cache,
+                horde=horde, seed=seed, levels=load_pack(levels) if levels else None, logger=logger)
+    if policy_name == "autopilot":
+        policy = Autopilot(game, seed=seed)
+    else:
+        policy = RandomWalkPolicy(random.Random(seed))
+
+    max_frames = int(max_seconds * 1000 / game.frame_ms)
+    play_ms = 0.0
+    for _ in range(max_frames):
+        if game.game_state == GAME_STATE_GAME_OVER:
+            break
+        game.step(policy(game))
+        if game.game_state == GAME_STATE_PLAYING:
+            play_ms += game.frame_ms
+    if sink:
+        sink.close()
+
+    stats = game.ai_stats()
+    survival_s = game.time_ms / 1000
+    return {
+        "algorithm": algorithm,
+        "seed": seed,
+        "score": game.player.score,
+        "level": game.current_level,
+        "game_over": game.game_state == GAME_STATE_GAME_OVER,
+        "survival_s": survival_s,
+        "catches": game.catches,
+        "catches_per_min": game.catches / (play_ms / 60000) if play_ms else 0.0,
+        "ai_decisions": stats["ai_decisions"],
+        "ai_time_s": stats["ai_time"],
+        "full_searches": stats["full_searches"],
+        "full_searches_per_s": game.full_searches_per_second(),
+    }
+
+
+def describe(values):
+    """ 數值分佈摘要 """
+    ordered = sorted(values)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+    return {
+        "mean": statistics.fmean(ordered),
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "min": ordered[0],
+        "p50": statistics.median(ordered),
+        "p90": pct(90),
+        "max": ordered[-1],
+    }
+
+
+def aggregate(results):
+    """ 依演算法彙整各場結果 """
+    summary = {}
+    for algorithm in ALL_ALGORITHMS:
+        rows = [r for r in results if r["algorithm"] == algorithm]
+        if not rows:
+            continue
+        decisions = sum(r["ai_decisions"] for r in rows)
+        ai_time = sum(r["ai_time_s"] for r in rows)
+        summary[algorithm] = {
+            "games": len(rows),
+            "game_over_rate": sum(r["game_over"] for r in rows) / len(rows),
+            "survival_s": describe([r["survival_s"] for r in rows]),
+            "catches_per_min": describe([r["catches_per_min"] for r in rows]),
+            "score": describe([r["score"] for r in rows]),
+            "ai_decisions": decisions,
+            "ai_us_per_decision": ai_time / decisions * 1e6 if decisions else 0.0,
+            "full_searches_per_s": describe([r["full_searches_per_s"] for r in rows]),
+        }
+    return summary
+
+
+def print_summary(summary, wall_time):
+    header = f"{'ALGO':<8}{'games':>7}{'survival s (mean/p50)':>24}{'catches/min':>13}{'score (mean±sd)':>20}{'AI us/dec':>11}{'searches/s':>12}"
+    print(header)
+    print("-" * len(header))
+    for algorithm, s in summary.items():
+        survival = f"{s['survival_s']['mean']:.1f}/{s['survival_s']['p50']:.1f}"
+        score = f"{s['score']['mean']:.0f}±{s['score']['stdev']:.0f}"
+        print(f"{algorithm:<8}{s['games']:>7}{survival:>24}{s['catches_per_min']['mean']:>13.2f}"
+              f"{score:>20}{s['ai_us_per_decision']:>11.1f}{s['full_searches_per_s']['mean']:>12.1f}")
+    print(f"\nwall time: {wall_time:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless Pac-Man games in parallel and compare ghost algorithms.")
+    parser.add_argument("--games", type=int, default=100, help="games per algorithm (one seed each)")
+    parser.add_argument("--seed", type=int, default=0, help="first seed; games use seed, seed+1, ...")
+    parser.add_argument("--algorithms", nargs="+", choices=ALL_ALGORITHMS, default=ALL_ALGORITHMS)
+    parser.add_argument("--max-seconds", type=float, default=300, help="simulated time limit per game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="process pool size")
+    parser.add_argument("--no-nav-table", action="store_true", help="run the searches instead of the navigation table lookup")
+    parser.add_argument("--no-nav-graph", action="store_true", help="search tile by tile instead of on the junction graph")
+    parser.add_argument("--no-plan-cache", action="store_true", help="run a full search at every tile center")
+    parser.add_argument("--horde", type=int, default=0, help="extra vectorized swarm ghosts per game")
+    parser.add_argument("--levels", metavar="PACK", help="play through this level pack instead of the classic map")
+    parser.add_argument("--policy", choices=POLICIES, default="random",
+                        help="how the player moves: random walk, or the autopilot (much slower, plays well)")
+    parser.add_argument("--log-dir", help="write each game's log to DIR/<algorithm>-<seed>.jsonl")
+    parser.add_argument("--log-level", choices=[name.lower() for name in LEVEL_NAMES.values()],
+                        default=LEVEL_NAMES[LOG_MIN_LEVEL].lower(), help="lowest severity written with --log-dir")
+    parser.add_argument("--json", help="write per-game results and the summary to this file")
+    args = parser.parse_args(argv)
+    if args.levels:
+        load_pack(args.levels)  # 先在主行程編譯好 (文字檔)，工作行程只需要 mmap
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    # 每個演算法用同一組 seed，方便成對比較
+    jobs = [(algorithm, args.seed + i, args.max_seconds, not args.no_nav_table, not args.no_nav_graph,
+             not args.no_plan_cache, args.horde, args.levels, args.policy, args.log_dir, parse_level(args.log_level))
+            for algorithm in args.algorithms for i in range(args.games)]
+
+    workers = max(1, args.workers or 1)
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        results = list(pool.imap_unordered(run_game, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    wall_time = time.perf_counter() - start
+
+    summary = aggregate(results)
+    print_summary(summary, wall_time)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "games": sorted(results, key=lambda r: (r["algorithm"], r["seed"]))}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
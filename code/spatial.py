@@ -0,0 +1,82 @@
+# spatial.py
+""" 角色的空間索引：以格子為單位記錄每一格上有哪些角色。
+
+碰撞與鬼魂互相阻擋只需要查附近幾格，不必和每一隻鬼比較。
+"""
+import math
+from settings import *
+
+EMPTY = ()
+
+# 一幀內移動超過這個距離視為瞬間移動 (隧道、重生)，不做掃掠檢查
+MAX_SWEEP = TILE_SIZE
+
+
+class TileIndex:
+    """ 格子 (x, y) -> 該格上的角色列表 """
+
+    def __init__(self):
+        self.cells = {}
+
+    def rebuild(self, actors, tile_of):
+        """ 依 tile_of(角色) 重新放入所有角色 (每格內保持 actors 的順序) """
+        self.cells.clear()
+        for actor in actors:
+            self.add(actor, tile_of(actor))
+
+    def add(self, actor, tile):
+        cell = self.cells.get(tile)
+        if cell is None:
+            self.cells[tile] = [actor]
+        else:
+            cell.append(actor)
+
+    def move(self, actor, old_tile, new_tile):
+        if old_tile == new_tile:
+            return
+        cell = self.cells.get(old_tile)
+        if cell and actor in cell:
+            cell.remove(actor)
+        self.add(actor, new_tile)
+
+    def at(self, tile):
+        return self.cells.get(tile, EMPTY)
+
+    def around(self, tile):
+        """ tile 與周圍 8 格上的所有角色 """
+        x, y = tile
+        found = []
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                cell = self.cells.get((x + dx, y + dy))
+                if cell:
+                    found.extend(cell)
+        return found
+
+
+def grid_tile(actor):
+    """ 角色最後一次停在格子中心時的格子 (鬼魂阻擋用) """
+    return (actor.grid_x, actor.grid_y)
+
+
+def pixel_tile(actor):
+    """ 角色目前像素位置所在的格子 (碰撞用) """
+    return (int(actor.pixel_x // TILE_SIZE), int(actor.pixel_y // TILE_SIZE))
+
+
+def swept_distance(a_from, a_to, b_from, b_to):
+    """ 兩個角色在這一幀內 (都當作等速直線移動) 的最近距離。
+
+    移動快的角色 (例如被吃掉、速度 2*SPEED 的鬼) 在兩幀之間也不會穿過對方。
+    任何一方瞬間移動時只比較目前位置。
+    """
+    if (abs(a_to[0] - a_from[0]) + abs(a_to[1] - a_from[1]) > MAX_SWEEP
+            or abs(b_to[0] - b_from[0]) + abs(b_to[1] - b_from[1]) > MAX_SWEEP):
+        return math.hypot(a_to[0] - b_to[0], a_to[1] - b_to[1])
+    rx = a_from[0] - b_from[0]
+    ry = a_from[1] - b_from[1]
+    vx = (a_to[0] - a_from[0]) - (b_to[0] - b_from[0])
+    vy = (a_to[1] - a_from[1]) - (b_to[1] - b_from[1])
+    speed2 = vx * vx + vy * vy
+    t = 0.0 if speed2 == 0 else min(1.0, max(0.0, -(rx * vx + ry * vy) / speed2))
+    return math.hypot(rx + t * vx, ry + t * vy)
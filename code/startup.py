@@ -0,0 +1,67 @@
+# startup.py
+""" 量測啟動時間並和 settings.STARTUP_BUDGET_MS 比較。
+
+每個階段都在新的行程裡從頭匯入，量的是匯入模組到完成第一件事的時間 (不含 Python 直譯器本身)：
+    constants  只匯入 settings (不能載入 pygame)
+    headless   建立無視窗的 Game 並推進一幀 (不能載入 pygame)
+    windowed   匯入 main、開視窗並畫出選單
+
+範例：
+    python code/startup.py
+    python code/startup.py --runs 10 --stages constants headless
+    SDL_VIDEODRIVER=dummy python code/startup.py           # 沒有顯示器的機器
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from settings import STARTUP_BUDGET_MS
+
+STAGES = {
+    "constants": "import settings",
+    "headless": "from game import Game\nGame(seed=0).step((-1, 0))",
+    "windowed": "import pygame, main\nscreen = main.open_window()\nmain.draw_menu(screen)\npygame.display.flip()",
+}
+# 這些階段結束時 pygame 不應該被載入
+PYGAME_FREE = {"constants", "headless"}
+
+TEMPLATE = """import sys, time, json
+start = time.perf_counter()
+{code}
+print(json.dumps([(time.perf_counter() - start) * 1000, "pygame" in sys.modules]))
+"""
+
+
+def measure(stage):
+    """ 在新的行程裡跑一次，回傳 (毫秒, 是否載入了 pygame) """
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", TEMPLATE.format(code=STAGES[stage])], cwd=here,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure startup time against the budget in settings.py.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per stage (the median is reported)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'stage':<12}{'median ms':>11}{'max ms':>9}{'budget':>9}")
+    for stage in args.stages:
+        samples = [measure(stage) for _ in range(args.runs)]
+        times = [ms for ms, _ in samples]
+        median = statistics.median(times)
+        budget = STARTUP_BUDGET_MS[stage]
+        status = "ok" if median <= budget else "OVER BUDGET"
+        if stage in PYGAME_FREE and any(loaded for _, loaded in samples):
+            status = "IMPORTED PYGAME"
+        failed |= status != "ok"
+        print(f"{stage:<12}{median:>11.1f}{max(times):>9.1f}{budget:>9}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# swarm.py
+""" 大量鬼魂 (horde / 壓力測試) 的向量化更新。
+
+位置、方向、模式、速度都存在 NumPy 陣列裡，每一幀用一次向量化運算
+算出所有鬼魂的目標點 (Blinky / Pinky / Inky / Clyde 規則) 與貪婪方向，
+並用格子佔用計數取代兩兩比對，讓阻擋檢查是 O(n) 而不是 O(n²)。
+經典的四隻鬼仍然使用 ghost.Ghost 逐一更新。
+"""
+from collections import deque
+import numpy as np
+from settings import *
+from grid import *
+from spatial import MAX_SWEEP
+
+# 模式代碼
+SWARM_SCATTER = 0
+SWARM_CHASE = 1
+SWARM_FRIGHTENED = 2
+SWARM_GO_HOME = 3
+SWARM_EXIT_HOUSE = 4
+
+# 個性代碼 (與顏色、散開角落對應)
+PERSONALITY_BLINKY = 0
+PERSONALITY_PINKY = 1
+PERSONALITY_INKY = 2
+PERSONALITY_CLYDE = 3
+PERSONALITY_COLORS = [RED, PINK, CYAN, ORANGE]
+
+# 方向順序與 Ghost.all_directions 相同 (同分時取較前面的方向)
+_DIR_X = np.array([d[0] for d in DIRECTIONS], dtype=np.int32)
+_DIR_Y = np.array([d[1] for d in DIRECTIONS], dtype=np.int32)
+_DIR_BITS = np.array([DIR_BITS[d] for d in DIRECTIONS], dtype=np.uint8)
+_REVERSE = np.array([DIRECTIONS.index((-d[0], -d[1])) for d in DIRECTIONS], dtype=np.int8)
+
+HALF_TILE = TILE_SIZE // 2
+
+# 每一幀會改變的陣列 (其餘陣列建立後就不變)
+_STATE_ARRAYS = ("grid_x", "grid_y", "pixel_x", "pixel_y", "prev_x", "prev_y", "direction", "mode", "speed")
+
+
+class Swarm:
+    """ 以陣列儲存的一群鬼魂 """
+
+    def __init__(self, grid, count, scatter_points, home_tile, exit_y, spawn_away_from, rng=None):
+        self.grid = grid
+        self.count = count
+        self.width = grid.width
+        self.home_tile = home_tile
+        self.exit_y = exit_y
+        self.radius = TILE_SIZE // 2 - 2
+        rng = rng if rng is not None else np.random.default_rng()
+
+        # 出口遮罩轉成 NumPy 陣列 (不複製，直接看 bytearray)
+        self.exits = [np.frombuffer(mask, dtype=np.uint8) for mask in grid.exits]
+
+        spawn = self._spawn_tiles(spawn_away_from)
+        picks = rng.choice(len(spawn), size=count, replace=len(spawn) < count)
+        tiles = spawn[picks]
+        self.grid_x = (tiles % self.width).astype(np.int32)
+        self.grid_y = (tiles // self.width).astype(np.int32)
+        self.pixel_x = (self.grid_x * TILE_SIZE + HALF_TILE).astype(np.float64)
+        self.pixel_y = (self.grid_y * TILE_SIZE + HALF_TILE).astype(np.float64)
+        self.prev_x = self.pixel_x.copy()  # 上一幀的位置 (掃掠碰撞用)
+        self.prev_y = self.pixel_y.copy()
+
+        # 初始方向：出生格的合法出口之一 (掉頭時才不會撞牆)
+        legal = (self.exits[ACTOR_GHOST][tiles][:, None] & _DIR_BITS[None, :]) != 0
+        self.direction = np.argmax(legal * rng.random((count, 4)), axis=1).astype(np.int8)
+        self.mode = np.full(count, SWARM_SCATTER, dtype=np.int8)
+        self.speed = np.full(count, float(SPEED))
+        self.personality = (np.arange(count) % 4).astype(np.int8)
+        corners = np.array([scatter_points[p] for p in range(4)], dtype=np.int32)
+        self.scatter_x = corners[self.personality, 0]
+        self.scatter_y = corners[self.personality, 1]
+
+    def _spawn_tiles(self, away_from):
+        """ 從玩家出生點 BFS 得到可到達的格子，只留下距離 8 格以上的 """
+        grid = self.grid
+        start = grid.index(*away_from)
+        dist = {start: 0}
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            x, y = i % grid.width, i // grid.width
+            for direction in DIRECTIONS:
+                if grid.exits[ACTOR_GHOST][i] & DIR_BITS[direction]:
+                    nx, ny = grid.neighbor(x, y, direction)
+                    j = ny * grid.width + nx
+                    if j not in dist:
+                        dist[j] = dist[i] + 1
+                        queue.append(j)
+        return np.array([i for i, d in dist.items() if d >= 8], dtype=np.int64)
+
+    # --- 模式切換 ---
+
+    def get_state(self):
+        """ 會隨遊戲改變的陣列的複本 (Game.snapshot 用) """
+        return tuple(getattr(self, name).copy() for name in _STATE_ARRAYS)
+
+    def set_state(self, state):
+        for name, values in zip(_STATE_ARRAYS, state):
+            getattr(self, name)[:] = values
+
+    def _active(self):
+        return self.mode <= SWARM_FRIGHTENED
+
+    def set_global_mode(self, global_ghost_mode):
+        """ 散開 / 追逐切換 (受驚、回家、出門中的鬼不受影響)，切到散開時掉頭 """
+        target = SWARM_SCATTER if global_ghost_mode == MODE_SCATTER else SWARM_CHASE
+        switching = (self.mode <= SWARM_CHASE) & (self.mode != target)
+        if target == SWARM_SCATTER:
+            self.direction[switching] = _REVERSE[self.direction[switching]]
+        self.mode[switching] = target
+
+    def start_frightened(self):
+        active = self.mode <= SWARM_CHASE
+        self.mode[active] = SWARM_FRIGHTENED
+        self.direction[active] = _REVERSE[self.direction[active]]
+        self.speed[active] = 1.0
+
+    def end_frightened(self, global_ghost_mode):
+        frightened = self.mode == SWARM_FRIGHTENED
+        self.mode[frightened] = SWARM_SCATTER if global_ghost_mode == MODE_SCATTER else SWARM_CHASE
+
+    # --- 每幀更新 ---
+
+    def update(self, player, blinky_tile, global_ghost_mode):
+        """ 一次向量化更新所有鬼魂 """
+        width = self.width
+        centered = (((self.pixel_x - HALF_TILE) % TILE_SIZE) == 0) & (((self.pixel_y - HALF_TILE) % TILE_SIZE) == 0)
+        idx = np.nonzero(centered)[0]
+        if len(idx):
+            gx = ((self.pixel_x[idx] - HALF_TILE) // TILE_SIZE).astype(np.int32)
+            gy = ((self.pixel_y[idx] - HALF_TILE) // TILE_SIZE).astype(np.int32)
+            self.grid_x[idx] = gx
+            self.grid_y[idx] = gy
+            self._arrive(idx, gx, gy, global_ghost_mode)
+            self._choose_directions(idx, gx, gy, player, blinky_tile)
+
+        self.prev_x[:] = self.pixel_x
+        self.prev_y[:] = self.pixel_y
+        self.pixel_x += _DIR_X[self.direction] * self.speed
+        self.pixel_y += _DIR_Y[self.direction] * self.speed
+
+        # 隧道
+        map_width = width * TILE_SIZE
+        self.pixel_x[self.pixel_x < -HALF_TILE] = map_width + HALF_TILE
+        self.pixel_x[self.pixel_x > map_width + HALF_TILE] = -HALF_TILE
+
+    def _arrive(self, idx, gx, gy, global_ghost_mode):
+        """ 到達格子中心時的模式轉換：回到家就重生、出了門就回到全域模式、恢復速度 """
+        mode = self.mode[idx]
+        home = (mode == SWARM_GO_HOME) & (gx == self.home_tile[0]) & (gy == self.home_tile[1])
+        self.mode[idx[home]] = SWARM_EXIT_HOUSE
+        self.speed[idx[home]] = SPEED
+
+        exited = (self.mode[idx] == SWARM_EXIT_HOUSE) & (gy <= self.exit_y)
+        self.mode[idx[exited]] = SWARM_SCATTER if global_ghost_mode == MODE_SCATTER else SWARM_CHASE
+
+        normal = self.mode[idx] <= SWARM_CHASE
+        self.speed[idx[normal]] = SPEED
+
+    def _targets(self, idx, gx, gy, player, blinky_tile):
+        px, py = player.grid_x, player.grid_y
+        pdx, pdy = player.direction
+        personality = self.personality[idx]
+        mode = self.mode[idx]
+
+        # 追逐目標 (預設 Blinky：玩家所在格)
+        tx = np.full(len(idx), px, dtype=np.float64)
+        ty = np.full(len(idx), py, dtype=np.float64)
+        moving = (pdx, pdy) != (0, 0)
+        if moving:
+            pinky = personality == PERSONALITY_PINKY
+            tx[pinky] = px + pdx * 4
+            ty[pinky] = py + pdy * 4
+            if blinky_tile is not None:
+                inky = personality == PERSONALITY_INKY
+                trigger_x, trigger_y = px + pdx * 2, py + pdy * 2
+                tx[inky] = 2 * trigger_x - blinky_tile[0]
+                ty[inky] = 2 * trigger_y - blinky_tile[1]
+        clyde_near = (personality == PERSONALITY_CLYDE) & (np.hypot(gx - px, gy - py) <= 8)
+        tx[clyde_near] = self.scatter_x[idx[clyde_near]]
+        ty[clyde_near] = self.scatter_y[idx[clyde_near]]
+
+        scatter = mode == SWARM_SCATTER
+        tx[scatter] = self.scatter_x[idx[scatter]]
+        ty[scatter] = self.scatter_y[idx[scatter]]
+
+        going_home = mode == SWARM_GO_HOME
+        tx[going_home], ty[going_home] = self.home_tile
+        exiting = mode == SWARM_EXIT_HOUSE
+        tx[exiting], ty[exiting] = self.home_tile[0], self.exit_y
+        return tx, ty
+
+    def _choose_directions(self, idx, gx, gy, player, blinky_tile):
+        width = self.width
+        mode = self.mode[idx]
+        tx, ty = self._targets(idx, gx, gy, player, blinky_tile)
+
+        # 可穿門的鬼 (回家、出門) 用另一組出口遮罩
+        tile = gy * width + gx % width
+        door_ok = (mode == SWARM_GO_HOME) | (mode == SWARM_EXIT_HOUSE)
+        exits = np.where(door_ok, self.exits[ACTOR_GHOST_DOOR][tile], self.exits[ACTOR_GHOST][tile])
+
+        # 格子佔用計數：取代「每個方向掃過其他所有鬼」的阻擋檢查
+        active = self._active()
+        occupied = np.bincount(self.grid_y[active] * width + self.grid_x[active] % width,
+                               minlength=width * self.grid.height)
+
+        nx = gx[:, None] + _DIR_X[None, :]
+        ny = gy[:, None] + _DIR_Y[None, :]
+        legal = (exits[:, None] & _DIR_BITS[None, :]) != 0
+        not_reverse = np.arange(4)[None, :] != _REVERSE[self.direction[idx]][:, None]
+        in_rows = (ny >= 0) & (ny < self.grid.height)
+        next_tile = np.where(in_rows, ny, 0) * width + nx % width
+        blocked = (occupied[next_tile] > 0) & ~door_ok[:, None]
+        valid = legal & not_reverse & ~blocked
+
+        dist = np.hypot(nx - tx[:, None], ny - ty[:, None])
+        frightened = (mode == SWARM_FRIGHTENED)[:, None]
+        score = np.where(frightened, -dist, dist)
+        score = np.where(valid, score, np.inf)
+        choice = np.argmin(score, axis=1).astype(np.int8)
+
+        # 沒有任何可走方向就掉頭 (掉頭也是牆時就走第一個合法出口)
+        stuck = ~valid.any(axis=1)
+        if stuck.any():
+            reverse = _REVERSE[self.direction[idx[stuck]]]
+            reverse_ok = legal[stuck, reverse]
+            choice[stuck] = np.where(reverse_ok, reverse, np.argmax(legal[stuck], axis=1))
+        self.direction[idx] = choice
+
+    # --- 碰撞 ---
+
+    def collide(self, player, player_from=None):
+        """ 與玩家的碰撞 (與 spatial.swept_distance 相同的掃掠檢查)：回傳 (被吃掉的鬼數量, 玩家是否被抓到) """
+        if player_from is None:
+            player_from = (player.pixel_x, player.pixel_y)
+        rx = player_from[0] - self.prev_x
+        ry = player_from[1] - self.prev_y
+        vx = (player.pixel_x - player_from[0]) - (self.pixel_x - self.prev_x)
+        vy = (player.pixel_y - player_from[1]) - (self.pixel_y - self.prev_y)
+        speed2 = vx * vx + vy * vy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(speed2 > 0, -(rx * vx + ry * vy) / speed2, 0.0), 0.0, 1.0)
+        # 瞬間移動 (隧道、重生) 時只比較目前位置
+        player_jump = abs(player.pixel_x - player_from[0]) + abs(player.pixel_y - player_from[1]) > MAX_SWEEP
+        jumped = (np.abs(self.pixel_x - self.prev_x) + np.abs(self.pixel_y - self.prev_y) > MAX_SWEEP) | player_jump
+        t[jumped] = 1.0
+        dist = np.hypot(rx + t * vx, ry + t * vy)
+        touching = dist < (player.radius + self.radius)
+        if not touching.any():
+            return 0, False
+        eaten = touching & (self.mode == SWARM_FRIGHTENED)
+        caught = bool((touching & (self.mode <= SWARM_CHASE)).any())
+        if eaten.any():
+            self.mode[eaten] = SWARM_GO_HOME
+            self.speed[eaten] = 2 * SPEED
+            # 對齊到新速度的倍數，才能準確停在格子中心 (同 Ghost.eat)
+            self.pixel_x[eaten] -= (self.pixel_x[eaten] - HALF_TILE) % self.speed[eaten]
+            self.pixel_y[eaten] -= (self.pixel_y[eaten] - HALF_TILE) % self.speed[eaten]
+        return int(eaten.sum()), caught
+
+    # --- 繪圖 ---
+
+    def get_rects(self):
+        import pygame
+        size = self.radius * 2 + 4
+        return [pygame.Rect(int(x) - self.radius - 2, int(y) - self.radius - 2, size, size)
+                for x, y in zip(self.pixel_x, self.pixel_y)]
+
+    def draw(self, surface, offset=(0, 0), positions=None):
+        """ 只畫出現在畫面上的鬼魂。positions 是要畫的 (x 陣列, y 陣列)，預設為目前位置 (畫面內插用) """
+        import pygame
+        pixel_x, pixel_y = positions if positions is not None else (self.pixel_x, self.pixel_y)
+        x = pixel_x - offset[0]
+        y = pixel_y - offset[1]
+        width, height = surface.get_size()
+        margin = self.radius
+        visible = np.nonzero((x > -margin) & (x < width + margin) & (y > -margin) & (y < height + margin))[0]
+        for i in visible:
+            if self.mode[i] == SWARM_GO_HOME:
+                eye_radius = self.radius // 2
+                eye_offset = self.radius // 3
+                pygame.draw.circle(surface, WHITE, (x[i] - eye_offset, y[i]), eye_radius)
+                pygame.draw.circle(surface, WHITE, (x[i] + eye_offset, y[i]), eye_radius)
+            else:
+                color = FRIGHTENED_BLUE if self.mode[i] == SWARM_FRIGHTENED else PERSONALITY_COLORS[self.personality[i]]
+                pygame.draw.circle(surface, color, (x[i], y[i]), self.radius)
@@ -0,0 +1,162 @@
+# vec_env.py
+""" 強化學習用的多環境介面 (gym VecEnv 風格)。
+
+同時推進 K 場互相獨立的無視窗遊戲，觀察值、獎勵與結束旗標都放在預先配置的
+NumPy 陣列裡，每次 step() 原地更新並回傳同一批陣列 (不會複製)。
+需要保留某一步結果的使用者請自行 .copy()。
+
+範例：
+    env = VecEnv(16)
+    obs = env.reset()
+    for _ in range(1000):
+        obs, rewards, dones, infos = env.step(np.random.randint(0, NUM_ACTIONS, size=16))
+"""
+import random
+import numpy as np
+from settings import *
+from game import Game
+from grid import CODE_WALL
+
+# 動作編號：0 = 不按鍵，1~4 = DIRECTIONS 的四個方向 (上、下、左、右)
+ACTIONS = [None] + DIRECTIONS
+NUM_ACTIONS = len(ACTIONS)
+
+# 回合剛開始 (READY) 而且代理人沒有按鍵時，用這個方向開始
+START_DIRECTION = (-1, 0)
+
+# 鬼魂模式代碼 (追逐模式的各種個性一律算 CHASE)
+GHOST_MODE_CODES = {
+    MODE_WAITING: 0,
+    MODE_EXIT_HOUSE: 1,
+    MODE_SCATTER: 2,
+    MODE_CHASE: 3,
+    MODE_FRIGHTENED: 4,
+    MODE_GO_HOME: 5,
+}
+GHOST_MODE_CHASE = GHOST_MODE_CODES[MODE_CHASE]
+
+# 獎勵：分數的增加量，被抓到時另外扣分
+REWARD_LIFE_LOST = -500.0
+
+
+class VecEnv:
+    """ 以固定順序同時推進 K 場遊戲。
+
+    觀察值 (obs 字典，每個欄位的第一維都是環境編號)：
+        tiles        uint8   (K, 高, 寬)  地圖格子代碼 (grid.CODE_*)；關卡包裡的地圖大小不同時取最大的，
+                                          較小的地圖放在左上角，其餘補 CODE_WALL
+        map_size     int16   (K, 2)       目前地圖實際的 (寬, 高)
+        positions    float32 (K, 5, 2)    玩家與四隻鬼的格子座標 (可為小數，代表格子之間)
+        ghost_modes  uint8   (K, 4)       GHOST_MODE_CODES
+        lives        int8    (K,)
+        frightened   bool    (K,)
+
+    某一場結束 (Game Over 或超過 max_frames) 時，dones 為 True，infos 記錄最後的分數，
+    並自動重新開始一場；回傳的觀察值已經是新一場的開始。
+    """
+
+    def __init__(self, num_envs, algorithm=ALGO_ASTAR, seed=None, max_frames=None, **game_kwargs):
+        self.seeds = random.Random(seed)  # 每場遊戲的 seed 由這裡依序產生
+        self.num_envs = num_envs
+        self.algorithm = algorithm
+        self.max_frames = max_frames
+        self.game_kwargs = game_kwargs
+        self.games = [self._new_game() for _ in range(num_envs)]
+
+        levels = game_kwargs.get("levels")
+        if levels:
+            self.height = max(level.height for level in levels)
+            self.width = max(level.width for level in levels)
+        else:
+            grid = self.games[0].game_map
+            self.height, self.width = grid.height, grid.width
+        self.tiles = np.full((num_envs, self.height, self.width), CODE_WALL, dtype=np.uint8)
+        self.map_size = np.zeros((num_envs, 2), dtype=np.int16)
+        self.positions = np.zeros((num_envs, 5, 2), dtype=np.float32)
+        self.ghost_modes = np.zeros((num_envs, 4), dtype=np.uint8)
+        self.lives = np.zeros(num_envs, dtype=np.int8)
+        self.frightened = np.zeros(num_envs, dtype=bool)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.obs = {
+            "tiles": self.tiles,
+            "map_size": self.map_size,
+            "positions": self.positions,
+            "ghost_modes": self.ghost_modes,
+            "lives": self.lives,
+            "frightened": self.frightened,
+        }
+
+        self.scores = [0] * num_envs
+        self.levels = [None] * num_envs  # 地圖上次完整複製時的 (遊戲, 關卡)
+
+    def _new_game(self):
+        return Game(self.algorithm, seed=self.seeds.getrandbits(32), **self.game_kwargs)
+
+    def reset(self):
+        """ 重新開始所有遊戲，回傳觀察值 """
+        for i in range(self.num_envs):
+            self._reset_env(i)
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.obs
+
+    def _reset_env(self, i):
+        game = self.games[i] = self._new_game()
+        self.scores[i] = 0
+        self.levels[i] = None
+        self._observe(i, game)
+
+    def step(self, actions):
+        """ 每場遊戲推進一幀。actions 為長度 K 的動作編號，回傳 (obs, rewards, dones, infos) """
+        infos = [{} for _ in range(self.num_envs)]
+        for i, game in enumerate(self.games):
+            move = ACTIONS[int(actions[i])]
+            lives = game.player_lives
+            if game.game_state == GAME_STATE_START and move is None:
+                move = START_DIRECTION
+            game.step(move)
+
+            score = game.player.score
+            reward = score - self.scores[i]
+            if game.player_lives < lives:
+                reward += REWARD_LIFE_LOST
+            self.scores[i] = score
+            self.rewards[i] = reward
+
+            done = (game.game_state == GAME_STATE_GAME_OVER
+                    or (self.max_frames is not None and game.frame >= self.max_frames))
+            self.dones[i] = done
+            if done:
+                infos[i] = {"score": score, "level": game.current_level, "frames": game.frame}
+                self._reset_env(i)
+            else:
+                self._observe(i, game)
+        return self.obs, self.rewards, self.dones, infos
+
+    def _observe(self, i, game):
+        """ 把第 i 場遊戲的狀態寫進觀察值陣列 """
+        grid = game.game_map
+        level = (game, game.current_level)
+        if self.levels[i] != level:
+            # 新遊戲或新關卡：整張地圖複製一次 (比最大的地圖小時其餘補牆壁)
+            tiles = self.tiles[i]
+            height, width = grid.height, grid.width
+            if (height, width) != tiles.shape:
+                tiles.fill(CODE_WALL)
+            tiles[:height, :width] = np.frombuffer(grid.tiles, dtype=np.uint8).reshape(height, width)
+            self.map_size[i] = (width, height)
+            self.levels[i] = level
+        else:
+            # 平常只有被吃掉的豆子會變
+            for x, y in game.eaten_tiles:
+                self.tiles[i, int(y), int(x) % grid.width] = grid.tiles[grid.index(x, y)]
+
+        positions = self.positions[i]
+        for j, actor in enumerate([game.player] + game.ghosts):
+            positions[j, 0] = actor.pixel_x / TILE_SIZE - 0.5
+            positions[j, 1] = actor.pixel_y / TILE_SIZE - 0.5
+        for j, ghost in enumerate(game.ghosts):
+            self.ghost_modes[i, j] = GHOST_MODE_CODES.get(ghost.current_ai_mode, GHOST_MODE_CHASE)
+        self.lives[i] = game.player_lives
+        self.frightened[i] = game.frightened_mode